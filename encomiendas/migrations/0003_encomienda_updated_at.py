@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encomiendas', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='encomienda',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
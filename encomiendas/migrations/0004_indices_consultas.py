@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:42
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('encomiendas', '0003_encomienda_updated_at'),
+        ('rutas', '0006_salida_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='encomienda',
+            index=models.Index(fields=['salida', 'created_at'], name='encomiendas_salida_fecha_idx'),
+        ),
+    ]
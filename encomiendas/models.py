@@ -1,4 +1,4 @@
-from django.db import models
+from django.db import models, transaction
 from rutas.models import Salida
 
 class Encomienda(models.Model):
@@ -19,10 +19,28 @@ class Encomienda(models.Model):
     estado = models.CharField(max_length=15, choices=ESTADOS, default='enviada')
     created_at = models.DateTimeField(auto_now_add=True)
     entregada_at = models.DateTimeField(null=True, blank=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         db_table = 'encomiendas'
         ordering = ['-created_at']
+        # Encomiendas de una salida en el orden del listado, sin ordenar en memoria
+        indexes = [
+            models.Index(fields=['salida', 'created_at'], name='encomiendas_salida_fecha_idx'),
+        ]
     
     def __str__(self):
-        return f"{self.descripcion} - {self.destinatario_nombre}"
\ No newline at end of file
+        return f"{self.descripcion} - {self.destinatario_nombre}"
+    
+    def save(self, *args, **kwargs):
+        # La encomienda y los contadores/versión de la salida se confirman juntos
+        # (la baja se descuenta en signals.descontar_encomienda)
+        nuevo = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            if nuevo:
+                Salida.objects.filter(pk=self.salida_id).ajustar_contadores(
+                    encomiendas=1, peso_kg=self.peso_kg
+                )
+            else:
+                Salida.objects.filter(pk=self.salida_id).ajustar_contadores()
\ No newline at end of file
@@ -0,0 +1,19 @@
+"""
+Proyecciones de los listados de encomiendas (ver rendimiento.proyecciones)
+"""
+from rendimiento.proyecciones import Columna, Proyeccion, fecha_hora_dmy
+
+
+# get_encomiendas_salida (el orden de las columnas es el de las claves del JSON)
+ENCOMIENDAS_SALIDA = Proyeccion(
+    Columna('id'),
+    Columna('remitente_nombre'),
+    Columna('remitente_telefono'),
+    Columna('destinatario_nombre'),
+    Columna('destinatario_telefono'),
+    Columna('descripcion'),
+    Columna('peso_kg', convertir=float),
+    Columna('precio', convertir=float),
+    Columna('estado'),
+    Columna('fecha_envio', 'created_at', convertir=fecha_hora_dmy),
+)
@@ -0,0 +1,16 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from rutas.models import Salida
+from .models import Encomienda
+
+
+@receiver(post_delete, sender=Encomienda)
+def descontar_encomienda(sender, instance, origin=None, **kwargs):
+    """Descuenta la encomienda eliminada de los contadores de su salida (misma transacción del DELETE)"""
+    if isinstance(origin, Salida) or getattr(origin, 'model', None) is Salida:
+        # La salida completa se está eliminando
+        return
+    Salida.objects.filter(pk=instance.salida_id).ajustar_contadores(
+        encomiendas=-1, peso_kg=-instance.peso_kg
+    )
@@ -1,45 +1,39 @@
+from decimal import Decimal
+
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from idempotencia.decoradores import idempotente
+from rendimiento.condicional import condicional_salida, salida_solicitada
+from rendimiento.escritor import EscrituraDemorada, escribir, respuesta_demorada
 from .models import Encomienda
+from .proyecciones import ENCOMIENDAS_SALIDA
 from rutas.models import Salida
 
+@condicional_salida()
 @api_view(['GET'])
 def get_encomiendas_salida(request, salida_id):
     """Obtener encomiendas de una salida"""
     try:
-        salida = Salida.objects.get(id=salida_id)
-        encomiendas = salida.encomiendas.all().order_by('-created_at')
-        
-        data = [
-            {
-                'id': e.id,
-                'remitente_nombre': e.remitente_nombre,
-                'remitente_telefono': e.remitente_telefono,
-                'destinatario_nombre': e.destinatario_nombre,
-                'destinatario_telefono': e.destinatario_telefono,
-                'descripcion': e.descripcion,
-                'peso_kg': float(e.peso_kg),
-                'precio': float(e.precio),
-                'estado': e.estado,
-                'fecha_envio': e.created_at.strftime('%d/%m/%Y %H:%M')
-            } for e in encomiendas
-        ]
+        salida = salida_solicitada(request, salida_id)
+        encomiendas = ENCOMIENDAS_SALIDA.leer(salida.encomiendas.all().order_by('-created_at'))
         
-        return Response(data)
+        return Response(encomiendas.filas())
     except Salida.DoesNotExist:
         return Response({'error': 'Salida no encontrada'}, status=404)
 
+@idempotente
 @api_view(['POST'])
 def crear_encomienda(request, salida_id):
     """Crear nueva encomienda"""
     try:
         salida = Salida.objects.get(id=salida_id)
         
-        peso = float(request.data.get('peso_kg'))
+        peso = Decimal(str(request.data.get('peso_kg')))
         precio = peso * salida.ruta.precio_encomienda_kg
         
-        encomienda = Encomienda.objects.create(
+        encomienda = escribir(
+            Encomienda.objects.create,
             salida=salida,
             remitente_nombre=request.data.get('remitente_nombre'),
             remitente_telefono=request.data.get('remitente_telefono'),
@@ -58,6 +52,8 @@ def crear_encomienda(request, salida_id):
             'precio_total': float(precio)
         })
         
+    except EscrituraDemorada as e:
+        return respuesta_demorada(e)
     except Exception as e:
         return Response({'error': str(e)}, status=400)
     
@@ -72,11 +68,13 @@ def entregar_encomienda(request, encomienda_id):
         encomienda = Encomienda.objects.get(id=encomienda_id)
         encomienda.estado = 'entregada'
         encomienda.entregada_at = timezone.now()
-        encomienda.save()
+        escribir(encomienda.save)
         
         return Response({
             'success': True,
             'message': f'Encomienda entregada: {encomienda.descripcion}'
         })
+    except EscrituraDemorada as e:
+        return respuesta_demorada(e)
     except Encomienda.DoesNotExist:
         return Response({'error': 'Encomienda no encontrada'}, status=404)
\ No newline at end of file
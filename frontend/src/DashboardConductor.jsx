@@ -1,5 +1,8 @@
 import { useState, useEffect } from 'react'
 import ReservasConductor from './components/ReservasConductor/ReservasConductor'
+import {
+  sincronizarConductor, copiaLocalConductor, encolarOperacion, enviarOperacionesPendientes
+} from './sincronizacion'
 
 function DashboardConductor({ user }) {
   const [misSalidas, setMisSalidas] = useState([])
@@ -23,12 +26,16 @@ function DashboardConductor({ user }) {
     try {
       setLoading(true)
       
-      // Usar API que filtra por conductor
-      const response = await fetch(`http://192.168.80.175:8000/api/salidas/?conductor_id=${user.id}`)
-      const data = await response.json()
-      
-      // data es un array directamente
-      const salidaData = Array.isArray(data) ? data : []
+      // Sincronización incremental: solo viajan los cambios desde la última vez
+      let copia
+      try {
+        await enviarOperacionesPendientes(user.id)
+        copia = await sincronizarConductor(user.id)
+      } catch (error) {
+        console.error('Sin conexión, usando copia local:', error)
+        copia = copiaLocalConductor(user.id)
+      }
+      const salidaData = copia.salidas
       setMisSalidas(salidaData)
       
       // Calcular estadísticas del conductor
@@ -67,142 +74,101 @@ function DashboardConductor({ user }) {
 
   const cargarPasajeros = async (salidaId) => {
     try {
-      const response = await fetch(`http://192.168.1.44:8000/api/salida/${salidaId}/pasajes/?conductor_id=${user.id}`)
-      const data = await response.json()
-      
-      if (data.success) {
-        setPasajeros(data.pasajes || [])
-      } else {
-        console.error('Error al cargar pasajeros:', data.error)
-        alert(`❌ ${data.error}`)
-        setPasajeros([])
-      }
+      const copia = await sincronizarConductor(user.id)
+      setPasajeros(copia.pasajes.filter(pasaje => pasaje.salida_id === salidaId))
     } catch (error) {
-      console.error('Error al cargar pasajeros:', error)
-      setPasajeros([])
+      console.error('Error al cargar pasajeros, usando copia local:', error)
+      setPasajeros(copiaLocalConductor(user.id).pasajes.filter(pasaje => pasaje.salida_id === salidaId))
     }
   }
 
   const cargarEncomiendas = async (salidaId) => {
     try {
-      const response = await fetch(`http://192.168.1.44:8000/api/salida/${salidaId}/encomiendas/?conductor_id=${user.id}`)
-      const data = await response.json()
-      
-      if (data.success) {
-        setEncomiendas(data.encomiendas || [])
-      } else {
-        console.error('Error al cargar encomiendas:', data.error)
-        setEncomiendas([])
+      const copia = await sincronizarConductor(user.id)
+      setEncomiendas(copia.encomiendas.filter(encomienda => encomienda.salida_id === salidaId))
+    } catch (error) {
+      console.error('Error al cargar encomiendas, usando copia local:', error)
+      setEncomiendas(copiaLocalConductor(user.id).encomiendas.filter(encomienda => encomienda.salida_id === salidaId))
+    }
+  }
+
+  // Las operaciones pasan por la cola offline: sin señal quedan guardadas
+  // y se envían en lote con la siguiente que sí llegue al servidor
+  const ejecutarOperacion = async (tipo, datos) => {
+    const operacionId = encolarOperacion(user.id, tipo, datos)
+    try {
+      const resultados = await enviarOperacionesPendientes(user.id)
+      const resultado = resultados.find(r => r.id === operacionId)
+      if (resultado && resultado.estado === 'rechazada') {
+        alert(`❌ ${resultado.error}`)
+        return false
       }
+      return true
     } catch (error) {
-      console.error('Error al cargar encomiendas:', error)
-      setEncomiendas([])
+      alert('📶 Sin señal: la operación se guardó y se enviará al recuperar conexión')
+      return false
     }
   }
 
   const marcarSalida = async (salidaId) => {
     if (!confirm('¿Confirmar que el vehículo está saliendo?')) return
 
-    try {
-      const response = await fetch(`http://192.168.1.44:8000/api/salidas/${salidaId}/marcar-salida/`, {
-        method: 'PUT',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          conductor_id: user.id
-        })
-      })
-      const data = await response.json()
-      
-      if (data.success) {
-        alert('✅ Salida marcada correctamente')
-        loadConductorData()
-      } else {
-        alert(data.error || 'Error al marcar salida')
-      }
-    } catch (error) {
-      alert('Error al marcar salida')
+    if (await ejecutarOperacion('marcar_salida', { salida_id: salidaId })) {
+      alert('✅ Salida marcada correctamente')
+      loadConductorData()
     }
   }
 
   const marcarLlegada = async (salidaId) => {
     if (!confirm('¿Confirmar que el viaje ha terminado?')) return
 
-    try {
-      const response = await fetch(`http://192.168.1.44:8000/api/salidas/${salidaId}/marcar-llegada/`, {
-        method: 'PUT',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          conductor_id: user.id
-        })
-      })
-      const data = await response.json()
-      
-      if (data.success) {
-        alert('✅ Llegada marcada. ¡Viaje completado!')
-        loadConductorData()
-      } else {
-        alert(data.error || 'Error al marcar llegada')
-      }
-    } catch (error) {
-      alert('Error al marcar llegada')
+    if (await ejecutarOperacion('marcar_llegada', { salida_id: salidaId })) {
+      alert('✅ Llegada marcada. ¡Viaje completado!')
+      loadConductorData()
     }
   }
 
   const checkInPasajero = async (pasajeroId) => {
-    try {
-      const response = await fetch(`http://192.168.1.44:8000/api/pasaje/${pasajeroId}/check-in/`, {
-        method: 'PUT',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          conductor_id: user.id
-        })
-      })
-      const data = await response.json()
-      
-      if (data.success) {
-        cargarPasajeros(salidaSeleccionada.id)
-      } else {
-        alert(data.error || 'Error al hacer check-in')
-      }
-    } catch (error) {
-      alert('Error al hacer check-in')
+    if (await ejecutarOperacion('check_in', { pasaje_id: pasajeroId })) {
+      cargarPasajeros(salidaSeleccionada.id)
     }
   }
 
   const marcarEncomiendaEntregada = async (encomiendaId) => {
-    try {
-      const response = await fetch(`http://192.168.1.44:8000/api/encomienda/${encomiendaId}/entregar/`, {
-        method: 'PUT',
-        headers: {
-          'Content-Type': 'application/json',
-        },
-        body: JSON.stringify({
-          conductor_id: user.id
-        })
-      })
-      const data = await response.json()
-      
-      if (data.success) {
-        alert('✅ Encomienda marcada como entregada')
-        cargarEncomiendas(salidaSeleccionada.id)
-      } else {
-        alert(data.error || 'Error al marcar encomienda')
-      }
-    } catch (error) {
-      alert('Error al marcar encomienda')
+    if (await ejecutarOperacion('entregar_encomienda', { encomienda_id: encomiendaId })) {
+      alert('✅ Encomienda marcada como entregada')
+      cargarEncomiendas(salidaSeleccionada.id)
     }
   }
 
   const descargarManifiesto = async (salidaId) => {
     try {
-      // Descargar directamente como PDF
-      const url = `http://192.168.1.44:8000/api/salida/${salidaId}/manifiesto-pdf/?conductor_id=${user.id}`
+      const servidor = 'http://192.168.1.44:8000'
+      let url = `${servidor}/api/salida/${salidaId}/manifiesto-pdf/?conductor_id=${user.id}`
+      const response = await fetch(url)
+      
+      // 202: el PDF se está generando en segundo plano, consultar la tarea hasta que termine
+      if (response.status === 202) {
+        const { estado_url, resultado_url } = await response.json()
+        alert('⏳ Generando manifiesto, la descarga empezará en unos segundos...')
+        let estado = 'pendiente'
+        for (let intento = 0; intento < 60 && estado !== 'completada'; intento++) {
+          await new Promise(resolve => setTimeout(resolve, 2000))
+          const { tarea } = await (await fetch(`${servidor}${estado_url}`)).json()
+          estado = tarea.estado
+          if (estado === 'fallida') throw new Error(tarea.error)
+        }
+        if (estado !== 'completada') throw new Error('El manifiesto tardó demasiado en generarse')
+        url = `${servidor}${resultado_url}`
+      } else {
+        const contentType = response.headers.get('Content-Type') || ''
+        if (!contentType.includes('application/pdf')) {
+          const data = await response.json()
+          throw new Error(data.error)
+        }
+        // Ya en caché: usar el PDF recibido sin pedirlo otra vez
+        url = URL.createObjectURL(await response.blob())
+      }
       
       // Crear enlace temporal para descarga
       const link = document.createElement('a')
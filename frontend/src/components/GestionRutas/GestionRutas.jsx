@@ -1,4 +1,5 @@
 import { useState, useEffect } from 'react'
+import { fetchIdempotente } from '../../idempotencia'
 
 const GestionRutas = ({ onVolver }) => {
   const [rutas, setRutas] = useState([])
@@ -229,7 +230,7 @@ const GestionRutas = ({ onVolver }) => {
       
       console.log('Datos a enviar:', salidaData)
       
-      const response = await fetch('http://192.168.80.175:8000/api/salidas/crear/', {
+      const response = await fetchIdempotente('http://192.168.80.175:8000/api/salidas/crear/', {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
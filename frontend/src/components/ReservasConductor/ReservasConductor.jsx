@@ -1,4 +1,5 @@
 import { useState, useEffect } from 'react'
+import { fetchIdempotente } from '../../idempotencia'
 
 function ReservasConductor({ user, salida, onReservaCreada }) {
   const [mostrarModal, setMostrarModal] = useState(false)
@@ -39,7 +40,7 @@ function ReservasConductor({ user, salida, onReservaCreada }) {
 
     try {
       setLoading(true)
-      const response = await fetch(`http://192.168.80.175:8000/api/salida/${salida.id}/reservar-conductor/`, {
+      const response = await fetchIdempotente(`http://192.168.80.175:8000/api/salida/${salida.id}/reservar-conductor/`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -1,6 +1,7 @@
 import { useState, useEffect } from 'react'
 // Importar jsPDF para generar PDFs reales
 import jsPDF from 'jspdf'
+import { fetchIdempotente } from '../../idempotencia'
 
 function VentaPasajes({ onVolver }) {
   const [pasoActual, setPasoActual] = useState(1)
@@ -27,32 +28,15 @@ function VentaPasajes({ onVolver }) {
   const cargarSalidas = async () => {
     try {
       setLoading(true)
-      const response = await fetch('http://192.168.80.175:8000/api/salidas-disponibles/')
+      // Una sola petición: salidas con su mapa de asientos y saldo ya calculados
+      const response = await fetch('http://192.168.80.175:8000/api/disponibilidad-venta/')
       const data = await response.json()
       
-      // Calcular saldo total por salida para el chofer
-      const salidasConSaldo = await Promise.all(
-        data.map(async (salida) => {
-          try {
-            const pasajesRes = await fetch(`http://192.168.80.175:8000/api/salida/${salida.id}/pasajes/`)
-            const pasajesData = await pasajesRes.json()
-            
-            // 🔧 CORREGIDO: Usar pasajesData.pasajes y filtrar solo vendidos para saldo
-            const pasajes = pasajesData.success ? pasajesData.pasajes : []
-            const saldoTotal = pasajes
-              .filter(p => !p.es_reserva_conductor) // Solo pasajes vendidos
-              .reduce((sum, p) => sum + parseFloat(p.precio), 0) || 0
-            
-            return {
-              ...salida,
-              saldoTotal: saldoTotal,
-              totalPasajeros: pasajes.length // Total incluyendo reservas
-            }
-          } catch (error) {
-            return { ...salida, saldoTotal: 0, totalPasajeros: 0 }
-          }
-        })
-      )
+      const salidasConSaldo = data.map(salida => ({
+        ...salida,
+        saldoTotal: salida.saldo_total, // Solo pasajes vendidos
+        totalPasajeros: salida.total_pasajeros // Total incluyendo reservas
+      }))
       
       setSalidas(salidasConSaldo)
     } catch (error) {
@@ -155,7 +139,7 @@ function VentaPasajes({ onVolver }) {
     if (!validarFormulario()) return
 
     try {
-      const response = await fetch(`http://192.168.80.175:8000/api/salida/${salidaSeleccionada.id}/vender/`, {
+      const response = await fetchIdempotente(`http://192.168.80.175:8000/api/salida/${salidaSeleccionada.id}/vender/`, {
         method: 'POST',
         headers: {
           'Content-Type': 'application/json',
@@ -0,0 +1,30 @@
+// POST con cabecera Idempotency-Key: ante un corte de red se reintenta con la
+// misma clave y el servidor devuelve la respuesta original en lugar de
+// registrar la venta (o la salida, o la reserva) dos veces
+
+const esperar = (ms) => new Promise(resolve => setTimeout(resolve, ms))
+
+export const fetchIdempotente = async (url, opciones = {}, intentos = 4) => {
+  const clave = crypto.randomUUID()
+  const config = {
+    ...opciones,
+    headers: { ...(opciones.headers || {}), 'Idempotency-Key': clave }
+  }
+
+  for (let intento = 1; ; intento++) {
+    try {
+      const response = await fetch(url, config)
+      // 409 con Retry-After: la primera petición con esta clave sigue en proceso
+      const reintentable = response.status >= 500 ||
+        (response.status === 409 && response.headers.get('Retry-After'))
+      if (reintentable && intento < intentos) {
+        await esperar(500 * intento)
+        continue
+      }
+      return response
+    } catch (error) {
+      if (intento >= intentos) throw error
+      await esperar(500 * intento)
+    }
+  }
+}
@@ -0,0 +1,107 @@
+// Copia local de los datos del conductor, actualizada con /api/sincronizar/
+// Solo viajan los cambios desde el último cursor: útil con datos móviles pobres
+
+const API_URL = 'http://192.168.80.175:8000'
+
+const claveLocal = (conductorId) => `sincronizacion_conductor_${conductorId}`
+
+const leerCopiaLocal = (conductorId) => {
+  try {
+    return JSON.parse(localStorage.getItem(claveLocal(conductorId))) || null
+  } catch (error) {
+    return null
+  }
+}
+
+const aplicarCambios = (actuales, cambios, eliminados) => {
+  const porId = new Map(actuales.map(item => [item.id, item]))
+  cambios.forEach(item => porId.set(item.id, item))
+  eliminados.forEach(id => porId.delete(id))
+  return Array.from(porId.values())
+}
+
+export const sincronizarConductor = async (conductorId) => {
+  const local = leerCopiaLocal(conductorId)
+  const params = new URLSearchParams({ conductor_id: conductorId })
+  if (local?.cursor) {
+    params.set('desde', local.cursor)
+  }
+
+  const response = await fetch(`${API_URL}/api/sincronizar/?${params}`)
+  const data = await response.json()
+  if (!data.success) {
+    throw new Error(data.error)
+  }
+
+  const base = data.completo || !local ? { salidas: [], pasajes: [], encomiendas: [] } : local
+  const salidas = aplicarCambios(base.salidas, data.salidas, data.eliminados.salidas)
+  const vigentes = new Set(salidas.map(salida => salida.id))
+  const copia = {
+    cursor: data.cursor,
+    salidas: salidas.sort((a, b) => b.id - a.id),
+    // Los pasajes y encomiendas de una salida eliminada se van con ella
+    pasajes: aplicarCambios(base.pasajes, data.pasajes, data.eliminados.pasajes)
+      .filter(pasaje => vigentes.has(pasaje.salida_id))
+      .sort((a, b) => a.asiento - b.asiento),
+    encomiendas: aplicarCambios(base.encomiendas, data.encomiendas, data.eliminados.encomiendas)
+      .filter(encomienda => vigentes.has(encomienda.salida_id))
+  }
+
+  localStorage.setItem(claveLocal(conductorId), JSON.stringify(copia))
+  return copia
+}
+
+// Sin conexión: última copia local conocida
+export const copiaLocalConductor = (conductorId) =>
+  leerCopiaLocal(conductorId) || { salidas: [], pasajes: [], encomiendas: [] }
+
+// Cola de operaciones offline (check-in, entregas, salida/llegada)
+// Se guardan con un id propio y se envían en lote al recuperar señal
+
+const claveCola = (conductorId) => `operaciones_pendientes_${conductorId}`
+
+const leerCola = (conductorId) => {
+  try {
+    return JSON.parse(localStorage.getItem(claveCola(conductorId))) || []
+  } catch (error) {
+    return []
+  }
+}
+
+export const encolarOperacion = (conductorId, tipo, datos) => {
+  const operacion = {
+    id: crypto.randomUUID(),
+    tipo,
+    datos,
+    realizada_en: new Date().toISOString()
+  }
+  localStorage.setItem(claveCola(conductorId), JSON.stringify([...leerCola(conductorId), operacion]))
+  return operacion.id
+}
+
+export const operacionesPendientes = (conductorId) => leerCola(conductorId).length
+
+export const enviarOperacionesPendientes = async (conductorId) => {
+  const cola = leerCola(conductorId)
+  if (!cola.length) {
+    return []
+  }
+
+  const response = await fetch(`${API_URL}/api/sincronizar/operaciones/`, {
+    method: 'POST',
+    headers: { 'Content-Type': 'application/json' },
+    body: JSON.stringify({ conductor_id: conductorId, operaciones: cola })
+  })
+  const data = await response.json()
+  if (!data.success) {
+    throw new Error(data.error)
+  }
+
+  // Aplicadas, rechazadas o repetidas: todas salen de la cola
+  const procesadas = new Set(data.resultados.map(resultado => resultado.id))
+  localStorage.setItem(
+    claveCola(conductorId),
+    JSON.stringify(leerCola(conductorId).filter(operacion => !procesadas.has(operacion.id)))
+  )
+  return data.resultados
+}
@@ -0,0 +1,161 @@
+"""
+Cabecera Idempotency-Key para los endpoints que crean datos
+
+Con la cabecera, la primera petición ejecuta la vista y guarda su respuesta;
+los reintentos con la misma clave reciben esa respuesta sin volver a
+ejecutarla (cabecera Idempotent-Replayed: true). Sin la cabecera la vista se
+comporta igual que antes.
+
+    @idempotente
+    @api_view(['POST'])
+    def vender_pasaje(request, salida_id):
+        ...
+
+Va por encima de @api_view / @csrf_exempt: necesita la respuesta ya renderizada.
+
+La vista y el guardado de su respuesta corren en un mismo transaction.atomic():
+si el proceso muere entre ambos no queda confirmada una venta sin su
+respuesta, que tras ABANDONO se volvería a ejecutar. Con ESCRITOR_UNICO las
+escrituras las confirma el hilo escritor en su propia transacción y esa
+ventana sigue existiendo: una caída justo después del COMMIT del lote deja
+la clave en proceso y, pasado ABANDONO, un reintento vuelve a aplicar la
+operación (las restricciones de la base, como el asiento único, siguen
+rechazando el duplicado).
+
+Si la vista responde 503 por una escritura demorada (rendimiento.escritor)
+la clave queda en proceso: la escritura sigue en cola y un reintento
+inmediato podría aplicarla dos veces. Cuando termina, si falló se borra la
+clave (el reintento la ejecuta de verdad); si se confirmó se guarda una
+respuesta que lo indica y los reintentos reciben esa.
+"""
+import hashlib
+from contextlib import nullcontext
+from datetime import timedelta
+from functools import wraps
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.db.models import Q
+from django.http import HttpResponse, JsonResponse
+from django.utils import timezone
+
+from rendimiento.escritor import escritor
+from .models import RespuestaIdempotente
+
+CABECERA = 'Idempotency-Key'
+LARGO_MAXIMO_CLAVE = 255
+# Una fila en proceso más vieja que esto es de un worker que murió a mitad de la vista
+ABANDONO = timedelta(minutes=2)
+
+
+def tiempo_vida():
+    return timedelta(hours=getattr(settings, 'IDEMPOTENCIA_TTL_HORAS', 24))
+
+
+def _error(mensaje, status):
+    return JsonResponse({'success': False, 'error': mensaje}, status=status)
+
+
+def _en_proceso():
+    response = _error('La petición con esta Idempotency-Key está en proceso, reintente', 409)
+    response['Retry-After'] = '1'
+    return response
+
+
+def _reproducir(guardada):
+    response = HttpResponse(
+        bytes(guardada.contenido), status=guardada.estado_http, content_type=guardada.tipo_contenido or None
+    )
+    response['Idempotent-Replayed'] = 'true'
+    return response
+
+
+def _reservar(clave, alcance, huella):
+    """
+    Crea la fila de la clave (estado en proceso) y la devuelve, o devuelve la
+    respuesta que corresponde si la clave ya existe.
+    """
+    ahora = timezone.now()
+    RespuestaIdempotente.objects.filter(clave=clave, alcance=alcance).filter(
+        Q(expira_en__lte=ahora) | Q(estado_http__isnull=True, creada_en__lt=ahora - ABANDONO)
+    ).delete()
+    try:
+        with transaction.atomic():
+            return RespuestaIdempotente.objects.create(
+                clave=clave, alcance=alcance, huella=huella, expira_en=ahora + tiempo_vida()
+            ), None
+    except IntegrityError:
+        pass
+    previa = RespuestaIdempotente.objects.filter(clave=clave, alcance=alcance).first()
+    if previa is None:
+        # Se eliminó entre el INSERT y la lectura (la vista original falló): reintentar
+        return None, _en_proceso()
+    if previa.estado_http is None:
+        return None, _en_proceso()
+    if previa.huella != huella:
+        return None, _error('Idempotency-Key ya usada con otro contenido', 422)
+    return None, _reproducir(previa)
+
+
+def _cerrar_demorada(registro, futuro):
+    """Resuelve la clave de una escritura demorada cuando el escritor la termina"""
+    if futuro.exception() is not None:
+        registro.delete()
+        return
+    response = JsonResponse({
+        'success': True,
+        'message': 'La operación se aplicó después de agotarse la espera de la petición original'
+    })
+    registro.estado_http = response.status_code
+    registro.tipo_contenido = response.get('Content-Type', '')
+    registro.contenido = response.content
+    registro.save(update_fields=['estado_http', 'tipo_contenido', 'contenido'])
+
+
+def _guardar(registro, response):
+    if response.status_code >= 500 or getattr(response, 'streaming', False):
+        # Error del servidor: el cliente debe poder reintentar de verdad
+        registro.delete()
+        return
+    registro.estado_http = response.status_code
+    registro.tipo_contenido = response.get('Content-Type', '')
+    registro.contenido = response.content
+    registro.save(update_fields=['estado_http', 'tipo_contenido', 'contenido'])
+
+
+def idempotente(vista):
+    @wraps(vista)
+    def envoltura(request, *args, **kwargs):
+        clave = request.headers.get(CABECERA)
+        if not clave or request.method in ('GET', 'HEAD', 'OPTIONS'):
+            return vista(request, *args, **kwargs)
+        if len(clave) > LARGO_MAXIMO_CLAVE:
+            return _error(f'{CABECERA} no puede superar {LARGO_MAXIMO_CLAVE} caracteres', 400)
+
+        alcance = f'{request.method} {request.path}'[:255]
+        huella = hashlib.sha256(request.body).hexdigest()
+        registro, respuesta = _reservar(clave, alcance, huella)
+        if respuesta is not None:
+            return respuesta
+
+        # Con el escritor único la vista no escribe en este hilo: abrir aquí una
+        # transacción (BEGIN IMMEDIATE) bloquearía al escritor mientras se espera
+        atomica = nullcontext() if escritor.activo else transaction.atomic()
+        try:
+            with atomica:
+                response = vista(request, *args, **kwargs)
+                if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                    response.render()
+                futuro = getattr(response, 'escritura_demorada', None)
+                if futuro is None:
+                    _guardar(registro, response)
+        except BaseException:
+            registro.delete()
+            raise
+
+        if futuro is not None:
+            # Queda en proceso (los reintentos reciben 409) hasta que el escritor termine
+            futuro.add_done_callback(lambda futuro: _cerrar_demorada(registro, futuro))
+        return response
+
+    return envoltura
@@ -0,0 +1,12 @@
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from idempotencia.models import RespuestaIdempotente
+
+
+class Command(BaseCommand):
+    help = 'Elimina las respuestas guardadas por Idempotency-Key que ya vencieron'
+
+    def handle(self, *args, **options):
+        borradas, _ = RespuestaIdempotente.objects.filter(expira_en__lte=timezone.now()).delete()
+        self.stdout.write(self.style.SUCCESS(f'Respuestas idempotentes eliminadas: {borradas}'))
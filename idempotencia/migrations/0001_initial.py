@@ -0,0 +1,33 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:27
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='RespuestaIdempotente',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('clave', models.CharField(max_length=255)),
+                ('alcance', models.CharField(max_length=255)),
+                ('huella', models.CharField(max_length=64)),
+                ('estado_http', models.PositiveSmallIntegerField(blank=True, null=True)),
+                ('tipo_contenido', models.CharField(blank=True, max_length=100)),
+                ('contenido', models.BinaryField(default=b'')),
+                ('creada_en', models.DateTimeField(auto_now_add=True)),
+                ('expira_en', models.DateTimeField()),
+            ],
+            options={
+                'db_table': 'respuestas_idempotentes',
+                'indexes': [models.Index(fields=['expira_en'], name='idempotencia_expira_idx')],
+                'unique_together': {('clave', 'alcance')},
+            },
+        ),
+    ]
@@ -0,0 +1,31 @@
+from django.db import models
+
+
+class RespuestaIdempotente(models.Model):
+    """
+    Respuesta guardada de una petición con cabecera Idempotency-Key.
+    Mientras la vista se ejecuta la fila existe con estado_http nulo.
+    Se purgan al vencer con: python manage.py purgar_idempotencia
+    """
+    clave = models.CharField(max_length=255)
+    # Método y ruta: la misma clave en otro endpoint es otra petición
+    alcance = models.CharField(max_length=255)
+    # SHA-256 del cuerpo: detecta una clave reutilizada con otro contenido
+    huella = models.CharField(max_length=64)
+    
+    estado_http = models.PositiveSmallIntegerField(null=True, blank=True)
+    tipo_contenido = models.CharField(max_length=100, blank=True)
+    contenido = models.BinaryField(default=b'')
+    
+    creada_en = models.DateTimeField(auto_now_add=True)
+    expira_en = models.DateTimeField()
+    
+    class Meta:
+        db_table = 'respuestas_idempotentes'
+        unique_together = ['clave', 'alcance']
+        indexes = [
+            models.Index(fields=['expira_en'], name='idempotencia_expira_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.alcance} [{self.clave}] → {self.estado_http or 'en proceso'}"
@@ -0,0 +1,118 @@
+from concurrent.futures import Future
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.test import TestCase
+from django.utils import timezone
+
+from encomiendas.models import Encomienda
+from pasajes.models import Pasaje
+from rendimiento.escritor import EscrituraDemorada
+from rutas.tests import crear_salida
+from .models import RespuestaIdempotente
+
+
+class IdempotencyKeyTests(TestCase):
+
+    def setUp(self):
+        self.salida = crear_salida(1, capacidad=4)
+        self.url = f'/api/salida/{self.salida.id}/vender/'
+
+    def vender(self, clave=None, asiento=1, dni='40404040'):
+        headers = {'Idempotency-Key': clave} if clave else {}
+        return self.client.post(self.url, {'nombre': 'maria quispe', 'dni': dni, 'asiento': asiento},
+                                content_type='application/json', headers=headers)
+
+    def test_reintento_devuelve_la_respuesta_original_sin_volver_a_vender(self):
+        primera = self.vender('clave-1')
+        segunda = self.vender('clave-1')
+
+        self.assertEqual(primera.status_code, 200)
+        self.assertEqual(segunda.status_code, 200)
+        self.assertEqual(segunda.content, primera.content)
+        self.assertEqual(segunda['Idempotent-Replayed'], 'true')
+        self.assertNotIn('Idempotent-Replayed', primera)
+        self.assertEqual(Pasaje.objects.count(), 1)
+
+    def test_sin_clave_no_cambia_el_comportamiento(self):
+        self.assertEqual(self.vender().status_code, 200)
+        self.assertEqual(self.vender().status_code, 409)
+        self.assertFalse(RespuestaIdempotente.objects.exists())
+
+    def test_errores_del_cliente_tambien_se_reproducen(self):
+        self.vender(asiento=1)
+        conflicto = self.vender('clave-2', asiento=1, dni='50505050')
+        Pasaje.objects.all().delete()
+
+        repetido = self.vender('clave-2', asiento=1, dni='50505050')
+
+        self.assertEqual(repetido.status_code, 409)
+        self.assertEqual(repetido.content, conflicto.content)
+        self.assertFalse(Pasaje.objects.exists())
+
+    def test_la_venta_y_su_respuesta_se_confirman_juntas(self):
+        with mock.patch.object(RespuestaIdempotente, 'save', side_effect=RuntimeError('caída')):
+            with self.assertRaises(RuntimeError):
+                self.vender('clave-4')
+
+        self.assertFalse(Pasaje.objects.exists())
+        self.assertFalse(RespuestaIdempotente.objects.exists())
+        self.assertEqual(self.vender('clave-4').status_code, 200)
+
+    def test_clave_reutilizada_con_otro_contenido(self):
+        self.vender('clave-3', asiento=1)
+        self.assertEqual(self.vender('clave-3', asiento=2).status_code, 422)
+
+    def test_peticion_en_proceso_y_abandonada(self):
+        RespuestaIdempotente.objects.create(
+            clave='clave-4', alcance=f'POST {self.url}', huella='x', expira_en=timezone.now() + timedelta(hours=1)
+        )
+        en_proceso = self.vender('clave-4')
+        self.assertEqual(en_proceso.status_code, 409)
+        self.assertEqual(en_proceso['Retry-After'], '1')
+
+        RespuestaIdempotente.objects.update(creada_en=timezone.now() - timedelta(minutes=10))
+        self.assertEqual(self.vender('clave-4').status_code, 200)
+
+    def test_escritura_demorada_deja_la_clave_en_proceso(self):
+        futuros = [Future(), Future()]
+        with mock.patch('pasajes.views.escribir', side_effect=[EscrituraDemorada(f) for f in futuros]):
+            demorada = self.vender('clave-6')
+            self.assertEqual(demorada.status_code, 503)
+            self.assertEqual(demorada['Retry-After'], '5')
+            # Mientras el escritor no termina, reintentar no vuelve a ejecutar la vista
+            self.assertEqual(self.vender('clave-6').status_code, 409)
+
+            futuros[0].set_result(None)
+            repetida = self.vender('clave-6')
+            self.assertEqual(repetida.status_code, 200)
+            self.assertEqual(repetida['Idempotent-Replayed'], 'true')
+
+            # Si la escritura falló, la clave se libera y el reintento se ejecuta
+            self.vender('clave-7')
+            futuros[1].set_exception(RuntimeError('revertida'))
+        self.assertFalse(RespuestaIdempotente.objects.filter(clave='clave-7').exists())
+        self.assertEqual(self.vender('clave-7').status_code, 200)
+
+    def test_otros_endpoints_de_alta(self):
+        datos = {
+            'remitente_nombre': 'Ana', 'remitente_telefono': '999888777',
+            'destinatario_nombre': 'Luis', 'destinatario_telefono': '999111222',
+            'descripcion': 'Caja', 'peso_kg': '3.0'
+        }
+        for _ in range(2):
+            response = self.client.post(f'/api/salida/{self.salida.id}/encomienda/', datos,
+                                        content_type='application/json', headers={'Idempotency-Key': 'enc-1'})
+            self.assertEqual(response.status_code, 200)
+        self.assertEqual(Encomienda.objects.count(), 1)
+
+    def test_purgar_vencidas(self):
+        self.vender('clave-5')
+        RespuestaIdempotente.objects.update(expira_en=timezone.now() - timedelta(seconds=1))
+
+        call_command('purgar_idempotencia', stdout=StringIO())
+
+        self.assertFalse(RespuestaIdempotente.objects.exists())
+        self.assertEqual(self.vender('clave-5', asiento=2).status_code, 200)
@@ -0,0 +1,225 @@
+"""
+Servicio de asignación de asientos
+
+Toda venta o reserva de asiento pasa por aquí: la validación de cupo y el
+INSERT ocurren en una sola transacción y las escrituras sobre una misma
+salida se serializan, así dos ventanillas nunca compiten por el mismo
+asiento ni sobrevenden la camioneta.
+"""
+import threading
+from contextlib import contextmanager
+
+from django.db import IntegrityError, transaction
+from django.db.models import F
+
+from rendimiento.eventos import fecha_local, publicar_al_confirmar
+from rutas.models import Salida
+from .errores import AsientoInvalido, AsientoOcupado, AsientoRetenido, RetencionInvalida, SinCupo
+from . import ocupacion
+from .models import Pasaje
+from .retenciones import retenciones
+
+# Candados en franjas: acotados en memoria y sin crear uno por salida
+_CANDADOS = [threading.Lock() for _ in range(64)]
+
+
+def asientos_libres(salida, cerca_de=None):
+    """Asientos libres (ni vendidos ni retenidos), ordenados por cercanía a `cerca_de` si se indica"""
+    ocupados = set(ocupacion.asientos_ocupados(salida))
+    ocupados.update(retenciones.retenidos(salida.id, salida.vehiculo.capacidad))
+    libres = [a for a in range(1, salida.vehiculo.capacidad + 1) if a not in ocupados]
+    if cerca_de:
+        libres.sort(key=lambda a: (abs(a - cerca_de), a))
+    return libres
+
+
+@contextmanager
+def bloquear_salida(salida_id):
+    """
+    Abre una transacción con la salida bloqueada para escritura y la entrega.
+
+    El candado en memoria ordena a los hilos del mismo proceso; el UPDATE sin
+    cambios toma el bloqueo de fila (PostgreSQL) o el de escritura (SQLite)
+    antes de cualquier lectura, lo que serializa a los demás procesos.
+    """
+    with _CANDADOS[salida_id % len(_CANDADOS)]:
+        with transaction.atomic():
+            if not Salida.objects.filter(pk=salida_id).update(pasajeros_count=F('pasajeros_count')):
+                raise Salida.DoesNotExist('Salida no encontrada')
+            yield Salida.objects.select_related('ruta', 'vehiculo').get(pk=salida_id)
+
+
+def validar_asiento(salida, asiento):
+    capacidad = salida.vehiculo.capacidad
+    if asiento < 1 or asiento > capacidad:
+        raise AsientoInvalido(f'Asiento inválido. Debe ser entre 1 y {capacidad}')
+    if salida.pasajeros_count >= capacidad:
+        raise SinCupo('No hay cupos disponibles en esta salida', asientos_alternativos=[])
+
+
+def retener_asiento(salida_id, asiento, token=None):
+    """
+    Retiene un asiento libre mientras se completan los datos del pasajero.
+    Enviar el token de la retención vigente la renueva.
+    """
+    salida = Salida.objects.select_related('vehiculo').get(pk=salida_id)
+    validar_asiento(salida, asiento)
+    if ocupacion.esta_ocupado(salida, asiento):
+        raise AsientoOcupado(
+            f'El asiento {asiento} ya está ocupado',
+            asientos_alternativos=asientos_libres(salida, cerca_de=asiento)
+        )
+    return retenciones.retener(salida.id, asiento, token=token, fecha=fecha_local(salida.fecha_hora))
+
+
+def liberar_retencion(token):
+    retencion = retenciones.liberar(token)
+    if retencion is None:
+        raise RetencionInvalida('Retención no encontrada o vencida')
+    return retencion
+
+
+def asignar_asiento(salida_id, asiento, nombre, dni, telefono='', tipo_pasaje='vendido',
+                    precio=None, reservado_por=None, estado='pagado', token_retencion=None):
+    """
+    Crea el pasaje del asiento indicado y devuelve (pasaje, salida).
+
+    Lanza Salida.DoesNotExist, AsientoInvalido, SinCupo, AsientoRetenido (retenido
+    con otro token) o AsientoOcupado; los dos últimos incluyen `asientos_alternativos`
+    con los asientos libres más cercanos.
+    """
+    with bloquear_salida(salida_id) as salida:
+        validar_asiento(salida, asiento)
+        try:
+            retenciones.verificar(salida.id, asiento, token_retencion)
+        except AsientoRetenido as e:
+            e.extra['asientos_alternativos'] = asientos_libres(salida, cerca_de=asiento)
+            raise
+        if ocupacion.esta_ocupado(salida, asiento):
+            raise AsientoOcupado(
+                f'El asiento {asiento} ya está ocupado',
+                asientos_alternativos=asientos_libres(salida, cerca_de=asiento)
+            )
+        try:
+            with transaction.atomic():
+                pasaje = Pasaje.objects.create(
+                    salida=salida,
+                    nombre=nombre,
+                    dni=dni,
+                    telefono=telefono,
+                    asiento=asiento,
+                    tipo_pasaje=tipo_pasaje,
+                    precio=salida.ruta.precio_pasaje if precio is None else precio,
+                    reservado_por=reservado_por,
+                    estado=estado
+                )
+        except IntegrityError:
+            raise AsientoOcupado(
+                f'El asiento {asiento} ya está ocupado',
+                asientos_alternativos=asientos_libres(salida, cerca_de=asiento)
+            )
+        salida.pasajeros_count += 1
+        salida.version += 1
+        if token_retencion:
+            # Hasta confirmar la venta (escritor único, Idempotency-Key) el asiento sigue retenido
+            transaction.on_commit(lambda: retenciones.liberar(token_retencion))
+    return pasaje, salida
+
+
+def elegir_asientos(libres, cantidad):
+    """Primer bloque contiguo de `cantidad` asientos libres; si no existe, los de menor número"""
+    libres = sorted(libres)
+    for i in range(len(libres) - cantidad + 1):
+        if libres[i + cantidad - 1] - libres[i] == cantidad - 1:
+            return libres[i:i + cantidad]
+    return libres[:cantidad]
+
+
+def mapa_asientos(salida, ocupados):
+    """Mapa de asientos de la salida a partir de los asientos ocupados ya conocidos"""
+    capacidad = salida.vehiculo.capacidad
+    retenidos = set(retenciones.retenidos(salida.id, capacidad)) - set(ocupados)
+    return {
+        'capacidad': capacidad,
+        'ocupados': sorted(ocupados),
+        'retenidos': sorted(retenidos),
+        'disponibles': [a for a in range(1, capacidad + 1) if a not in ocupados and a not in retenidos],
+    }
+
+
+def asignar_grupo(salida_id, pasajeros, precio=None, estado='pagado'):
+    """
+    Vende varios asientos de una salida en una sola transacción y devuelve
+    (pasajes, salida, mapa de asientos).
+
+    Cada pasajero es un dict con nombre, dni, telefono, asiento (None para
+    asignación automática) y opcionalmente token_retencion. Si algún asiento
+    no se puede vender no se crea ningún pasaje.
+    """
+    with bloquear_salida(salida_id) as salida:
+        capacidad = salida.vehiculo.capacidad
+        ocupados = set(ocupacion.asientos_ocupados(salida))
+        tokens = {p.get('token_retencion') for p in pasajeros if p.get('token_retencion')}
+        retenidos_por_otros = {
+            asiento for asiento, retencion in retenciones.retenidos(salida.id, capacidad).items()
+            if retencion.token not in tokens
+        }
+
+        def alternativas():
+            return sorted(set(range(1, capacidad + 1)) - ocupados - retenidos_por_otros)
+
+        explicitos = [p['asiento'] for p in pasajeros if p.get('asiento') is not None]
+        if len(explicitos) != len(set(explicitos)):
+            raise AsientoInvalido('Hay asientos repetidos en la solicitud')
+        for asiento in explicitos:
+            if asiento < 1 or asiento > capacidad:
+                raise AsientoInvalido(f'Asiento inválido. Debe ser entre 1 y {capacidad}')
+            if asiento in ocupados:
+                raise AsientoOcupado(f'El asiento {asiento} ya está ocupado',
+                                     asientos_alternativos=alternativas())
+            if asiento in retenidos_por_otros:
+                raise AsientoRetenido(f'El asiento {asiento} está retenido por otra ventanilla',
+                                      asientos_alternativos=alternativas())
+
+        por_asignar = len(pasajeros) - len(explicitos)
+        automaticos = elegir_asientos(
+            [a for a in alternativas() if a not in explicitos], por_asignar
+        )
+        if len(automaticos) < por_asignar:
+            raise SinCupo(
+                f'No hay cupo para {len(pasajeros)} pasajeros en esta salida',
+                asientos_alternativos=alternativas()
+            )
+
+        automaticos = iter(automaticos)
+        nuevos = [
+            Pasaje(
+                salida=salida,
+                nombre=p['nombre'],
+                dni=p['dni'],
+                telefono=p.get('telefono', ''),
+                asiento=p['asiento'] if p.get('asiento') is not None else next(automaticos),
+                precio=salida.ruta.precio_pasaje if precio is None else precio,
+                estado=estado
+            )
+            for p in pasajeros
+        ]
+        try:
+            with transaction.atomic():
+                # bulk_create no pasa por Pasaje.save(): contador y mapa de ocupación se ajustan aquí
+                pasajes = Pasaje.objects.bulk_create(nuevos)
+                Salida.objects.filter(pk=salida.pk).ajustar_contadores(pasajeros=len(pasajes))
+                ocupacion.registrar_cambio(salida.id, salida.version + 1, marcar=[p.asiento for p in pasajes])
+                publicar_al_confirmar(
+                    'asiento_vendido', salida.id, fecha_local(salida.fecha_hora),
+                    asientos=[p.asiento for p in pasajes], tipo_pasaje='vendido'
+                )
+        except IntegrityError:
+            raise AsientoOcupado('Uno de los asientos ya está ocupado', asientos_alternativos=alternativas())
+        salida.pasajeros_count += len(pasajes)
+        salida.version += 1
+        ocupados.update(p.asiento for p in pasajes)
+        for token in tokens:
+            transaction.on_commit(lambda token=token: retenciones.liberar(token))
+
+    return pasajes, salida, mapa_asientos(salida, ocupados)
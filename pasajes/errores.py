@@ -0,0 +1,30 @@
+class ErrorAsiento(Exception):
+    """Error de negocio al vender, reservar o retener un asiento"""
+    status = 400
+
+    def __init__(self, mensaje, **extra):
+        super().__init__(mensaje)
+        self.extra = extra
+
+    def como_dict(self):
+        return {'error': str(self), **self.extra}
+
+
+class AsientoInvalido(ErrorAsiento):
+    pass
+
+
+class AsientoOcupado(ErrorAsiento):
+    status = 409
+
+
+class AsientoRetenido(ErrorAsiento):
+    status = 409
+
+
+class SinCupo(ErrorAsiento):
+    status = 409
+
+
+class RetencionInvalida(ErrorAsiento):
+    status = 404
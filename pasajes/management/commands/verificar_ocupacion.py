@@ -0,0 +1,41 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from pasajes import ocupacion
+from rutas.models import Salida
+
+
+class Command(BaseCommand):
+    help = 'Compara el mapa de ocupación de asientos en caché con la tabla de pasajes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--salida', type=int, action='append', dest='salidas',
+                            help='ID de salida a verificar (se puede repetir). '
+                                 'Por defecto: las salidas programadas o en curso desde ayer')
+        parser.add_argument('--reparar', action='store_true',
+                            help='Reconstruir desde la base de datos los mapas inconsistentes')
+
+    def handle(self, *args, **options):
+        if options['salidas']:
+            salida_ids = options['salidas']
+        else:
+            salida_ids = list(Salida.objects.filter(
+                estado__in=['programada', 'en_curso'],
+                fecha_hora__gte=timezone.now() - timedelta(days=1)
+            ).values_list('pk', flat=True))
+
+        inconsistentes = ocupacion.verificar(salida_ids)
+        self.stdout.write(f'Salidas verificadas: {len(salida_ids)}, inconsistentes: {len(inconsistentes)}')
+        for salida_id, en_cache, reales in inconsistentes[:50]:
+            self.stdout.write(f'  - salida {salida_id}: caché {en_cache} / tabla {reales}')
+
+        if options['reparar']:
+            for salida_id, _, _ in inconsistentes:
+                ocupacion.descartar(salida_id)
+                if Salida.objects.filter(pk=salida_id).exists():
+                    ocupacion.reconstruir(salida_id)
+            self.stdout.write(self.style.SUCCESS(f'Mapas reparados: {len(inconsistentes)}'))
+        elif inconsistentes:
+            self.stderr.write(self.style.ERROR('Hay mapas de ocupación inconsistentes (usar --reparar)'))
@@ -0,0 +1,212 @@
+"""
+Manifiesto de viaje en PDF
+
+El PDF se guarda en caché con la versión de contenido de la salida como
+parte de la clave: cualquier alta, cambio o baja de un pasaje incrementa
+Salida.version y la siguiente descarga lo vuelve a generar. Ruta, vehículo
+y conductor no tienen versión propia: la clave lleva además un resumen de
+los datos suyos que imprime el PDF (ya cargados con select_related), así
+editar la ruta, la placa o el nombre del conductor también lo regenera.
+Las descargas repetidas antes de partir se sirven desde la caché sin tocar
+ReportLab. Por eso el PDF no imprime la hora en que se generó (sería la de
+la primera descarga) sino la de los datos: la última modificación de la
+salida y su versión de contenido. Con invariant el mismo contenido produce
+los mismos bytes.
+
+La vista de descarga no renderiza: si el PDF no está en caché encola la
+tarea manifiesto_pdf (pasajes.tareas) y responde 202. La caché
+(MANIFIESTO_PDF_CACHE) tiene que ser compartida con el worker de
+procesar_tareas para que la descarga siguiente lo encuentre.
+"""
+import hashlib
+from functools import lru_cache
+from io import BytesIO
+
+from django.conf import settings
+from django.core.cache import caches
+from django.utils import timezone
+from reportlab.lib import colors
+from reportlab.lib.pagesizes import A4
+from reportlab.lib.styles import ParagraphStyle, getSampleStyleSheet
+from reportlab.lib.units import inch
+from reportlab.platypus import Paragraph, SimpleDocTemplate, Spacer, Table, TableStyle
+
+from rendimiento.prometheus import observar_cache
+from .models import Pasaje
+
+# 24 horas: la salida ya partió mucho antes de que la entrada venza
+TIEMPO_CACHE = 60 * 60 * 24
+
+
+@lru_cache(maxsize=1)
+def _estilos():
+    """Hojas de estilo y estilos de tabla: se construyen una sola vez por proceso"""
+    styles = getSampleStyleSheet()
+    encabezado = [
+        ('TEXTCOLOR', (0, 0), (1, 0), colors.whitesmoke),
+        ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+        ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+        ('FONTSIZE', (0, 0), (-1, 0), 12),
+        ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+        ('GRID', (0, 0), (-1, -1), 1, colors.black),
+    ]
+    return {
+        'normal': styles['Normal'],
+        'titulo': ParagraphStyle(
+            'CustomTitle',
+            parent=styles['Heading1'],
+            fontSize=16,
+            spaceAfter=30,
+            alignment=1  # Centrado
+        ),
+        'info': TableStyle([
+            ('BACKGROUND', (0, 0), (1, 0), colors.grey),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
+            *encabezado,
+        ]),
+        'estadisticas': TableStyle([
+            ('BACKGROUND', (0, 0), (1, 0), colors.blue),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.lightblue),
+            *encabezado,
+        ]),
+        'pasajeros': TableStyle([
+            ('BACKGROUND', (0, 0), (-1, 0), colors.green),
+            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
+            ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
+            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
+            ('FONTSIZE', (0, 0), (-1, 0), 10),
+            ('FONTSIZE', (0, 1), (-1, -1), 8),
+            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
+            ('BACKGROUND', (0, 1), (-1, -1), colors.lightgreen),
+            ('GRID', (0, 0), (-1, -1), 1, colors.black),
+            ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
+        ]),
+        'pie': TableStyle([
+            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
+            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('TEXTCOLOR', (0, 0), (-1, -1), colors.grey),
+        ]),
+    }
+
+
+def renderizar_manifiesto_pdf(salida):
+    """Genera el PDF del manifiesto (salida con ruta, vehículo y conductor cargados)"""
+    estilos = _estilos()
+    buffer = BytesIO()
+    doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5*inch, invariant=True)
+    elements = []
+
+    # TÍTULO
+    elements.append(Paragraph("MANIFIESTO DE VIAJE", estilos['titulo']))
+    elements.append(Spacer(1, 20))
+
+    # INFORMACIÓN DEL VIAJE
+    info_data = [
+        ['INFORMACIÓN DEL VIAJE', ''],
+        ['Ruta:', salida.ruta.nombre],
+        ['Origen:', salida.ruta.origen],
+        ['Destino:', salida.ruta.destino],
+        ['Fecha y Hora:', salida.fecha_hora.strftime('%d/%m/%Y %H:%M')],
+        ['Vehículo:', salida.vehiculo.placa],
+        ['Conductor:', salida.conductor.get_full_name() or salida.conductor.username],
+        ['Capacidad:', f"{salida.vehiculo.capacidad} asientos"],
+    ]
+    info_table = Table(info_data, colWidths=[2*inch, 4*inch])
+    info_table.setStyle(estilos['info'])
+    elements.append(info_table)
+    elements.append(Spacer(1, 30))
+
+    # PASAJEROS Y ESTADÍSTICAS en una sola consulta y una sola pasada
+    pasajes = list(
+        Pasaje.objects.filter(salida=salida).order_by('asiento').values_list(
+            'asiento', 'nombre', 'dni', 'telefono', 'tipo_pasaje', 'estado', 'precio'
+        )
+    )
+    pasajes_vendidos = 0
+    reservas_conductor = 0
+    ingresos_generados = 0
+    pasajeros_data = [['ASIENTO', 'NOMBRE', 'DNI', 'TELÉFONO', 'TIPO', 'ESTADO']]
+    for asiento, nombre, dni, telefono, tipo_pasaje, estado, precio in pasajes:
+        if tipo_pasaje == 'vendido':
+            pasajes_vendidos += 1
+            ingresos_generados += float(precio)
+        elif tipo_pasaje == 'reserva_conductor':
+            reservas_conductor += 1
+        pasajeros_data.append([
+            str(asiento),
+            nombre,
+            dni,
+            telefono or 'N/A',
+            '🚛 Reserva Conductor' if tipo_pasaje == 'reserva_conductor' else '🎫 Vendido',
+            '✅ Abordado' if estado == 'abordado' else '⏳ Pendiente',
+        ])
+    total_pasajeros = len(pasajes)
+
+    stats_data = [
+        ['ESTADÍSTICAS DEL VIAJE', ''],
+        ['Total Pasajeros:', str(total_pasajeros)],
+        ['Pasajes Vendidos:', str(pasajes_vendidos)],
+        ['Reservas del Conductor:', str(reservas_conductor)],
+        ['Asientos Disponibles:', str(salida.vehiculo.capacidad - total_pasajeros)],
+        ['Ingresos Generados:', f"S/ {ingresos_generados:.2f}"],
+    ]
+    stats_table = Table(stats_data, colWidths=[2*inch, 2*inch])
+    stats_table.setStyle(estilos['estadisticas'])
+    elements.append(stats_table)
+    elements.append(Spacer(1, 30))
+
+    # LISTA DE PASAJEROS
+    if pasajes:
+        pasajeros_table = Table(pasajeros_data, colWidths=[0.8*inch, 2*inch, 1*inch, 1.2*inch, 1.5*inch, 1*inch])
+        pasajeros_table.setStyle(estilos['pasajeros'])
+        elements.append(pasajeros_table)
+    else:
+        elements.append(Paragraph("No hay pasajeros registrados para este viaje.", estilos['normal']))
+
+    # FOOTER
+    elements.append(Spacer(1, 30))
+    footer_data = [
+        ['Datos al:', f"{timezone.localtime(salida.updated_at):%d/%m/%Y %H:%M:%S} (versión {salida.version})"],
+        ['Sistema:', 'Transporte Rural - Manifiesto Digital'],
+    ]
+    footer_table = Table(footer_data, colWidths=[2*inch, 4*inch])
+    footer_table.setStyle(estilos['pie'])
+    elements.append(footer_table)
+
+    doc.build(elements)
+    return buffer.getvalue()
+
+
+def _datos_relacionados(salida):
+    """Lo que el PDF imprime de la ruta, el vehículo y el conductor"""
+    return (
+        salida.ruta.nombre, salida.ruta.origen, salida.ruta.destino,
+        salida.vehiculo.placa, salida.vehiculo.capacidad,
+        salida.conductor.get_full_name() or salida.conductor.username,
+    )
+
+
+def clave_manifiesto(salida):
+    resumen = hashlib.sha1('|'.join(map(str, _datos_relacionados(salida))).encode()).hexdigest()[:12]
+    return f'manifiesto_pdf:{salida.id}:v{salida.version}:{resumen}'
+
+
+def _cache():
+    return caches[getattr(settings, 'MANIFIESTO_PDF_CACHE', 'default')]
+
+
+def manifiesto_en_cache(salida):
+    """PDF ya generado para la versión actual de la salida, o None"""
+    pdf = _cache().get(clave_manifiesto(salida))
+    observar_cache('manifiesto_pdf', pdf is not None)
+    return pdf
+
+
+def obtener_manifiesto_pdf(salida):
+    """PDF del manifiesto para la versión actual de la salida, desde caché si existe"""
+    pdf = manifiesto_en_cache(salida)
+    if pdf is None:
+        pdf = renderizar_manifiesto_pdf(salida)
+        _cache().set(clave_manifiesto(salida), pdf, TIEMPO_CACHE)
+    return pdf
@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('pasajes', '0003_pasaje_reservado_por_pasaje_tipo_pasaje'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='pasaje',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, db_index=True),
+        ),
+    ]
@@ -1,5 +1,6 @@
-from django.db import models
+from django.db import models, transaction
 from rutas.models import Salida
+from . import ocupacion
 
 class Pasaje(models.Model):
     # ESTADOS = Flujo del pasaje (reservado → pagado → abordado)
@@ -41,6 +42,7 @@ class Pasaje(models.Model):
     )
     
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)
     
     class Meta:
         db_table = 'pasajes'
@@ -58,6 +60,18 @@ class Pasaje(models.Model):
         
         return f"{tipo_emoji}{estado_emoji} {self.nombre} - Asiento {self.asiento}"
     
+    def save(self, *args, **kwargs):
+        # El pasaje y el contador/versión de la salida se confirman juntos
+        # (la baja se descuenta en signals.descontar_pasaje)
+        nuevo = self._state.adding
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+            salidas = Salida.objects.filter(pk=self.salida_id)
+            salidas.ajustar_contadores(pasajeros=1 if nuevo else 0)
+            # El asiento no cambia después de la venta: solo el alta lo marca
+            version = salidas.values_list('version', flat=True).get()
+            ocupacion.registrar_cambio(self.salida_id, version, marcar=[self.asiento] if nuevo else [])
+    
     @property
     def es_reserva_conductor(self):
         return self.tipo_pasaje == 'reserva_conductor'
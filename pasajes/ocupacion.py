@@ -0,0 +1,130 @@
+"""
+Mapa de bits de ocupación de asientos por salida
+
+La caché guarda por salida un entero cuyo bit i indica que el asiento i
+tiene pasaje (vendido o reserva del conductor), junto con la Salida.version
+a la que corresponde. Las lecturas comparan esa versión con la de la salida
+que ya tienen cargada: si coincide no tocan la tabla de pasajes; si no, lo
+reconstruyen con una sola consulta.
+
+Las escrituras de pasajes lo actualizan de forma incremental después del
+COMMIT, solo si la entrada en caché es la de la versión inmediatamente
+anterior; en cualquier otro caso la descartan y la próxima lectura la
+reconstruye. OCUPACION_CACHE es por defecto la caché 'compartida' (en
+archivos, o Redis o Memcached) para que todos los workers vean el mismo
+mapa: con una caché por proceso cada worker tendría el suyo y solo vería
+sus propias escrituras.
+"""
+from django.conf import settings
+from django.core.cache import caches
+from django.db import transaction
+
+from rendimiento.prometheus import observar_cache
+from rutas.models import Salida
+
+TIEMPO_CACHE = 60 * 60 * 24
+
+
+def _cache():
+    return caches[getattr(settings, 'OCUPACION_CACHE', 'default')]
+
+
+def clave_ocupacion(salida_id):
+    return f'ocupacion:{salida_id}'
+
+
+def asientos_a_bits(asientos):
+    bits = 0
+    for asiento in asientos:
+        bits |= 1 << asiento
+    return bits
+
+
+def bits_a_asientos(bits):
+    return [asiento for asiento in range(1, bits.bit_length()) if bits >> asiento & 1]
+
+
+def calcular_ocupacion(salida_id):
+    """
+    (versión, bits) leídos de la base de datos. Versión y asientos salen del
+    mismo SELECT, así el mapa siempre corresponde a la versión guardada.
+    """
+    filas = list(
+        Salida.objects.filter(pk=salida_id).order_by().values_list('version', 'pasajes__asiento')
+    )
+    if not filas:
+        raise Salida.DoesNotExist('Salida no encontrada')
+    return filas[0][0], asientos_a_bits(asiento for _, asiento in filas if asiento)
+
+
+def reconstruir(salida_id):
+    version, bits = calcular_ocupacion(salida_id)
+    _cache().set(clave_ocupacion(salida_id), (version, bits), TIEMPO_CACHE)
+    return version, bits
+
+
+def obtener_bits(salida):
+    """Mapa de bits de la salida (instancia cargada, se usa su version)"""
+    entrada = _cache().get(clave_ocupacion(salida.id))
+    acierto = entrada is not None and entrada[0] == salida.version
+    observar_cache('ocupacion', acierto)
+    if acierto:
+        return entrada[1]
+    return reconstruir(salida.id)[1]
+
+
+def asientos_ocupados(salida):
+    return bits_a_asientos(obtener_bits(salida))
+
+
+def esta_ocupado(salida, asiento):
+    return bool(obtener_bits(salida) >> asiento & 1)
+
+
+def registrar_cambio(salida_id, version_nueva, marcar=(), desmarcar=()):
+    """
+    Aplica al mapa en caché la escritura que llevó la salida a `version_nueva`
+    cuando la transacción en curso se confirme (no se aplica si se revierte).
+    """
+    def aplicar():
+        cache = _cache()
+        clave = clave_ocupacion(salida_id)
+        entrada = cache.get(clave)
+        if entrada is not None and entrada[0] >= version_nueva:
+            # Una lectura ya lo reconstruyó con esta escritura incluida
+            return
+        if entrada is None or entrada[0] != version_nueva - 1:
+            cache.delete(clave)
+            return
+        bits = (entrada[1] | asientos_a_bits(marcar)) & ~asientos_a_bits(desmarcar)
+        cache.set(clave, (version_nueva, bits), TIEMPO_CACHE)
+
+    transaction.on_commit(aplicar)
+
+
+def descartar(salida_id):
+    _cache().delete(clave_ocupacion(salida_id))
+
+
+def verificar(salida_ids):
+    """
+    Compara el mapa en caché con la tabla de pasajes y devuelve las
+    inconsistencias como (salida_id, asientos_en_cache, asientos_reales).
+    Las entradas ausentes o de una versión anterior no son inconsistencias:
+    la próxima lectura las reconstruye.
+    """
+    cache = _cache()
+    entradas = cache.get_many([clave_ocupacion(salida_id) for salida_id in salida_ids])
+    inconsistentes = []
+    for salida_id in salida_ids:
+        entrada = entradas.get(clave_ocupacion(salida_id))
+        if entrada is None:
+            continue
+        try:
+            version, bits = calcular_ocupacion(salida_id)
+        except Salida.DoesNotExist:
+            inconsistentes.append((salida_id, bits_a_asientos(entrada[1]), []))
+            continue
+        if entrada[0] == version and entrada[1] != bits:
+            inconsistentes.append((salida_id, bits_a_asientos(entrada[1]), bits_a_asientos(bits)))
+    return inconsistentes
@@ -0,0 +1,66 @@
+"""
+Proyecciones de los listados de pasajes (ver rendimiento.proyecciones)
+
+El orden de las columnas es el orden de las claves en el JSON.
+"""
+from rendimiento.proyecciones import Columna, Proyeccion, fecha_hora_iso, nombre_completo, telefono_o_na
+
+
+def es_reserva_conductor(tipo_pasaje):
+    return tipo_pasaje == 'reserva_conductor'
+
+
+def genera_ingresos(tipo_pasaje):
+    return tipo_pasaje == 'vendido'
+
+
+def reservado_por(tipo_pasaje, usuario_id, nombres, apellidos, username):
+    if tipo_pasaje != 'reserva_conductor' or usuario_id is None:
+        return None
+    return {'id': usuario_id, 'nombre': nombre_completo(nombres, apellidos, username)}
+
+
+def tipo_manifiesto(tipo_pasaje):
+    return 'Reserva del Conductor' if tipo_pasaje == 'reserva_conductor' else 'Pasaje Vendido'
+
+
+# get_pasajes_salida
+PASAJES_SALIDA = Proyeccion(
+    Columna('id'),
+    Columna('nombre'),
+    Columna('dni'),
+    Columna('telefono'),
+    Columna('asiento'),
+    Columna('precio', convertir=float),
+    Columna('estado'),
+    Columna('fecha_venta', 'created_at', convertir=fecha_hora_iso),
+    Columna('tipo_pasaje'),
+    Columna('es_reserva_conductor', 'tipo_pasaje', convertir=es_reserva_conductor),
+    Columna('genera_ingresos', 'tipo_pasaje', convertir=genera_ingresos),
+    Columna(
+        'reservado_por', 'tipo_pasaje', 'reservado_por_id', 'reservado_por__first_name',
+        'reservado_por__last_name', 'reservado_por__username',
+        convertir=reservado_por, omitir_nulos=True
+    ),
+)
+
+# get_manifiesto_conductor
+PASAJEROS_CONDUCTOR = Proyeccion(
+    Columna('asiento'),
+    Columna('nombre'),
+    Columna('dni'),
+    Columna('telefono', convertir=telefono_o_na),
+    Columna('estado'),
+    Columna('tipo', 'tipo_pasaje', convertir=tipo_manifiesto),
+    Columna('precio', convertir=float),
+)
+
+# get_manifiesto_salida
+PASAJEROS_MANIFIESTO = Proyeccion(
+    Columna('nombre'),
+    Columna('dni'),
+    Columna('asiento'),
+    Columna('telefono'),
+    Columna('precio', convertir=float),
+    Columna('estado'),
+)
@@ -0,0 +1,209 @@
+"""
+Retenciones temporales de asientos
+
+Mientras la ventanilla escribe los datos del pasajero el asiento elegido
+queda retenido con un token que vence solo. Las retenciones se guardan en
+RETENCION_CACHE (por defecto la caché 'compartida'), así una retención
+tomada en un worker la respetan las ventas de todos los demás, sin tocar la
+base de datos al consultarlas. Cada retención vive en dos claves que vencen
+con ella: la del asiento (token, vencimiento) y la del token (salida y
+asiento), para liberarla solo con el token.
+
+Retener, liberar y vencer publican los eventos en vivo de la salida
+(rendimiento.eventos). El difusor es del proceso: cada proceso recuerda las
+retenciones que tomó y un hilo de barrido publica las que vencen cada
+RETENCION_BARRIDO_SEGUNDOS.
+"""
+import math
+import secrets
+import threading
+import time
+from dataclasses import dataclass
+from datetime import date
+
+from django.conf import settings
+from django.core.cache import caches
+
+from rendimiento.eventos import difusor
+from .errores import AsientoRetenido
+
+
+@dataclass
+class Retencion:
+    token: str
+    salida_id: int
+    asiento: int
+    expira: float
+    fecha: date = None  # día local de la salida, para los suscriptores por día
+
+    @property
+    def vigente(self):
+        return self.expira > time.time()
+
+    @property
+    def segundos_restantes(self):
+        return max(0, int(self.expira - time.time()))
+
+    def como_dict(self):
+        return {
+            'token': self.token,
+            'salida_id': self.salida_id,
+            'asiento': self.asiento,
+            'expira_en': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime(self.expira)),
+            'segundos_restantes': self.segundos_restantes,
+        }
+
+
+def clave_asiento(salida_id, asiento):
+    return f'retencion:{salida_id}:{asiento}'
+
+
+def clave_token(token):
+    return f'retencion:token:{token}'
+
+
+def _retenido_por_otra(retencion):
+    return AsientoRetenido(
+        f'El asiento {retencion.asiento} está retenido por otra ventanilla',
+        segundos_restantes=retencion.segundos_restantes
+    )
+
+
+class AlmacenRetenciones:
+
+    def __init__(self, duracion=None, intervalo_barrido=None):
+        self._duracion = duracion
+        self._intervalo_barrido = intervalo_barrido
+        self._candado = threading.Lock()
+        self._propias = {}  # token -> Retencion tomadas en este proceso, para publicar su vencimiento
+        self._barrido = None
+
+    @property
+    def duracion(self):
+        return self._duracion or getattr(settings, 'RETENCION_ASIENTO_SEGUNDOS', 300)
+
+    @property
+    def intervalo_barrido(self):
+        return self._intervalo_barrido or getattr(settings, 'RETENCION_BARRIDO_SEGUNDOS', 30)
+
+    def _cache(self):
+        return caches[getattr(settings, 'RETENCION_CACHE', 'default')]
+
+    def _vigente(self, salida_id, asiento):
+        retencion = self._cache().get(clave_asiento(salida_id, asiento))
+        return retencion if retencion is not None and retencion.vigente else None
+
+    def retener(self, salida_id, asiento, token=None, fecha=None):
+        """
+        Retiene el asiento y devuelve la Retencion. Si se envía el token de una
+        retención vigente del mismo asiento, la renueva.
+        """
+        self.iniciar_barrido()
+        cache = self._cache()
+        clave = clave_asiento(salida_id, asiento)
+        actual = self._vigente(salida_id, asiento)
+        if actual and actual.token != token:
+            raise _retenido_por_otra(actual)
+        retencion = Retencion(
+            token=token if actual else secrets.token_urlsafe(16),
+            salida_id=salida_id,
+            asiento=asiento,
+            expira=time.time() + self.duracion,
+            fecha=fecha
+        )
+        # La caché vence la clave un poco después que la retención (segundos enteros)
+        segundos = math.ceil(self.duracion) + 1
+        if actual:
+            cache.set(clave, retencion, segundos)
+        elif not cache.add(clave, retencion, segundos):
+            # Otra ventanilla la tomó entre la lectura y la escritura
+            otra = self._vigente(salida_id, asiento)
+            if otra is not None:
+                raise _retenido_por_otra(otra)
+            cache.set(clave, retencion, segundos)
+        cache.set(clave_token(retencion.token), (salida_id, asiento), segundos)
+        with self._candado:
+            self._propias[retencion.token] = retencion
+        difusor.publicar(
+            'asiento_retenido', salida_id, fecha, asientos=[asiento], segundos=retencion.segundos_restantes
+        )
+        return retencion
+
+    def liberar(self, token):
+        cache = self._cache()
+        ubicacion = cache.get(clave_token(token))
+        retencion = cache.get(clave_asiento(*ubicacion)) if ubicacion else None
+        if retencion is None or retencion.token != token:
+            cache.delete(clave_token(token))
+            with self._candado:
+                self._propias.pop(token, None)
+            return None
+        cache.delete_many([clave_asiento(retencion.salida_id, retencion.asiento), clave_token(token)])
+        with self._candado:
+            self._propias.pop(token, None)
+        self._publicar_liberadas([retencion])
+        return retencion
+
+    def obtener(self, token):
+        ubicacion = self._cache().get(clave_token(token))
+        retencion = self._vigente(*ubicacion) if ubicacion else None
+        if retencion and retencion.token == token:
+            return retencion
+        return None
+
+    def retenidos(self, salida_id, capacidad):
+        """Retenciones vigentes de la salida: {asiento: Retencion}, con una sola lectura de la caché"""
+        claves = {clave_asiento(salida_id, asiento): asiento for asiento in range(1, capacidad + 1)}
+        return {
+            claves[clave]: retencion
+            for clave, retencion in self._cache().get_many(claves).items()
+            if retencion.vigente
+        }
+
+    def verificar(self, salida_id, asiento, token=None):
+        """Lanza AsientoRetenido si el asiento está retenido con un token distinto"""
+        retencion = self._vigente(salida_id, asiento)
+        if retencion and retencion.token != token:
+            raise _retenido_por_otra(retencion)
+
+    def purgar_vencidas(self):
+        """Publica el vencimiento de las retenciones de este proceso (la caché ya las descarta sola)"""
+        with self._candado:
+            vencidas = [r for r in self._propias.values() if not r.vigente]
+            for retencion in vencidas:
+                del self._propias[retencion.token]
+        # Solo las que nadie renovó ni vendió entretanto
+        vencidas = [r for r in vencidas if self._vigente(r.salida_id, r.asiento) is None]
+        self._publicar_liberadas(vencidas)
+        return len(vencidas)
+
+    def _publicar_liberadas(self, liberadas):
+        for retencion in liberadas:
+            difusor.publicar('retencion_liberada', retencion.salida_id, retencion.fecha, asientos=[retencion.asiento])
+
+    def limpiar(self):
+        with self._candado:
+            propias = list(self._propias.values())
+            self._propias.clear()
+        self._cache().delete_many([
+            clave for r in propias for clave in (clave_asiento(r.salida_id, r.asiento), clave_token(r.token))
+        ])
+
+    def iniciar_barrido(self):
+        if self._barrido and self._barrido.is_alive():
+            return
+        with self._candado:
+            if self._barrido and self._barrido.is_alive():
+                return
+            self._barrido = threading.Thread(
+                target=self._barrer, name='barrido-retenciones', daemon=True
+            )
+            self._barrido.start()
+
+    def _barrer(self):
+        while True:
+            time.sleep(self.intervalo_barrido)
+            self.purgar_vencidas()
+
+
+retenciones = AlmacenRetenciones()
@@ -0,0 +1,25 @@
+from django.db.models.signals import post_delete
+from django.dispatch import receiver
+
+from rutas.models import Salida
+from . import ocupacion
+from .models import Pasaje
+
+
+@receiver(post_delete, sender=Pasaje)
+def descontar_pasaje(sender, instance, origin=None, **kwargs):
+    """Descuenta el pasaje eliminado del contador de su salida (misma transacción del DELETE)"""
+    if isinstance(origin, Salida) or getattr(origin, 'model', None) is Salida:
+        # La salida completa se está eliminando
+        return
+    salidas = Salida.objects.filter(pk=instance.salida_id)
+    salidas.ajustar_contadores(pasajeros=-1)
+    version = salidas.values_list('version', flat=True).first()
+    if version is not None:
+        ocupacion.registrar_cambio(instance.salida_id, version, desmarcar=[instance.asiento])
+
+
+@receiver(post_delete, sender=Salida)
+def descartar_ocupacion(sender, instance, **kwargs):
+    """Un id de salida eliminada puede reutilizarse: su mapa de ocupación no debe sobrevivirla"""
+    ocupacion.descartar(instance.pk)
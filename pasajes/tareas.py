@@ -0,0 +1,35 @@
+from rutas.models import Salida
+from tareas.cola import Resultado, encolar, tarea
+from tareas.models import Tarea
+from .manifiesto import obtener_manifiesto_pdf
+
+
+def validar_manifiesto(parametros):
+    # Solo el conductor de la salida puede pedir su manifiesto
+    salida_id = int(parametros.get('salida_id', 0))
+    conductor_id = int(parametros.get('conductor_id', 0))
+    if not Salida.objects.filter(id=salida_id).exists():
+        raise LookupError('Salida no encontrada')
+    if not Salida.objects.filter(id=salida_id, conductor_id=conductor_id).exists():
+        raise PermissionError('No tienes permisos para descargar este manifiesto')
+
+
+@tarea('manifiesto_pdf', validar=validar_manifiesto)
+def generar_manifiesto_pdf(parametros):
+    salida = Salida.objects.select_related('ruta', 'vehiculo', 'conductor').get(id=parametros['salida_id'])
+    return Resultado(
+        contenido=obtener_manifiesto_pdf(salida),
+        tipo='application/pdf',
+        nombre=f'manifiesto_salida_{salida.id}_v{salida.version}.pdf'
+    )
+
+
+def encolar_manifiesto(salida):
+    """Tarea manifiesto_pdf de la salida; reutiliza la que ya esté pendiente o en proceso"""
+    en_curso = Tarea.objects.filter(
+        tipo='manifiesto_pdf', estado__in=('pendiente', 'en_proceso'),
+        parametros__salida_id=salida.id, parametros__conductor_id=salida.conductor_id
+    ).defer('resultado').first()
+    if en_curso is not None:
+        return en_curso
+    return encolar('manifiesto_pdf', {'salida_id': salida.id, 'conductor_id': salida.conductor_id})
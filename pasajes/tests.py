@@ -1,3 +1,466 @@
-from django.test import TestCase
+import json
+import threading
+import time
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
 
-# Create your tests here.
+from django.core.cache import caches
+from django.core.management import call_command
+from django.db import connection, transaction
+from django.test import TestCase, TransactionTestCase, override_settings, tag
+
+from rendimiento import benchmarks
+from rutas.models import Salida
+from rutas.tests import crear_salida
+from tareas.cola import ejecutar_pendientes
+from tareas.models import Tarea
+from . import manifiesto, ocupacion
+from .asientos import asignar_asiento, retener_asiento
+from .errores import AsientoOcupado, AsientoRetenido, SinCupo
+from .models import Pasaje
+from .retenciones import AlmacenRetenciones, retenciones
+
+
+class VenderPasajeTests(TestCase):
+
+    def setUp(self):
+        self.salida = crear_salida(1, capacidad=4)
+        self.url = f'/api/salida/{self.salida.id}/vender/'
+
+    def vender(self, asiento, **extra):
+        datos = {'nombre': 'maria quispe', 'dni': '40404040', 'asiento': asiento, **extra}
+        return self.client.post(self.url, datos, content_type='application/json')
+
+    def test_venta_correcta(self):
+        response = self.vender(2)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['capacidad_disponible'], 3)
+        pasaje = Pasaje.objects.get(salida=self.salida)
+        self.assertEqual((pasaje.nombre, pasaje.asiento, pasaje.precio), ('Maria Quispe', 2, Decimal('25.00')))
+
+    def test_asiento_ocupado_responde_409_con_alternativas(self):
+        self.vender(2)
+        self.vender(3)
+
+        response = self.vender(2)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['asientos_alternativos'], [1, 4])
+        self.assertEqual(Pasaje.objects.filter(salida=self.salida).count(), 2)
+
+    def test_sin_cupo_responde_409(self):
+        for asiento in range(1, 5):
+            self.vender(asiento)
+
+        response = self.vender(1)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['asientos_alternativos'], [])
+
+    def test_asiento_fuera_de_rango(self):
+        self.assertEqual(self.vender(5).status_code, 400)
+        self.assertEqual(self.vender('x').status_code, 400)
+
+    def test_salida_inexistente(self):
+        response = self.client.post('/api/salida/999/vender/', {'nombre': 'Ana', 'dni': '1', 'asiento': 1},
+                                    content_type='application/json')
+        self.assertEqual(response.status_code, 404)
+
+    def test_reserva_conductor_en_asiento_ocupado(self):
+        self.vender(1)
+        url = f'/api/salida/{self.salida.id}/reservar-conductor/'
+        datos = {'nombre': 'Primo', 'dni': '12345678', 'asiento': 1, 'conductor_id': self.salida.conductor_id}
+
+        response = self.client.post(url, json.dumps(datos), content_type='application/json')
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(response.json()['success'])
+        self.assertEqual(response.json()['asientos_alternativos'], [2, 3, 4])
+
+
+class VentaGrupoTests(TestCase):
+
+    def setUp(self):
+        retenciones.limpiar()
+        self.addCleanup(retenciones.limpiar)
+        self.salida = crear_salida(1, capacidad=8)
+        self.url = f'/api/salida/{self.salida.id}/vender-grupo/'
+
+    def vender_grupo(self, asientos):
+        pasajeros = [
+            {'nombre': f'familiar {i}', 'dni': f'7000000{i}', 'asiento': asiento}
+            for i, asiento in enumerate(asientos)
+        ]
+        return self.client.post(self.url, {'pasajeros': pasajeros}, content_type='application/json')
+
+    def test_asignacion_automatica_en_bloque_contiguo(self):
+        Pasaje.objects.create(salida=self.salida, nombre='X', dni='1', asiento=2, precio=Decimal('25'))
+
+        # 5 sentencias + 4 SAVEPOINT/RELEASE, sin importar el tamaño del grupo
+        with self.assertNumQueries(9):
+            response = self.vender_grupo(['auto', 'auto', 'auto'])
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([p['asiento'] for p in data['pasajes']], [3, 4, 5])
+        self.assertEqual(data['total'], 75.0)
+        self.assertEqual(data['capacidad_disponible'], 4)
+        self.assertEqual(data['mapa_asientos']['disponibles'], [1, 6, 7, 8])
+        self.salida.refresh_from_db()
+        self.assertEqual(self.salida.pasajeros_count, 4)
+
+    def test_mezcla_asientos_explicitos_y_automaticos(self):
+        response = self.vender_grupo([1, 'auto', 8])
+
+        self.assertEqual([p['asiento'] for p in response.json()['pasajes']], [1, 2, 8])
+
+    def test_todo_o_nada(self):
+        self.vender_grupo([5])
+
+        response = self.vender_grupo([4, 5, 'auto'])
+
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(Pasaje.objects.filter(salida=self.salida).count(), 1)
+
+    def test_grupo_mayor_al_cupo(self):
+        response = self.vender_grupo(['auto'] * 9)
+
+        self.assertEqual(response.status_code, 409)
+        self.assertFalse(Pasaje.objects.filter(salida=self.salida).exists())
+
+    def test_asientos_repetidos(self):
+        self.assertEqual(self.vender_grupo([3, 3]).status_code, 400)
+
+    def test_asientos_fuera_de_rango(self):
+        # 0 es un asiento explícito inválido, no "asignar automáticamente"
+        for asientos in ([0, 'auto'], [-1], [9]):
+            self.assertEqual(self.vender_grupo(asientos).status_code, 400, asientos)
+        self.assertFalse(Pasaje.objects.filter(salida=self.salida).exists())
+
+
+class RetencionAsientosTests(TestCase):
+
+    def setUp(self):
+        retenciones.limpiar()
+        self.addCleanup(retenciones.limpiar)
+        self.salida = crear_salida(1, capacidad=4)
+
+    def retener(self, asiento, **extra):
+        return self.client.post(f'/api/salida/{self.salida.id}/retener/', {'asiento': asiento, **extra},
+                                content_type='application/json')
+
+    def vender(self, asiento, **extra):
+        datos = {'nombre': 'Ana', 'dni': '40404040', 'asiento': asiento, **extra}
+        return self.client.post(f'/api/salida/{self.salida.id}/vender/', datos, content_type='application/json')
+
+    def test_venta_respeta_la_retencion(self):
+        token = self.retener(2).json()['retencion']['token']
+
+        self.assertEqual(self.retener(2).status_code, 409)
+        response = self.vender(2)
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.json()['asientos_alternativos'], [1, 3, 4])
+
+        # La retención se libera cuando la venta se confirma, no antes
+        with self.captureOnCommitCallbacks(execute=True):
+            self.assertEqual(self.vender(2, token_retencion=token).status_code, 200)
+            self.assertIn(2, retenciones.retenidos(self.salida.id, 4))
+        self.assertEqual(retenciones.retenidos(self.salida.id, 4), {})
+
+    def test_no_retiene_asiento_vendido(self):
+        self.vender(1)
+        self.assertEqual(self.retener(1).status_code, 409)
+
+    def test_liberar(self):
+        token = self.retener(3).json()['retencion']['token']
+
+        response = self.client.delete(f'/api/retencion/{token}/liberar/')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(self.client.delete(f'/api/retencion/{token}/liberar/').status_code, 404)
+        self.assertEqual(self.vender(3).status_code, 200)
+
+    def test_mapa_de_asientos_informa_retenidos_sin_consultas_extra(self):
+        self.vender(1)
+        self.retener(2)
+        url = f'/api/salida/{self.salida.id}/asientos-conductor/'
+        # No depende del mapa de ocupación: sin él tampoco hay consultas extra
+        ocupacion.descartar(self.salida.id)
+
+        with self.assertNumQueries(2):
+            data = self.client.get(url).json()
+
+        self.assertEqual(data['asientos_disponibles'], [3, 4])
+        self.assertEqual([r['asiento'] for r in data['asientos_retenidos']], [2])
+
+    def test_retenciones_vencen_y_se_purgan(self):
+        almacen = AlmacenRetenciones(duracion=0.01, intervalo_barrido=0.01)
+        almacen.retener(self.salida.id, 1)
+        time.sleep(0.2)
+
+        self.assertEqual(almacen.retenidos(self.salida.id, 4), {})
+        self.assertEqual(almacen._propias, {})
+
+    def test_retencion_visible_desde_otro_proceso(self):
+        token = self.retener(2).json()['retencion']['token']
+        # Otro worker: su propio almacén, la misma caché compartida
+        otro = AlmacenRetenciones()
+
+        with self.assertRaises(AsientoRetenido):
+            otro.verificar(self.salida.id, 2)
+        self.assertEqual(otro.liberar(token).asiento, 2)
+        self.assertEqual(retenciones.retenidos(self.salida.id, 4), {})
+
+    def test_venta_revertida_conserva_la_retencion(self):
+        token = self.retener(3).json()['retencion']['token']
+
+        with self.captureOnCommitCallbacks(execute=True):
+            with self.assertRaises(RuntimeError), transaction.atomic():
+                asignar_asiento(self.salida.id, 3, nombre='Ana', dni='1', token_retencion=token)
+                raise RuntimeError('falla después de vender')
+
+        self.assertEqual(retenciones.obtener(token).asiento, 3)
+
+
+def salida_con_relaciones(salida):
+    return Salida.objects.select_related('ruta', 'vehiculo', 'conductor').get(pk=salida.pk)
+
+
+class ManifiestoPdfTests(TestCase):
+
+    def setUp(self):
+        caches['compartida'].clear()
+        self.salida = crear_salida(1, pasajeros=3)
+        self.url = f'/api/salida/{self.salida.id}/manifiesto-pdf/?conductor_id={self.salida.conductor_id}'
+
+    def descargar(self):
+        """Descarga como la app: si responde 202, espera al worker y repite"""
+        response = self.client.get(self.url)
+        if response.status_code == 202:
+            ejecutar_pendientes()
+            response = self.client.get(self.url)
+        return response
+
+    def test_sin_cache_encola_la_tarea_sin_renderizar(self):
+        with mock.patch.object(manifiesto, 'renderizar_manifiesto_pdf') as renderizar:
+            primera = self.client.get(self.url)
+            segunda = self.client.get(self.url)
+
+        self.assertEqual(primera.status_code, 202)
+        renderizar.assert_not_called()
+        # Mientras está pendiente se reutiliza la misma tarea
+        self.assertEqual(primera.json()['tarea_id'], segunda.json()['tarea_id'])
+        self.assertEqual(Tarea.objects.count(), 1)
+
+        ejecutar_pendientes()
+        estado = self.client.get(primera.json()['estado_url']).json()
+        self.assertEqual(estado['tarea']['estado'], 'completada')
+        self.assertTrue(self.client.get(primera.json()['resultado_url']).content.startswith(b'%PDF'))
+
+    @override_settings(MANIFIESTO_PDF_SINCRONO=True)
+    def test_modo_sincrono(self):
+        response = self.client.get(self.url)
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(Tarea.objects.exists())
+
+    def test_descarga_repetida_no_vuelve_a_renderizar(self):
+        with mock.patch.object(manifiesto, 'renderizar_manifiesto_pdf',
+                               wraps=manifiesto.renderizar_manifiesto_pdf) as renderizar:
+            primera = self.descargar()
+            with self.assertNumQueries(1):
+                segunda = self.client.get(self.url)
+
+        self.assertEqual(primera['Content-Type'], 'application/pdf')
+        self.assertTrue(primera.content.startswith(b'%PDF'))
+        self.assertEqual(primera.content, segunda.content)
+        self.assertEqual(renderizar.call_count, 1)
+
+    def test_mismo_contenido_mismo_pdf(self):
+        salida = salida_con_relaciones(self.salida)
+
+        self.assertEqual(manifiesto.renderizar_manifiesto_pdf(salida), manifiesto.renderizar_manifiesto_pdf(salida))
+
+    def test_cambio_en_un_pasaje_invalida_el_pdf(self):
+        primera = self.descargar()
+        pasaje = Pasaje.objects.get(salida=self.salida, asiento=1)
+        pasaje.estado = 'abordado'
+        pasaje.save()
+
+        with mock.patch.object(manifiesto, 'renderizar_manifiesto_pdf',
+                               wraps=manifiesto.renderizar_manifiesto_pdf) as renderizar:
+            segunda = self.descargar()
+
+        self.assertEqual(renderizar.call_count, 1)
+        self.assertNotEqual(primera.content, segunda.content)
+
+    def test_cambio_en_ruta_vehiculo_o_conductor_invalida_el_pdf(self):
+        claves = [manifiesto.clave_manifiesto(salida_con_relaciones(self.salida))]
+        for objeto, campo, valor in (
+            (self.salida.ruta, 'destino', 'Juliaca'),
+            (self.salida.vehiculo, 'placa', 'ZZZ-999'),
+            (self.salida.conductor, 'first_name', 'Rosa'),
+        ):
+            setattr(objeto, campo, valor)
+            objeto.save()
+            claves.append(manifiesto.clave_manifiesto(salida_con_relaciones(self.salida)))
+
+        self.assertEqual(len(set(claves)), 4)
+
+    @tag('benchmark')
+    @override_settings(MANIFIESTO_PDF_SINCRONO=True)
+    def test_benchmark_frio_vs_caliente(self):
+        def medir(repeticiones, limpiar):
+            tiempos = []
+            for _ in range(repeticiones):
+                if limpiar:
+                    caches['compartida'].clear()
+                t0 = time.perf_counter()
+                self.client.get(self.url)
+                tiempos.append(time.perf_counter() - t0)
+            return sorted(tiempos)[len(tiempos) // 2] * 1000
+
+        frio = medir(10, limpiar=True)
+        caliente = medir(50, limpiar=False)
+
+        self.assertLess(caliente, frio)
+        benchmarks.logger.info(
+            f'[benchmark] manifiesto PDF p50 frío {frio:.2f} ms / caliente {caliente:.2f} ms '
+            f'({frio / caliente:.1f}x)'
+        )
+
+
+class OcupacionBitmapTests(TestCase):
+
+    def setUp(self):
+        caches['compartida'].clear()
+        self.salida = crear_salida(1, pasajeros=2, capacidad=8)
+        self.salida.refresh_from_db()
+
+    def test_escrituras_actualizan_el_mapa_sin_reconstruirlo(self):
+        self.assertEqual(ocupacion.asientos_ocupados(self.salida), [1, 2])
+
+        with self.captureOnCommitCallbacks(execute=True):
+            asignar_asiento(self.salida.id, 5, nombre='ana', dni='50505050')
+        with self.captureOnCommitCallbacks(execute=True):
+            Pasaje.objects.get(salida=self.salida, asiento=1).delete()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(f'/api/salida/{self.salida.id}/vender-grupo/', {
+                'pasajeros': [{'nombre': 'luis', 'dni': '60606060', 'asiento': 7}]
+            }, content_type='application/json')
+
+        self.salida.refresh_from_db()
+        with self.assertNumQueries(0):
+            self.assertEqual(ocupacion.asientos_ocupados(self.salida), [2, 5, 7])
+
+    def test_version_desfasada_se_reconstruye(self):
+        ocupacion.asientos_ocupados(self.salida)
+        # Sin ejecutar on_commit la entrada queda en la versión anterior
+        Pasaje.objects.create(salida=self.salida, nombre='X', dni='1', asiento=6, precio=Decimal('25'))
+
+        self.salida.refresh_from_db()
+        with self.assertNumQueries(1):
+            self.assertEqual(ocupacion.asientos_ocupados(self.salida), [1, 2, 6])
+
+    def test_lecturas_usan_el_mapa(self):
+        ocupacion.asientos_ocupados(self.salida)
+        url = f'/api/salida/{self.salida.id}/asientos-conductor/'
+
+        data = self.client.get(url).json()
+
+        self.assertEqual(data['asientos_disponibles'], [3, 4, 5, 6, 7, 8])
+        with self.assertNumQueries(0):
+            self.assertTrue(ocupacion.esta_ocupado(self.salida, 2))
+        with self.assertRaises(AsientoOcupado):
+            retener_asiento(self.salida.id, 2)
+
+    def test_verificador_detecta_y_repara(self):
+        ocupacion.asientos_ocupados(self.salida)
+        caches['compartida'].set(ocupacion.clave_ocupacion(self.salida.id), (self.salida.version, 0b10))
+        self.assertEqual(ocupacion.verificar([self.salida.id]), [(self.salida.id, [1], [1, 2])])
+
+        salida_cmd = StringIO()
+        call_command('verificar_ocupacion', '--salida', str(self.salida.id), '--reparar',
+                     stdout=salida_cmd, stderr=StringIO())
+
+        self.assertIn('inconsistentes: 1', salida_cmd.getvalue())
+        self.assertEqual(ocupacion.verificar([self.salida.id]), [])
+        self.assertEqual(ocupacion.asientos_ocupados(self.salida), [1, 2])
+
+    @tag('benchmark')
+    def test_benchmark_lecturas_mapa_de_asientos(self):
+        for asiento in range(3, 7):
+            Pasaje.objects.create(salida=self.salida, nombre='X', dni=str(asiento), asiento=asiento,
+                                  precio=Decimal('25'))
+        self.salida.refresh_from_db()
+
+        def lecturas_por_segundo(leer, repeticiones=2000):
+            t0 = time.perf_counter()
+            for _ in range(repeticiones):
+                leer()
+            return repeticiones / (time.perf_counter() - t0)
+
+        tabla = lecturas_por_segundo(lambda: sorted(
+            Pasaje.objects.filter(salida=self.salida).values_list('asiento', flat=True)
+        ))
+        mapa = lecturas_por_segundo(lambda: ocupacion.asientos_ocupados(self.salida))
+
+        self.assertGreater(mapa, tabla)
+        benchmarks.logger.info(
+            f'[benchmark] mapa de asientos: tabla {tabla:,.0f} lecturas/s / '
+            f'bitmap en caché {mapa:,.0f} lecturas/s ({mapa / tabla:.1f}x)'
+        )
+
+
+@tag('stress')
+class VentaConcurrenteTests(TransactionTestCase):
+    """Varias ventanillas vendiendo a la vez la misma salida"""
+
+    HILOS = 8
+    INTENTOS_POR_HILO = 10
+
+    def test_no_hay_sobreventa(self):
+        salida = crear_salida(1, capacidad=15)
+        resultados = {'vendidos': 0, 'rechazados': 0, 'errores': []}
+        candado = threading.Lock()
+        inicio = threading.Barrier(self.HILOS)
+
+        def ventanilla(numero):
+            inicio.wait()
+            try:
+                for intento in range(self.INTENTOS_POR_HILO):
+                    # Todas las ventanillas pelean por los mismos asientos
+                    asiento = (intento + numero) % 15 + 1
+                    try:
+                        asignar_asiento(salida.id, asiento, nombre=f'P{numero}-{intento}', dni='12345678')
+                        clave = 'vendidos'
+                    except (AsientoOcupado, SinCupo):
+                        clave = 'rechazados'
+                    with candado:
+                        resultados[clave] += 1
+            except Exception as e:
+                with candado:
+                    resultados['errores'].append(repr(e))
+            finally:
+                connection.close()
+
+        hilos = [threading.Thread(target=ventanilla, args=(n,)) for n in range(self.HILOS)]
+        t0 = time.perf_counter()
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - t0
+
+        self.assertEqual(resultados['errores'], [])
+        self.assertEqual(resultados['vendidos'], 15)
+        self.assertEqual(resultados['vendidos'] + resultados['rechazados'], self.HILOS * self.INTENTOS_POR_HILO)
+        self.assertEqual(Pasaje.objects.filter(salida=salida).count(), 15)
+        self.assertEqual(Salida.objects.get(pk=salida.pk).pasajeros_count, 15)
+        intentos = self.HILOS * self.INTENTOS_POR_HILO
+        benchmarks.logger.info(
+            f'[stress] {intentos} intentos ({resultados["vendidos"]} vendidos) en {duracion:.3f}s: '
+            f'{intentos / duracion:.0f} operaciones de venta/s'
+        )
@@ -1,36 +1,43 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from idempotencia.decoradores import idempotente
+from rendimiento.condicional import condicional_salida, salida_solicitada
+from rendimiento.escritor import EscrituraDemorada, escribir, respuesta_demorada
 from .models import Pasaje
+from .proyecciones import PASAJEROS_CONDUCTOR, PASAJEROS_MANIFIESTO, PASAJES_SALIDA
+from .asientos import asignar_asiento, asignar_grupo, liberar_retencion, retener_asiento as servicio_retener_asiento
+from .errores import ErrorAsiento
+from .retenciones import retenciones
 from rutas.models import Salida
 
 
 
-from django.http import JsonResponse
+from rendimiento.json_rapido import JsonResponse
 from django.views.decorators.csrf import csrf_exempt
 from django.views.decorators.http import require_http_methods
 from django.utils import timezone
 import json
+from itertools import compress
 from usuarios.models import Usuario
 
+from django.conf import settings
 from django.http import HttpResponse
-from reportlab.lib.pagesizes import letter, A4
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib import colors
-from reportlab.lib.units import inch
-from io import BytesIO
+from .manifiesto import manifiesto_en_cache, obtener_manifiesto_pdf
+from .tareas import encolar_manifiesto
+from tareas.views import url_estado, url_resultado
 import datetime
 
 # AGREGAR estas funciones al final de pasajes/views.py
 
 @require_http_methods(["GET"])
+@condicional_salida()
 def get_pasajes_salida(request, salida_id):
     """
     Obtiene todos los pasajes de una salida - CON SEGURIDAD PARA CONDUCTORES
     """
     try:
-        salida = Salida.objects.get(id=salida_id)
+        salida = salida_solicitada(request, salida_id)
         
         # Verificar permisos si es conductor
         conductor_id = request.GET.get('conductor_id')
@@ -40,40 +47,13 @@ def get_pasajes_salida(request, salida_id):
                 'error': 'No tienes permisos para ver esta salida'
             })
         
-        pasajes = Pasaje.objects.filter(salida=salida).order_by('asiento')
-        
-        pasajes_data = []
-        total_ingresos = 0
+        # Solo las columnas del JSON, con el JOIN al usuario que reservó
+        pasajes = PASAJES_SALIDA.leer(Pasaje.objects.filter(salida=salida).order_by('asiento'))
         
-        for pasaje in pasajes:
-            pasaje_info = {
-                'id': pasaje.id,
-                'nombre': pasaje.nombre,
-                'dni': pasaje.dni,
-                'telefono': pasaje.telefono,
-                'asiento': pasaje.asiento,
-                'precio': float(pasaje.precio),
-                'estado': pasaje.estado,
-                'fecha_venta': pasaje.created_at.strftime('%Y-%m-%d %H:%M'),
-                'tipo_pasaje': pasaje.tipo_pasaje,
-                'es_reserva_conductor': pasaje.es_reserva_conductor,
-                'genera_ingresos': pasaje.genera_ingresos
-            }
-            
-            if pasaje.es_reserva_conductor and pasaje.reservado_por:
-                pasaje_info['reservado_por'] = {
-                    'id': pasaje.reservado_por.id,
-                    'nombre': pasaje.reservado_por.get_full_name() or pasaje.reservado_por.username
-                }
-            
-            pasajes_data.append(pasaje_info)
-            
-            if pasaje.genera_ingresos:
-                total_ingresos += pasaje.precio
-        
-        total_pasajes = len(pasajes_data)
-        pasajes_vendidos = len([p for p in pasajes_data if not p['es_reserva_conductor']])
-        reservas_conductor = len([p for p in pasajes_data if p['es_reserva_conductor']])
+        total_pasajes = len(pasajes)
+        reservas_conductor = sum(pasajes['es_reserva_conductor'])
+        pasajes_vendidos = total_pasajes - reservas_conductor
+        total_ingresos = round(sum(compress(pasajes['precio'], pasajes['genera_ingresos']), 0.0), 2)
         asientos_disponibles = salida.vehiculo.capacidad - total_pasajes
         
         return JsonResponse({
@@ -86,13 +66,13 @@ def get_pasajes_salida(request, salida_id):
                 'capacidad': salida.vehiculo.capacidad,
                 'conductor': salida.conductor.get_full_name() or salida.conductor.username
             },
-            'pasajes': pasajes_data,
+            'pasajes': pasajes.filas(),
             'estadisticas': {
                 'total_pasajes': total_pasajes,
                 'pasajes_vendidos': pasajes_vendidos,
                 'reservas_conductor': reservas_conductor,
                 'asientos_disponibles': asientos_disponibles,
-                'total_ingresos': float(total_ingresos),
+                'total_ingresos': total_ingresos,
                 'porcentaje_ocupacion': round((total_pasajes / salida.vehiculo.capacidad) * 100, 1) if salida.vehiculo.capacidad > 0 else 0
             }
         })
@@ -112,12 +92,13 @@ def get_pasajes_salida(request, salida_id):
 
 
 @require_http_methods(["GET"])
+@condicional_salida()
 def get_manifiesto_conductor(request, salida_id):
     """
     Manifiesto exclusivo para el conductor de la salida
     """
     try:
-        salida = Salida.objects.get(id=salida_id)
+        salida = salida_solicitada(request, salida_id)
         
         # VALIDAR QUE SEA EL CONDUCTOR DE LA SALIDA
         conductor_id = request.GET.get('conductor_id')
@@ -128,23 +109,13 @@ def get_manifiesto_conductor(request, salida_id):
             })
         
         # Obtener pasajeros de la salida
-        pasajes = Pasaje.objects.filter(salida=salida).order_by('asiento')
-        
-        pasajeros_data = []
-        for pasaje in pasajes:
-            pasajeros_data.append({
-                'asiento': pasaje.asiento,
-                'nombre': pasaje.nombre,
-                'dni': pasaje.dni,
-                'telefono': pasaje.telefono or 'N/A',
-                'estado': pasaje.estado,
-                'tipo': 'Reserva del Conductor' if pasaje.es_reserva_conductor else 'Pasaje Vendido',
-                'precio': float(pasaje.precio)
-            })
+        pasajeros = PASAJEROS_CONDUCTOR.leer(Pasaje.objects.filter(salida=salida).order_by('asiento'))
         
         # Estadísticas
-        total_pasajeros = len(pasajeros_data)
-        ingresos_generados = sum(p['precio'] for p in pasajeros_data if p['tipo'] == 'Pasaje Vendido')
+        total_pasajeros = len(pasajeros)
+        ingresos_generados = sum(
+            precio for precio, tipo in zip(pasajeros['precio'], pasajeros['tipo']) if tipo == 'Pasaje Vendido'
+        )
         
         return JsonResponse({
             'success': True,
@@ -165,7 +136,7 @@ def get_manifiesto_conductor(request, salida_id):
                         'nombre': salida.conductor.get_full_name() or salida.conductor.username
                     }
                 },
-                'pasajeros': pasajeros_data,
+                'pasajeros': pasajeros.filas(),
                 'estadisticas': {
                     'total_pasajeros': total_pasajeros,
                     'capacidad_vehiculo': salida.vehiculo.capacidad,
@@ -211,13 +182,15 @@ def check_in_pasajero(request, pasaje_id):
             })
         
         pasaje.estado = 'abordado'
-        pasaje.save()
+        escribir(pasaje.save)
         
         return JsonResponse({
             'success': True,
             'message': f'Check-in realizado para {pasaje.nombre}'
         })
         
+    except EscrituraDemorada as e:
+        return respuesta_demorada(e)
     except Pasaje.DoesNotExist:
         return JsonResponse({
             'success': False,
@@ -237,14 +210,11 @@ def check_in_pasajero(request, pasaje_id):
 
 
 
+@idempotente
 @api_view(['POST'])
 def vender_pasaje(request, salida_id):
     """Vender un pasaje para una salida"""
     try:
-        from rutas.models import Salida
-        from .models import Pasaje
-        
-        salida = Salida.objects.get(id=salida_id)
         data = request.data
         
         # Validaciones
@@ -255,34 +225,17 @@ def vender_pasaje(request, salida_id):
                     'error': f'El campo {field} es requerido'
                 }, status=400)
         
-        # Validar que el asiento no esté ocupado
         asiento = int(data['asiento'])
-        if Pasaje.objects.filter(salida=salida, asiento=asiento).exists():
-            return Response({
-                'error': f'El asiento {asiento} ya está ocupado'
-            }, status=400)
-        
-        # Validar que el asiento sea válido
-        if asiento < 1 or asiento > salida.vehiculo.capacidad:
-            return Response({
-                'error': f'Asiento inválido. Debe ser entre 1 y {salida.vehiculo.capacidad}'
-            }, status=400)
-        
-        # Validar que haya cupo disponible
-        if salida.capacidad_disponible <= 0:
-            return Response({
-                'error': 'No hay cupos disponibles en esta salida'
-            }, status=400)
-        
-        # Crear el pasaje
-        pasaje = Pasaje.objects.create(
-            salida=salida,
+        
+        # Cupo, rango del asiento e INSERT en una sola transacción por salida
+        pasaje, salida = escribir(
+            asignar_asiento,
+            salida_id,
+            asiento,
             nombre=data['nombre'].strip().title(),
             dni=data['dni'].strip(),
             telefono=data.get('telefono', '').strip(),
-            asiento=asiento,
-            precio=salida.ruta.precio_pasaje,
-            estado='pagado'
+            token_retencion=data.get('token_retencion')
         )
         
         return Response({
@@ -294,6 +247,10 @@ def vender_pasaje(request, salida_id):
             'capacidad_disponible': salida.capacidad_disponible
         })
         
+    except EscrituraDemorada as e:
+        return respuesta_demorada(e)
+    except ErrorAsiento as e:
+        return Response(e.como_dict(), status=e.status)
     except Salida.DoesNotExist:
         return Response({'error': 'Salida no encontrada'}, status=404)
     except ValueError:
@@ -304,29 +261,125 @@ def vender_pasaje(request, salida_id):
 
 
 
+@idempotente
+@api_view(['POST'])
+def vender_pasajes_grupo(request, salida_id):
+    """
+    Vender varios pasajes de una salida en una sola operación (familias, cuadrillas)
+    Cada pasajero: nombre, dni, telefono y asiento (número o "auto")
+    Todo o nada: si un asiento no se puede vender no se crea ningún pasaje
+    """
+    try:
+        pasajeros_data = request.data.get('pasajeros')
+        if not pasajeros_data or not isinstance(pasajeros_data, list):
+            return Response({'error': 'El campo pasajeros es requerido'}, status=400)
+        
+        pasajeros = []
+        for indice, data in enumerate(pasajeros_data, start=1):
+            for field in ['nombre', 'dni']:
+                if not data.get(field):
+                    return Response({
+                        'error': f'El campo {field} es requerido (pasajero {indice})'
+                    }, status=400)
+            asiento = data.get('asiento')
+            asiento = None if asiento in (None, '', 'auto') else int(asiento)
+            # El tope superior depende de la capacidad: lo valida asignar_grupo
+            if asiento is not None and asiento < 1:
+                return Response({
+                    'error': f'Asiento inválido: {asiento} (pasajero {indice})'
+                }, status=400)
+            pasajeros.append({
+                'nombre': data['nombre'].strip().title(),
+                'dni': data['dni'].strip(),
+                'telefono': data.get('telefono', '').strip(),
+                'asiento': asiento,
+                'token_retencion': data.get('token_retencion')
+            })
+        
+        pasajes, salida, mapa = escribir(asignar_grupo, salida_id, pasajeros)
+        
+        return Response({
+            'success': True,
+            'message': f'{len(pasajes)} pasajes vendidos correctamente',
+            'pasajes': [
+                {
+                    'pasaje_id': pasaje.id,
+                    'nombre': pasaje.nombre,
+                    'asiento': pasaje.asiento,
+                    'precio': float(pasaje.precio)
+                } for pasaje in pasajes
+            ],
+            'total': float(sum(pasaje.precio for pasaje in pasajes)),
+            'capacidad_disponible': salida.capacidad_disponible,
+            'mapa_asientos': mapa
+        })
+        
+    except EscrituraDemorada as e:
+        return respuesta_demorada(e)
+    except ErrorAsiento as e:
+        return Response(e.como_dict(), status=e.status)
+    except Salida.DoesNotExist:
+        return Response({'error': 'Salida no encontrada'}, status=404)
+    except (ValueError, TypeError, AttributeError):
+        return Response({'error': 'Datos de pasajeros inválidos'}, status=400)
+
+
+@idempotente
+@api_view(['POST'])
+def retener_asiento(request, salida_id):
+    """
+    Retener un asiento mientras la ventanilla completa los datos del pasajero
+    Enviar 'token_retencion' de una retención vigente la renueva
+    """
+    try:
+        if not request.data.get('asiento'):
+            return Response({'error': 'El campo asiento es requerido'}, status=400)
+        
+        retencion = servicio_retener_asiento(
+            salida_id,
+            int(request.data['asiento']),
+            token=request.data.get('token_retencion')
+        )
+        
+        return Response({
+            'success': True,
+            'message': f'Asiento {retencion.asiento} retenido por {retencion.segundos_restantes} segundos',
+            'retencion': retencion.como_dict()
+        })
+        
+    except ErrorAsiento as e:
+        return Response(e.como_dict(), status=e.status)
+    except Salida.DoesNotExist:
+        return Response({'error': 'Salida no encontrada'}, status=404)
+    except ValueError:
+        return Response({'error': 'Número de asiento inválido'}, status=400)
+
+
+@api_view(['DELETE'])
+def liberar_asiento(request, token):
+    """Liberar un asiento retenido (la ventanilla canceló la venta)"""
+    try:
+        retencion = liberar_retencion(token)
+        return Response({
+            'success': True,
+            'message': f'Asiento {retencion.asiento} liberado'
+        })
+    except ErrorAsiento as e:
+        return Response(e.como_dict(), status=e.status)
+
+
 # AGREGAR esta función en pasajes/views.py
 
+@condicional_salida()
 @api_view(['GET'])
 def get_manifiesto_salida(request, salida_id):
     """Obtener manifiesto de pasajeros para una salida"""
     try:
         from rutas.models import Salida
-        salida = Salida.objects.get(id=salida_id)
-        pasajes = salida.pasajes.filter(estado__in=['pagado', 'abordado']).order_by('asiento')
-        
-        pasajeros = []
-        saldo_total = 0
-        
-        for pasaje in pasajes:
-            pasajeros.append({
-                'nombre': pasaje.nombre,
-                'dni': pasaje.dni,
-                'asiento': pasaje.asiento,
-                'telefono': pasaje.telefono,
-                'precio': float(pasaje.precio),
-                'estado': pasaje.estado
-            })
-            saldo_total += float(pasaje.precio)
+        salida = salida_solicitada(request, salida_id)
+        pasajeros = PASAJEROS_MANIFIESTO.leer(
+            salida.pasajes.filter(estado__in=['pagado', 'abordado']).order_by('asiento')
+        )
         
         data = {
             'salida': {
@@ -338,9 +391,9 @@ def get_manifiesto_salida(request, salida_id):
                 'conductor': salida.conductor.get_full_name() or salida.conductor.username,
                 'capacidad': salida.vehiculo.capacidad
             },
-            'pasajeros': pasajeros,
+            'pasajeros': pasajeros.filas(),
             'total_pasajeros': len(pasajeros),
-            'saldo_total': saldo_total,
+            'saldo_total': sum(pasajeros['precio']),
             'capacidad_disponible': salida.capacidad_disponible
         }
         
@@ -352,6 +405,7 @@ def get_manifiesto_salida(request, salida_id):
 
 
 
+@idempotente
 @csrf_exempt
 @require_http_methods(["POST"])
 def reservar_asiento_conductor(request, salida_id):
@@ -386,19 +440,6 @@ def reservar_asiento_conductor(request, salida_id):
                 'error': 'El DNI debe tener exactamente 8 dígitos'
             })
         
-        if asiento < 1 or asiento > salida.vehiculo.capacidad:
-            return JsonResponse({
-                'success': False,
-                'error': f'Asiento inválido. Capacidad: {salida.vehiculo.capacidad}'
-            })
-        
-        # Verificar que el asiento esté disponible
-        if Pasaje.objects.filter(salida=salida, asiento=asiento).exists():
-            return JsonResponse({
-                'success': False,
-                'error': 'El asiento ya está ocupado'
-            })
-        
         # Verificar que el conductor puede reservar en esta salida
         if salida.conductor.id != conductor_id:
             return JsonResponse({
@@ -409,18 +450,24 @@ def reservar_asiento_conductor(request, salida_id):
         # Obtener el usuario conductor
         conductor = Usuario.objects.get(id=conductor_id)
         
-        # Crear la reserva del conductor
-        pasaje = Pasaje.objects.create(
-            salida=salida,
-            nombre=nombre,
-            dni=dni,
-            telefono=telefono,
-            asiento=asiento,
-            tipo_pasaje='reserva_conductor',
-            precio=0.00,  # Las reservas de conductor no tienen precio
-            reservado_por=conductor,
-            estado='pagado'  # Las reservas van directo a 'pagado'
-        )
+        # Crear la reserva del conductor (cupo e INSERT en una sola transacción)
+        try:
+            pasaje, salida = escribir(
+                asignar_asiento,
+                salida.id,
+                asiento,
+                nombre=nombre,
+                dni=dni,
+                telefono=telefono,
+                tipo_pasaje='reserva_conductor',
+                precio=0.00,  # Las reservas de conductor no tienen precio
+                reservado_por=conductor,
+                estado='pagado'  # Las reservas van directo a 'pagado'
+            )
+        except EscrituraDemorada as e:
+            return respuesta_demorada(e)
+        except ErrorAsiento as e:
+            return JsonResponse({'success': False, **e.como_dict()}, status=e.status)
         
         return JsonResponse({
             'success': True,
@@ -469,18 +516,10 @@ def get_asientos_disponibles_conductor(request, salida_id):
     Obtiene asientos disponibles para reserva del conductor
     """
     try:
-        salida = Salida.objects.get(id=salida_id)
-        
-        # Obtener todos los asientos ocupados
-        asientos_ocupados = Pasaje.objects.filter(salida=salida).values_list('asiento', flat=True)
+        salida = Salida.objects.select_related('ruta', 'vehiculo', 'conductor').get(id=salida_id)
         
-        # Generar lista de asientos disponibles
-        asientos_disponibles = []
-        for i in range(1, salida.vehiculo.capacidad + 1):
-            if i not in asientos_ocupados:
-                asientos_disponibles.append(i)
-        
-        # Obtener asientos ocupados con detalles
+        # Obtener asientos ocupados con detalles: la lista ya trae todos los
+        # asientos ocupados, así que no hace falta el mapa de ocupación
         asientos_ocupados_detalle = []
         pasajes = Pasaje.objects.filter(salida=salida).order_by('asiento')
         
@@ -494,6 +533,19 @@ def get_asientos_disponibles_conductor(request, salida_id):
                 'estado': pasaje.estado
             })
         
+        # Asientos retenidos por ventanillas (en la caché compartida, sin consultar la base de datos)
+        retenidos = retenciones.retenidos(salida.id, salida.vehiculo.capacidad)
+        asientos_retenidos = [
+            {'asiento': asiento, 'segundos_restantes': retencion.segundos_restantes}
+            for asiento, retencion in sorted(retenidos.items())
+        ]
+        
+        # Generar lista de asientos disponibles
+        no_disponibles = {p['asiento'] for p in asientos_ocupados_detalle} | set(retenidos)
+        asientos_disponibles = [
+            i for i in range(1, salida.vehiculo.capacidad + 1) if i not in no_disponibles
+        ]
+        
         return JsonResponse({
             'success': True,
             'salida': {
@@ -507,8 +559,10 @@ def get_asientos_disponibles_conductor(request, salida_id):
             },
             'asientos_disponibles': asientos_disponibles,
             'asientos_ocupados': asientos_ocupados_detalle,
+            'asientos_retenidos': asientos_retenidos,
             'total_disponibles': len(asientos_disponibles),
-            'total_ocupados': len(asientos_ocupados_detalle)
+            'total_ocupados': len(asientos_ocupados_detalle),
+            'total_retenidos': len(asientos_retenidos)
         })
         
     except Salida.DoesNotExist:
@@ -525,12 +579,19 @@ def get_asientos_disponibles_conductor(request, salida_id):
 
 
 @require_http_methods(["GET"])
+@condicional_salida()
 def descargar_manifiesto_pdf(request, salida_id):
     """
-    Generar y descargar manifiesto en formato PDF
+    Descargar manifiesto en formato PDF
+    
+    Si el PDF de la versión actual no está en caché no se genera aquí: se
+    encola la tarea manifiesto_pdf y se responde 202 con estado_url para
+    consultarla y resultado_url para descargarlo al completarse (o repetir
+    esta misma petición). Con MANIFIESTO_PDF_SINCRONO se genera en la
+    petición, para instalaciones sin el worker procesar_tareas.
     """
     try:
-        salida = Salida.objects.get(id=salida_id)
+        salida = salida_solicitada(request, salida_id)
         
         # VALIDAR QUE SEA EL CONDUCTOR DE LA SALIDA
         conductor_id = request.GET.get('conductor_id')
@@ -540,145 +601,27 @@ def descargar_manifiesto_pdf(request, salida_id):
                 'error': 'No tienes permisos para descargar este manifiesto'
             })
         
-        # Crear el PDF en memoria
-        buffer = BytesIO()
-        doc = SimpleDocTemplate(buffer, pagesize=A4, topMargin=0.5*inch)
-        
-        # Obtener estilos
-        styles = getSampleStyleSheet()
-        title_style = ParagraphStyle(
-            'CustomTitle',
-            parent=styles['Heading1'],
-            fontSize=16,
-            spaceAfter=30,
-            alignment=1  # Centrado
-        )
-        
-        # Lista para elementos del PDF
-        elements = []
-        
-        # TÍTULO
-        elements.append(Paragraph("MANIFIESTO DE VIAJE", title_style))
-        elements.append(Spacer(1, 20))
-        
-        # INFORMACIÓN DEL VIAJE
-        info_data = [
-            ['INFORMACIÓN DEL VIAJE', ''],
-            ['Ruta:', salida.ruta.nombre],
-            ['Origen:', salida.ruta.origen],
-            ['Destino:', salida.ruta.destino],
-            ['Fecha y Hora:', salida.fecha_hora.strftime('%d/%m/%Y %H:%M')],
-            ['Vehículo:', salida.vehiculo.placa],
-            ['Conductor:', salida.conductor.get_full_name() or salida.conductor.username],
-            ['Capacidad:', f"{salida.vehiculo.capacidad} asientos"],
-        ]
-        
-        info_table = Table(info_data, colWidths=[2*inch, 4*inch])
-        info_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (1, 0), colors.grey),
-            ('TEXTCOLOR', (0, 0), (1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(info_table)
-        elements.append(Spacer(1, 30))
-        
-        # OBTENER PASAJEROS
-        pasajes = Pasaje.objects.filter(salida=salida).order_by('asiento')
-        
-        # ESTADÍSTICAS
-        total_pasajeros = pasajes.count()
-        pasajes_vendidos = pasajes.filter(tipo_pasaje='vendido').count()
-        reservas_conductor = pasajes.filter(tipo_pasaje='reserva_conductor').count()
-        ingresos_generados = sum(float(p.precio) for p in pasajes if p.tipo_pasaje == 'vendido')
-        
-        stats_data = [
-            ['ESTADÍSTICAS DEL VIAJE', ''],
-            ['Total Pasajeros:', str(total_pasajeros)],
-            ['Pasajes Vendidos:', str(pasajes_vendidos)],
-            ['Reservas del Conductor:', str(reservas_conductor)],
-            ['Asientos Disponibles:', str(salida.vehiculo.capacidad - total_pasajeros)],
-            ['Ingresos Generados:', f"S/ {ingresos_generados:.2f}"],
-        ]
-        
-        stats_table = Table(stats_data, colWidths=[2*inch, 2*inch])
-        stats_table.setStyle(TableStyle([
-            ('BACKGROUND', (0, 0), (1, 0), colors.blue),
-            ('TEXTCOLOR', (0, 0), (1, 0), colors.whitesmoke),
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-            ('FONTSIZE', (0, 0), (-1, 0), 12),
-            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-            ('BACKGROUND', (0, 1), (-1, -1), colors.lightblue),
-            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-        ]))
-        
-        elements.append(stats_table)
-        elements.append(Spacer(1, 30))
-        
-        # LISTA DE PASAJEROS
-        if pasajes.exists():
-            pasajeros_data = [['ASIENTO', 'NOMBRE', 'DNI', 'TELÉFONO', 'TIPO', 'ESTADO']]
-            
-            for pasaje in pasajes:
-                tipo = '🚛 Reserva Conductor' if pasaje.tipo_pasaje == 'reserva_conductor' else '🎫 Vendido'
-                estado = '✅ Abordado' if pasaje.estado == 'abordado' else '⏳ Pendiente'
-                
-                pasajeros_data.append([
-                    str(pasaje.asiento),
-                    pasaje.nombre,
-                    pasaje.dni,
-                    pasaje.telefono or 'N/A',
-                    tipo,
-                    estado
-                ])
-            
-            pasajeros_table = Table(pasajeros_data, colWidths=[0.8*inch, 2*inch, 1*inch, 1.2*inch, 1.5*inch, 1*inch])
-            pasajeros_table.setStyle(TableStyle([
-                ('BACKGROUND', (0, 0), (-1, 0), colors.green),
-                ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                ('ALIGN', (0, 0), (-1, -1), 'CENTER'),
-                ('FONTNAME', (0, 0), (-1, 0), 'Helvetica-Bold'),
-                ('FONTSIZE', (0, 0), (-1, 0), 10),
-                ('FONTSIZE', (0, 1), (-1, -1), 8),
-                ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                ('BACKGROUND', (0, 1), (-1, -1), colors.lightgreen),
-                ('GRID', (0, 0), (-1, -1), 1, colors.black),
-                ('VALIGN', (0, 0), (-1, -1), 'MIDDLE'),
-            ]))
-            
-            elements.append(pasajeros_table)
-        else:
-            elements.append(Paragraph("No hay pasajeros registrados para este viaje.", styles['Normal']))
-        
-        # FOOTER
-        elements.append(Spacer(1, 30))
-        footer_data = [
-            ['Fecha de Generación:', datetime.datetime.now().strftime('%d/%m/%Y %H:%M:%S')],
-            ['Sistema:', 'Transporte Rural - Manifiesto Digital'],
-        ]
-        
-        footer_table = Table(footer_data, colWidths=[2*inch, 4*inch])
-        footer_table.setStyle(TableStyle([
-            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-            ('FONTNAME', (0, 0), (-1, -1), 'Helvetica'),
-            ('FONTSIZE', (0, 0), (-1, -1), 9),
-            ('TEXTCOLOR', (0, 0), (-1, -1), colors.grey),
-        ]))
-        
-        elements.append(footer_table)
-        
-        # Construir el PDF
-        doc.build(elements)
-        buffer.seek(0)
+        # PDF en caché por versión de la salida (se regenera solo si cambió algún pasaje)
+        pdf = manifiesto_en_cache(salida)
+        if pdf is None:
+            if not getattr(settings, 'MANIFIESTO_PDF_SINCRONO', False):
+                tarea = encolar_manifiesto(salida)
+                response = JsonResponse({
+                    'success': True,
+                    'message': 'Generando manifiesto',
+                    'tarea_id': tarea.id,
+                    'estado': tarea.estado,
+                    'estado_url': url_estado(tarea),
+                    'resultado_url': url_resultado(tarea)
+                }, status=202)
+                # No es el PDF: que el navegador no lo guarde ni lo revalide con su ETag
+                response['Cache-Control'] = 'no-store'
+                response['Retry-After'] = '2'
+                return response
+            pdf = obtener_manifiesto_pdf(salida)
         
         # Crear respuesta HTTP con el PDF
-        response = HttpResponse(buffer.getvalue(), content_type='application/pdf')
+        response = HttpResponse(pdf, content_type='application/pdf')
         filename = f'manifiesto_salida_{salida_id}_{datetime.datetime.now().strftime("%Y%m%d_%H%M")}.pdf'
         response['Content-Disposition'] = f'attachment; filename="{filename}"'
         
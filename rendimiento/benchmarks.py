@@ -0,0 +1,222 @@
+"""
+Benchmark de endpoints con presupuesto de consultas
+
+Cada endpoint se mide con el cliente de pruebas de Django sobre datos
+generados por `generar_datos` a varias escalas. Por endpoint se registra
+el número de consultas SQL y los percentiles p50/p95 de latencia, y se
+comparan con la línea base guardada en linea_base.json:
+
+- Las consultas deben respetar el techo fijo del endpoint (no deben crecer
+  con el volumen de datos) y no superar las de la línea base.
+- El p95 no debe superar el de la línea base por más de la tolerancia. El
+  tiempo depende de la máquina y de la carga del momento, así que esta
+  comparación solo falla con BENCHMARK_LATENCIA=1; si no, se informa.
+
+Variables de entorno:
+    BENCHMARK_ESCALAS      salidas por escala, separadas por comas (default: 200,2000)
+    BENCHMARK_REPETICIONES peticiones por endpoint (default: 30)
+    BENCHMARK_TOLERANCIA   factor permitido sobre el p95 base (default: 2.0)
+    BENCHMARK_LATENCIA     con 1 las regresiones de p95 hacen fallar la prueba
+    BENCHMARK_ACTUALIZAR   con 1 reescribe la línea base en lugar de comparar
+    BENCHMARK_MOSTRAR      con 1 las pruebas de benchmark y stress muestran sus
+                           mediciones (logger rendimiento.benchmark)
+"""
+import json
+import logging
+import math
+import os
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+
+from django.db import connection
+from django.test.utils import CaptureQueriesContext
+
+# Mediciones de las pruebas de benchmark y stress (en silencio salvo con BENCHMARK_MOSTRAR=1)
+logger = logging.getLogger('rendimiento.benchmark')
+
+RUTA_LINEA_BASE = Path(__file__).resolve().parent / 'linea_base.json'
+
+# Margen absoluto en ms para que el ruido no cuente como regresión en endpoints muy rápidos
+MARGEN_MS = 5
+
+
+@dataclass
+class Endpoint:
+    nombre: str
+    url: str  # admite {salida} y {conductor}
+    max_consultas: int
+
+
+ENDPOINTS = [
+    Endpoint('salidas-hoy', '/api/salidas-hoy/', 1),
+    # Una página: es lo que midió la línea base y lo que piden los clientes que paginan
+    Endpoint('salidas', '/api/salidas/?limit=100', 1),
+    Endpoint('salidas-disponibles', '/api/salidas-disponibles/', 1),
+    Endpoint('pasajes', '/api/salida/{salida}/pasajes/', 2),
+    Endpoint('manifiesto', '/api/salida/{salida}/manifiesto/', 2),
+    Endpoint('manifiesto-pdf', '/api/salida/{salida}/manifiesto-pdf/?conductor_id={conductor}', 2),
+    Endpoint('vehiculos', '/api/vehiculos/', 1),
+    Endpoint('conductores/lista', '/api/conductores/lista/', 1),
+]
+
+
+def escalas():
+    return [int(e) for e in os.environ.get('BENCHMARK_ESCALAS', '200,2000').split(',') if e.strip()]
+
+
+def repeticiones():
+    return int(os.environ.get('BENCHMARK_REPETICIONES', 30))
+
+
+def tolerancia():
+    return float(os.environ.get('BENCHMARK_TOLERANCIA', 2.0))
+
+
+def percentil(valores, p):
+    """Percentil por rango más cercano de una lista no vacía"""
+    ordenados = sorted(valores)
+    indice = max(0, math.ceil(p / 100 * len(ordenados)) - 1)
+    return ordenados[indice]
+
+
+def medir(client, url, veces):
+    """Mide `veces` peticiones GET y devuelve estado, consultas, p50_ms y p95_ms"""
+    tiempos = []
+    for _ in range(veces):
+        with CaptureQueriesContext(connection) as consultas:
+            inicio = time.perf_counter()
+            response = client.get(url)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+    return {
+        'estado': response.status_code,
+        'consultas': len(consultas),
+        'p50_ms': round(percentil(tiempos, 50), 2),
+        'p95_ms': round(percentil(tiempos, 95), 2),
+    }
+
+
+def medir_endpoints(client, salida_id, conductor_id, veces=None):
+    veces = veces or repeticiones()
+    return {
+        endpoint.nombre: medir(client, endpoint.url.format(salida=salida_id, conductor=conductor_id), veces)
+        for endpoint in ENDPOINTS
+    }
+
+
+def planes_de_consultas(client, url):
+    """
+    Ejecuta GET `url` y devuelve [(sql, plan)] con el EXPLAIN QUERY PLAN de
+    cada consulta que hizo la vista (solo SQLite)
+    """
+    with CaptureQueriesContext(connection) as consultas:
+        client.get(url)
+    planes = []
+    with connection.cursor() as cursor:
+        for consulta in consultas.captured_queries:
+            cursor.execute(f'EXPLAIN QUERY PLAN {consulta["sql"]}')
+            planes.append((consulta['sql'], '\n'.join(fila[-1] for fila in cursor.fetchall())))
+    return planes
+
+
+def cargar_linea_base(ruta=RUTA_LINEA_BASE):
+    try:
+        with open(ruta, encoding='utf-8') as archivo:
+            return json.load(archivo)
+    except FileNotFoundError:
+        return {}
+
+
+def guardar_linea_base(resultados, ruta=RUTA_LINEA_BASE):
+    with open(ruta, 'w', encoding='utf-8') as archivo:
+        json.dump(resultados, archivo, indent=2, sort_keys=True, ensure_ascii=False)
+        archivo.write('\n')
+
+
+def comparar_latencia():
+    return os.environ.get('BENCHMARK_LATENCIA') == '1'
+
+
+def regresiones(resultados, linea_base, factor=None, latencia=True):
+    """
+    Lista de mensajes con las regresiones de `resultados` ({escala: {endpoint:
+    medicion}}) frente a los techos de consultas y a la línea base. Con
+    latencia=False solo se revisan las consultas.
+    """
+    factor = factor or tolerancia()
+    techos = {endpoint.nombre: endpoint.max_consultas for endpoint in ENDPOINTS}
+    mensajes = []
+    for escala, mediciones in resultados.items():
+        base_escala = linea_base.get(escala, {})
+        for nombre, medicion in mediciones.items():
+            if medicion['consultas'] > techos[nombre]:
+                mensajes.append(f'{nombre} @ {escala}: {medicion["consultas"]} consultas '
+                                f'(techo {techos[nombre]})')
+            base = base_escala.get(nombre)
+            if base is None:
+                continue
+            if medicion['consultas'] > base['consultas']:
+                mensajes.append(f'{nombre} @ {escala}: {medicion["consultas"]} consultas '
+                                f'(línea base {base["consultas"]})')
+            limite = base['p95_ms'] * factor + MARGEN_MS
+            if latencia and medicion['p95_ms'] > limite:
+                mensajes.append(f'{nombre} @ {escala}: p95 {medicion["p95_ms"]} ms '
+                                f'(línea base {base["p95_ms"]} ms, límite {limite:.1f} ms)')
+    return mensajes
+
+
+def comparar_serializacion(antes, despues, veces=5):
+    """
+    Tiempo (mejor de `veces`, en ms) y pico de memoria (KiB, tracemalloc) de
+    dos funciones sin argumentos que leen y serializan el mismo listado
+    """
+    resultado = {}
+    for nombre, funcion in (('antes', antes), ('despues', despues)):
+        tiempos = []
+        for _ in range(veces):
+            inicio = time.perf_counter()
+            funcion()
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        tracemalloc.start()
+        try:
+            funcion()
+            pico = tracemalloc.get_traced_memory()[1]
+        finally:
+            tracemalloc.stop()
+        resultado[nombre] = {'ms': round(min(tiempos), 2), 'pico_kib': round(pico / 1024, 1)}
+    return resultado
+
+
+def comparar_json(datos, veces=5):
+    """
+    Serialización de `datos` con el JSONRenderer estándar de DRF y con el
+    motor rápido (mejor de `veces`, en ms) y bytes en la red sin comprimir,
+    con gzip y con brotli (si está instalado)
+    """
+    from rest_framework.renderers import JSONRenderer
+
+    from .compresion import codificaciones_disponibles, comprimir
+    from .json_rapido import RenderizadorJSON
+
+    resultado = {}
+    for nombre, renderizador in (('drf_json', JSONRenderer()), ('json_rapido', RenderizadorJSON())):
+        tiempos = []
+        for _ in range(veces):
+            inicio = time.perf_counter()
+            contenido = renderizador.render(datos)
+            tiempos.append((time.perf_counter() - inicio) * 1000)
+        resultado[nombre] = {'ms': round(min(tiempos), 2), 'bytes': len(contenido)}
+    resultado['bytes_red'] = {'identity': len(contenido)}
+    for codificacion in codificaciones_disponibles():
+        resultado['bytes_red'][codificacion] = len(comprimir(contenido, codificacion))
+    return resultado
+
+
+def formatear(resultados):
+    lineas = [f'{"escala":>8} {"endpoint":<20} {"consultas":>9} {"p50 ms":>8} {"p95 ms":>8}']
+    for escala, mediciones in resultados.items():
+        for nombre, medicion in mediciones.items():
+            lineas.append(f'{escala:>8} {nombre:<20} {medicion["consultas"]:>9} '
+                          f'{medicion["p50_ms"]:>8.2f} {medicion["p95_ms"]:>8.2f}')
+    return '\n'.join(lineas)
@@ -0,0 +1,160 @@
+"""
+Caché de respuestas de los catálogos (rutas, vehículos, conductores)
+
+Las listas de catálogo cambian pocas veces por semana pero se piden en cada
+pantalla. `@cachear_catalogo('grupo')` guarda la respuesta completa por
+ruta, parámetros de consulta y Accept en CATALOGO_CACHE (una caché
+compartida entre procesos: archivo, Redis o Memcached).
+
+Cada grupo tiene una generación guardada en la misma caché y las claves de
+las respuestas la incluyen. Las señales post_save/post_delete de Ruta,
+Salida, Vehiculo y Usuario cambian la generación de los grupos afectados,
+así todas las respuestas anteriores dejan de encontrarse en todos los
+procesos a la vez. Los cambios con queryset.update() o bulk_create no
+disparan señales: llamar a invalidar() después.
+
+La generación empieza con el instante del cambio en nanosegundos, así
+también sirve de sello de versión por tabla para ETag y Last-Modified
+(rendimiento.condicional).
+"""
+import hashlib
+import secrets
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import caches
+from django.db import connection, transaction
+from django.http import HttpResponse
+
+from .prometheus import observar_cache
+
+# Grupos de catálogo que dependen de cada modelo
+GRUPOS_POR_MODELO = {
+    'rutas.ruta': ('rutas',),
+    'rutas.salida': ('rutas', 'salidas'),  # salidas_programadas por ruta
+    'vehiculos.vehiculo': ('vehiculos', 'conductores'),
+    'usuarios.usuario': ('vehiculos', 'conductores'),
+}
+GRUPOS = ('rutas', 'vehiculos', 'conductores', 'salidas')
+
+
+def _cache():
+    return caches[getattr(settings, 'CATALOGO_CACHE', 'default')]
+
+
+def _clave_generacion(grupo):
+    return f'catalogo:generacion:{grupo}'
+
+
+def _nueva_generacion():
+    return f'{time.time_ns()}-{secrets.token_hex(4)}'
+
+
+def generaciones(*grupos):
+    """{grupo: generación} con una sola lectura de la caché; crea las que falten"""
+    cache = _cache()
+    claves = {_clave_generacion(grupo): grupo for grupo in grupos}
+    actuales = cache.get_many(claves)
+    for clave in claves.keys() - actuales.keys():
+        cache.add(clave, _nueva_generacion(), None)
+        actuales[clave] = cache.get(clave)
+    return {grupo: actuales[clave] for clave, grupo in claves.items()}
+
+
+def generacion(grupo):
+    return generaciones(grupo)[grupo]
+
+
+def instante_generacion(generacion_grupo):
+    """Segundos epoch en que se creó la generación (None si no tiene ese formato)"""
+    try:
+        return int(generacion_grupo.split('-', 1)[0]) / 1e9
+    except ValueError:
+        return None
+
+
+def invalidar(*grupos):
+    """Descarta las respuestas guardadas de los grupos indicados (todos si no se indica ninguno)"""
+    _cache().set_many({_clave_generacion(grupo): _nueva_generacion() for grupo in grupos or GRUPOS}, None)
+
+
+def invalidar_al_confirmar(*grupos):
+    """
+    Invalida ahora, para las lecturas de esta misma transacción, y otra vez al
+    confirmar: una lectura de otro proceso entre ambos momentos pudo guardar
+    datos viejos con la generación nueva
+    """
+    invalidar(*grupos)
+    transaction.on_commit(lambda: invalidar(*grupos))
+
+
+def invalidar_una_vez_al_confirmar(*grupos):
+    """
+    Invalida solo al confirmar, con una única escritura en la caché por
+    transacción aunque se llame en cada fila (ventas en lote, group commit del
+    escritor único). Para sellos que solo se leen fuera de la transacción.
+    """
+    if not connection.in_atomic_block:
+        invalidar(*grupos)
+        return
+    # Un callback pendiente por transacción; si su savepoint se revierte
+    # Django lo descarta y la próxima llamada registra otro
+    for _, funcion, _ in connection.run_on_commit:
+        pendientes = getattr(funcion, 'grupos_catalogo', None)
+        if pendientes is not None:
+            pendientes.update(grupos)
+            return
+
+    def confirmar():
+        # Ya ejecutado deja de acumular grupos
+        grupos_pendientes, confirmar.grupos_catalogo = confirmar.grupos_catalogo, None
+        invalidar(*grupos_pendientes)
+
+    confirmar.grupos_catalogo = set(grupos)
+    transaction.on_commit(confirmar)
+
+
+def invalidar_por_modelo(etiqueta_modelo):
+    grupos = GRUPOS_POR_MODELO.get(etiqueta_modelo)
+    if grupos:
+        invalidar_al_confirmar(*grupos)
+
+
+def clave_respuesta(grupo, request):
+    firma = hashlib.sha1(
+        f'{request.path}?{sorted(request.GET.lists())}|{request.headers.get("Accept", "")}'.encode()
+    ).hexdigest()
+    return f'catalogo:{grupo}:{generacion(grupo)}:{firma}'
+
+
+def cachear_catalogo(grupo):
+    """
+    Decorador para vistas GET de catálogo (va por encima de @api_view). Solo
+    se guardan las respuestas 200; la cabecera X-Cache indica HIT o MISS.
+    """
+    def decorador(vista):
+        @wraps(vista)
+        def envoltura(request, *args, **kwargs):
+            if request.method != 'GET':
+                return vista(request, *args, **kwargs)
+            cache = _cache()
+            clave = clave_respuesta(grupo, request)
+            guardada = cache.get(clave)
+            observar_cache(f'catalogo_{grupo}', guardada is not None)
+            if guardada is not None:
+                contenido, tipo = guardada
+                response = HttpResponse(contenido, content_type=tipo)
+                response['X-Cache'] = 'HIT'
+                return response
+
+            response = vista(request, *args, **kwargs)
+            if hasattr(response, 'render') and not response.is_rendered:
+                response.render()
+            if response.status_code == 200:
+                cache.set(clave, (response.content, response['Content-Type']),
+                          getattr(settings, 'CATALOGO_CACHE_SEGUNDOS', 300))
+            response['X-Cache'] = 'MISS'
+            return response
+        return envoltura
+    return decorador
@@ -0,0 +1,112 @@
+"""
+Compresión negociada de respuestas (brotli o gzip)
+
+Comprime las respuestas de tipos de texto (JSON, HTML, CSV...) mayores que
+COMPRESION_MINIMO_BYTES según el Accept-Encoding del cliente: brotli si
+está instalado y el cliente lo acepta, si no gzip. No toca las respuestas
+en streaming (el flujo SSE de eventos, descargas), las que ya traen
+Content-Encoding ni los PDF e imágenes, que ya vienen comprimidos.
+
+Va después de InstrumentacionMiddleware: así los bytes registrados por
+endpoint son los que viajan por la red. Como ella, sirve en WSGI y en ASGI
+sin pasar cada petición por un hilo.
+"""
+import gzip
+import re
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.utils.cache import patch_vary_headers
+
+try:
+    import brotli
+except ImportError:  # pragma: no cover - sin brotli se negocia solo gzip
+    brotli = None
+
+TIPOS_COMPRIMIBLES = ('text/', 'application/json', 'application/javascript', 'application/xml')
+
+_CODIFICACION = re.compile(r'\s*([\w*-]+)\s*(?:;\s*q\s*=\s*([0-9.]+))?')
+
+
+def codificaciones_disponibles():
+    return ('br', 'gzip') if brotli is not None else ('gzip',)
+
+
+def negociar(accept_encoding, disponibles=None):
+    """Codificación a usar según Accept-Encoding (la de mayor q, brotli ante empate) o None"""
+    disponibles = disponibles or codificaciones_disponibles()
+    calidades = {}
+    for parte in accept_encoding.lower().split(','):
+        coincidencia = _CODIFICACION.match(parte)
+        if not coincidencia:
+            continue
+        try:
+            calidades[coincidencia.group(1)] = float(coincidencia.group(2) or 1)
+        except ValueError:
+            continue
+    comodin = calidades.get('*', 0)
+    mejor, mejor_calidad = None, 0
+    for codificacion in disponibles:
+        calidad = calidades.get(codificacion, comodin)
+        if calidad > mejor_calidad:
+            mejor, mejor_calidad = codificacion, calidad
+    return mejor
+
+
+def comprimir(contenido, codificacion):
+    if codificacion == 'br':
+        return brotli.compress(contenido, quality=getattr(settings, 'COMPRESION_BROTLI_CALIDAD', 5))
+    # mtime=0: mismo contenido, mismos bytes
+    return gzip.compress(contenido, compresslevel=getattr(settings, 'COMPRESION_GZIP_NIVEL', 6), mtime=0)
+
+
+def es_comprimible(response):
+    tipo = response.get('Content-Type', '').split(';')[0].strip().lower()
+    return (
+        not getattr(response, 'streaming', False)
+        and not response.has_header('Content-Encoding')
+        and 200 <= response.status_code < 300 and response.status_code != 204
+        and tipo.startswith(TIPOS_COMPRIMIBLES)
+    )
+
+
+class CompresionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        return self.comprimir_respuesta(request, self.get_response(request))
+
+    async def __acall__(self, request):
+        return self.comprimir_respuesta(request, await self.get_response(request))
+
+    def comprimir_respuesta(self, request, response):
+        if not es_comprimible(response):
+            return response
+        # La respuesta varía según Accept-Encoding aunque esta no se comprima
+        patch_vary_headers(response, ('Accept-Encoding',))
+        if len(response.content) < getattr(settings, 'COMPRESION_MINIMO_BYTES', 1024):
+            return response
+        codificacion = negociar(request.headers.get('Accept-Encoding', ''))
+        if codificacion is None:
+            return response
+
+        comprimido = comprimir(response.content, codificacion)
+        if len(comprimido) >= len(response.content):
+            return response
+        response.content = comprimido
+        response['Content-Length'] = str(len(comprimido))
+        response['Content-Encoding'] = codificacion
+        # Los bytes ya no son los mismos: el ETag fuerte pasa a débil (como GZipMiddleware)
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
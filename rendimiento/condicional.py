@@ -0,0 +1,102 @@
+"""
+GET condicional (ETag / Last-Modified) a partir de sellos de versión
+
+Las vistas de lectura calculan su ETag sin armar el JSON:
+
+- Listas: con las generaciones por tabla de rendimiento.cache_catalogo
+  (una lectura de la caché compartida). Cambian con las señales de los
+  modelos y con Salida.objects.ajustar_contadores().
+- Detalle de una salida (pasajes, manifiesto, encomiendas): con
+  Salida.version y updated_at, que suben con cada alta, cambio o baja de
+  sus pasajes y encomiendas, más las generaciones de rutas y vehículos por
+  los nombres que se muestran. La salida se carga una vez (con ruta,
+  vehículo y conductor) y la vista la reutiliza con salida_solicitada().
+
+Si el ETag coincide con If-None-Match (o la fecha con If-Modified-Since)
+django.views.decorators.http.condition responde 304 sin llamar a la vista.
+"""
+import hashlib
+import time
+from datetime import datetime, timezone as dt_timezone
+
+from django.utils import timezone
+from django.views.decorators.http import condition
+
+from rutas.models import Salida
+from .cache_catalogo import generaciones, instante_generacion
+
+
+def _etag(*partes):
+    return hashlib.sha1('|'.join(str(p) for p in partes).encode()).hexdigest()[:32]
+
+
+def _fecha(segundos):
+    return datetime.fromtimestamp(segundos, tz=dt_timezone.utc) if segundos else None
+
+
+def sello_tablas(request, grupos, por_dia=False, periodo=None):
+    """(etag, last_modified) de una lista; se calcula una vez por petición"""
+    guardado = getattr(request, '_sello_condicional', None)
+    if guardado is not None:
+        return guardado
+    por_grupo = generaciones(*grupos)
+    partes = [request.get_full_path(), *(por_grupo[g] for g in grupos)]
+    if por_dia:
+        # "Hoy" cambia a medianoche aunque no cambie ningún dato
+        partes.append(timezone.localdate())
+    if periodo:
+        # Contenido que depende de la hora (p. ej. salidas futuras): el ETag vence con el periodo
+        partes.append(int(time.time() // periodo))
+    instantes = [i for i in map(instante_generacion, por_grupo.values()) if i]
+    # Con por_dia o periodo el contenido cambia sin escrituras: no hay Last-Modified fiable
+    ultima = None if por_dia or periodo else _fecha(max(instantes, default=0))
+    request._sello_condicional = (_etag(*partes), ultima)
+    return request._sello_condicional
+
+
+def sello_salida(request, salida_id, grupos=('rutas', 'vehiculos')):
+    """(etag, last_modified) del detalle de una salida; (None, None) si no existe"""
+    guardado = getattr(request, '_sello_condicional', None)
+    if guardado is not None:
+        return guardado
+    salida = request._salida_condicional = salida_solicitada(request, salida_id, requerida=False)
+    if salida is None:
+        request._sello_condicional = (None, None)
+        return request._sello_condicional
+    por_grupo = generaciones(*grupos)
+    instantes = [salida.updated_at.timestamp(), *filter(None, map(instante_generacion, por_grupo.values()))]
+    request._sello_condicional = (
+        _etag(request.get_full_path(), salida.id, salida.version, salida.updated_at.isoformat(),
+              *por_grupo.values()),
+        _fecha(max(instantes)),
+    )
+    return request._sello_condicional
+
+
+def salida_solicitada(request, salida_id, requerida=True):
+    """
+    Salida con ruta, vehículo y conductor, la misma que ya cargó el cálculo
+    del ETag si lo hubo. Lanza Salida.DoesNotExist si no existe y `requerida`.
+    """
+    salida = getattr(request, '_salida_condicional', None)
+    if salida is None or salida.pk != int(salida_id):
+        salida = Salida.objects.select_related('ruta', 'vehiculo', 'conductor').filter(pk=salida_id).order_by().first()
+    if salida is None and requerida:
+        raise Salida.DoesNotExist('Salida no encontrada')
+    return salida
+
+
+def condicional_tablas(*grupos, por_dia=False, periodo=None):
+    """Decorador para listas que dependen de las tablas de `grupos` (va por encima de @api_view)"""
+    return condition(
+        etag_func=lambda request, *args, **kwargs: sello_tablas(request, grupos, por_dia, periodo)[0],
+        last_modified_func=lambda request, *args, **kwargs: sello_tablas(request, grupos, por_dia, periodo)[1],
+    )
+
+
+def condicional_salida():
+    """Decorador para vistas de detalle con argumento salida_id (va por encima de @api_view)"""
+    return condition(
+        etag_func=lambda request, salida_id, *args, **kwargs: sello_salida(request, salida_id)[0],
+        last_modified_func=lambda request, salida_id, *args, **kwargs: sello_salida(request, salida_id)[1],
+    )
@@ -0,0 +1,91 @@
+"""
+Benchmark de contención de escrituras en SQLite
+
+Varios procesos (como los workers de Gunicorn) venden pasajes a la vez
+sobre un mismo archivo SQLite: cada venta lee el cupo de la salida, inserta
+el pasaje y actualiza el contador en una transacción. Se compara la
+configuración por defecto de Django (journal DELETE, synchronous FULL,
+BEGIN diferido) con la de transporte/sqlite.py.
+
+Usa sqlite3 directamente para que cada proceso tenga su propia conexión
+sin depender del ORM.
+"""
+import multiprocessing
+import os
+import sqlite3
+import tempfile
+import time
+
+from transporte.sqlite import PRAGMAS
+
+CONFIGURACIONES = {
+    'por_defecto': {'pragmas': {}, 'begin': 'BEGIN', 'timeout': 5.0},
+    'afinada': {'pragmas': PRAGMAS, 'begin': 'BEGIN IMMEDIATE', 'timeout': PRAGMAS['busy_timeout'] / 1000},
+}
+
+
+def conectar(ruta, configuracion):
+    conn = sqlite3.connect(ruta, timeout=configuracion['timeout'], isolation_level=None)
+    for nombre, valor in configuracion['pragmas'].items():
+        conn.execute(f'PRAGMA {nombre}={valor}')
+    return conn
+
+
+def preparar(ruta, configuracion, salidas):
+    conn = conectar(ruta, configuracion)
+    conn.executescript("""
+        CREATE TABLE salida (id INTEGER PRIMARY KEY, capacidad INTEGER, pasajeros INTEGER);
+        CREATE TABLE pasaje (id INTEGER PRIMARY KEY, salida_id INTEGER, asiento INTEGER, nombre TEXT,
+                             UNIQUE (salida_id, asiento));
+    """)
+    conn.executemany('INSERT INTO salida VALUES (?, 1000000, 0)', [(i,) for i in range(1, salidas + 1)])
+    conn.close()
+
+
+def _vender(argumentos):
+    ruta, configuracion, worker, ventas, salidas = argumentos
+    conn = conectar(ruta, configuracion)
+    bloqueos = 0
+    inicio = time.perf_counter()
+    for i in range(ventas):
+        salida_id = (worker + i) % salidas + 1
+        try:
+            conn.execute(configuracion['begin'])
+            (pasajeros,) = conn.execute('SELECT pasajeros FROM salida WHERE id = ?', (salida_id,)).fetchone()
+            conn.execute('INSERT INTO pasaje (salida_id, asiento, nombre) VALUES (?, ?, ?)',
+                         (salida_id, pasajeros + 1, f'pasajero {worker}-{i}'))
+            conn.execute('UPDATE salida SET pasajeros = pasajeros + 1 WHERE id = ?', (salida_id,))
+            conn.execute('COMMIT')
+        except sqlite3.OperationalError:
+            # "database is locked": la venta se pierde (el cliente tendría que reintentar)
+            bloqueos += 1
+            if conn.in_transaction:
+                conn.execute('ROLLBACK')
+    conn.close()
+    return bloqueos, time.perf_counter() - inicio
+
+
+def medir(nombre, procesos=4, ventas_por_proceso=200, salidas=20):
+    """
+    Ejecuta el benchmark con la configuración `nombre` sobre un archivo
+    temporal y devuelve confirmadas, bloqueos, segundos y ventas_por_segundo
+    """
+    configuracion = CONFIGURACIONES[nombre]
+    with tempfile.TemporaryDirectory() as directorio:
+        ruta = os.path.join(directorio, 'contencion.sqlite3')
+        preparar(ruta, configuracion, salidas)
+        argumentos = [(ruta, configuracion, worker, ventas_por_proceso, salidas) for worker in range(procesos)]
+        inicio = time.perf_counter()
+        with multiprocessing.get_context('spawn').Pool(procesos) as pool:
+            resultados = pool.map(_vender, argumentos)
+        segundos = time.perf_counter() - inicio
+        conn = sqlite3.connect(ruta)
+        (confirmadas,) = conn.execute('SELECT COUNT(*) FROM pasaje').fetchone()
+        conn.close()
+    return {
+        'configuracion': nombre,
+        'confirmadas': confirmadas,
+        'bloqueos': sum(bloqueos for bloqueos, _ in resultados),
+        'segundos': round(segundos, 3),
+        'ventas_por_segundo': round(confirmadas / segundos, 1),
+    }
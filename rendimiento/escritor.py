@@ -0,0 +1,181 @@
+"""
+Escritor único con group commit
+
+SQLite admite un solo escritor a la vez. Con ESCRITOR_UNICO activo, las
+escrituras de las vistas de venta, encomiendas y check-in no abren su
+propia transacción: se encolan para un hilo escritor por proceso que toma
+todas las pendientes (hasta ESCRITOR_LOTE_MAXIMO) y las aplica en una sola
+transacción, cada una dentro de su propio savepoint. Un solo COMMIT
+confirma el lote y cada petición recibe su propio resultado o su propia
+excepción; si una falla, el savepoint se revierte y las demás del lote se
+confirman igual.
+
+No siempre es más rápido. Con WAL y synchronous=NORMAL el COMMIT no hace
+fsync: lo que se ahorra es la espera por el candado de los hilos que
+compiten (busy_timeout), a cambio de pasar cada escritura por una cola y
+otro hilo. Sobre la base en archivo, manage.py benchmark_escritor midió
+150 ventas/s directas contra 181 con el escritor (8 hilos, 4 ventas por
+COMMIT); sobre la base en memoria de las pruebas el escritor es más lento
+(test_rendimiento_frente_a_escritura_directa: unas 180-240 ventas/s
+directas contra 175). Activarlo solo después de medir en el disco real.
+
+Entre procesos (varios workers de Gunicorn) el orden lo siguen poniendo
+BEGIN IMMEDIATE y busy_timeout (transporte/sqlite.py): cada proceso tiene
+un único escritor en lugar de un hilo por petición compitiendo por el
+candado. Los lotes crecen solos con la carga: mientras el escritor
+confirma un lote se acumulan las peticiones del siguiente.
+
+Uso en las vistas:
+
+    try:
+        pasaje, salida = escribir(asignar_asiento, salida_id, asiento, nombre=...)
+    except EscrituraDemorada as e:
+        return respuesta_demorada(e)
+
+Si la escritura no termina en ESCRITOR_TIMEOUT_SEGUNDOS, escribir() lanza
+EscrituraDemorada: la escritura sigue en cola y todavía puede confirmarse,
+así que la vista no debe responder como si hubiera fallado. Responde 503
+con Retry-After, y @idempotente deja la Idempotency-Key en proceso hasta
+saber cómo terminó (un reintento no la aplica dos veces).
+"""
+import os
+import queue
+import threading
+from concurrent.futures import Future
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import connection, transaction
+
+from .json_rapido import JsonResponse
+
+# Segundos sugeridos al cliente para reintentar tras una escritura demorada
+REINTENTO_SEGUNDOS = 5
+
+
+class EscrituraDemorada(Exception):
+    """La escritura no terminó a tiempo pero sigue en cola: `futuro` dice cómo termina"""
+
+    def __init__(self, futuro):
+        super().__init__('El servidor está ocupado, reintente en unos segundos')
+        self.futuro = futuro
+
+
+@dataclass
+class Escritura:
+    funcion: callable
+    args: tuple
+    kwargs: dict
+    futuro: Future = field(default_factory=Future)
+
+
+class EscritorUnico:
+
+    def __init__(self):
+        self._cola = queue.Queue()
+        self._candado = threading.Lock()
+        self._hilo = None
+        self._pid = None
+        self.peticiones = 0
+        self.lotes = 0
+
+    @property
+    def activo(self):
+        return getattr(settings, 'ESCRITOR_UNICO', False)
+
+    @property
+    def lote_maximo(self):
+        return getattr(settings, 'ESCRITOR_LOTE_MAXIMO', 64)
+
+    @property
+    def timeout(self):
+        return getattr(settings, 'ESCRITOR_TIMEOUT_SEGUNDOS', 30)
+
+    def escribir(self, funcion, *args, **kwargs):
+        """
+        Ejecuta funcion(*args, **kwargs) en el escritor y devuelve su resultado
+        (o relanza su excepción). Sin ESCRITOR_UNICO, o si ya se está dentro
+        del escritor, la ejecuta directamente.
+        """
+        if not self.activo or threading.current_thread() is self._hilo:
+            return funcion(*args, **kwargs)
+        self.iniciar()
+        escritura = Escritura(funcion, args, kwargs)
+        self._cola.put(escritura)
+        try:
+            return escritura.futuro.result(timeout=self.timeout)
+        except TimeoutError:
+            # La propia escritura también puede lanzar TimeoutError: solo es demora si no terminó
+            if escritura.futuro.done():
+                raise
+            raise EscrituraDemorada(escritura.futuro)
+
+    def iniciar(self):
+        # Tras un fork (gunicorn --preload) el hilo del padre no existe en el hijo
+        if self._hilo and self._hilo.is_alive() and self._pid == os.getpid():
+            return
+        with self._candado:
+            if self._hilo and self._hilo.is_alive() and self._pid == os.getpid():
+                return
+            self._pid = os.getpid()
+            self._hilo = threading.Thread(target=self._bucle, name='escritor-unico', daemon=True)
+            self._hilo.start()
+
+    def estadisticas(self):
+        return {
+            'peticiones': self.peticiones,
+            'lotes': self.lotes,
+            'promedio_por_lote': round(self.peticiones / self.lotes, 2) if self.lotes else 0,
+        }
+
+    def _bucle(self):
+        while True:
+            lote = [self._cola.get()]
+            while len(lote) < self.lote_maximo:
+                try:
+                    lote.append(self._cola.get_nowait())
+                except queue.Empty:
+                    break
+            try:
+                self._aplicar(lote)
+            finally:
+                # Sin conexiones rotas entre lotes (equivale a close_old_connections)
+                connection.close_if_unusable_or_obsolete()
+
+    def _aplicar(self, lote):
+        resultados = []
+        try:
+            with transaction.atomic():
+                for escritura in lote:
+                    try:
+                        with transaction.atomic():
+                            resultados.append((escritura, escritura.funcion(*escritura.args, **escritura.kwargs), None))
+                    except Exception as e:
+                        resultados.append((escritura, None, e))
+        except Exception as e:
+            # Falló el COMMIT: ninguna escritura del lote quedó confirmada
+            for escritura in lote:
+                escritura.futuro.set_exception(e)
+            return
+        self.peticiones += len(lote)
+        self.lotes += 1
+        for escritura, resultado, error in resultados:
+            if error is None:
+                escritura.futuro.set_result(resultado)
+            else:
+                escritura.futuro.set_exception(error)
+
+
+escritor = EscritorUnico()
+
+
+def escribir(funcion, *args, **kwargs):
+    return escritor.escribir(funcion, *args, **kwargs)
+
+
+def respuesta_demorada(error):
+    """503 con Retry-After para una EscrituraDemorada (@idempotente la reconoce)"""
+    response = JsonResponse({'success': False, 'error': str(error)}, status=503)
+    response['Retry-After'] = str(REINTENTO_SEGUNDOS)
+    response.escritura_demorada = error.futuro
+    return response
@@ -0,0 +1,213 @@
+"""
+Eventos en vivo de asientos y salidas (Server-Sent Events)
+
+Las escrituras publican eventos compactos en un difusor en memoria del
+proceso cuando su transacción se confirma; /api/eventos/ (vista asíncrona,
+servida por transporte/asgi.py) los reenvía a cada cliente suscrito a una
+salida o a un día. Cada suscriptor tiene su propia cola asyncio en el loop
+del servidor: publicar desde cualquier hilo (vistas WSGI, escritor único,
+barrido de retenciones) no bloquea ni espera a los clientes lentos.
+
+Tipos de evento y sus datos:
+
+    asiento_vendido      {'asientos': [...], 'tipo_pasaje': ...}
+    asiento_liberado     {'asientos': [...]}   (baja de un pasaje)
+    asiento_retenido     {'asientos': [...], 'segundos': ...}
+    retencion_liberada   {'asientos': [...]}   (liberada, vencida o vendida)
+    check_in             {'pasaje_id': ..., 'asiento': ...}
+    encomienda_entregada {'encomienda_id': ...}
+    salida_estado        {'estado': ...}
+    reinicio             {'motivo': ...}       (volver a pedir el estado completo)
+
+Los ids son "<instancia>-<n>": con Last-Event-ID (o ?desde=) se reenvían los
+eventos del historial posteriores a ese id. Si el id es de otro proceso o ya
+salió del historial se envía un `reinicio`. Con varios workers cada proceso
+solo ve sus propias escrituras: para eso hace falta un difusor compartido
+(por ejemplo Redis pub/sub) con la misma interfaz.
+"""
+import asyncio
+import json
+import secrets
+import threading
+from collections import deque
+from dataclasses import dataclass, field
+
+from django.conf import settings
+from django.db import transaction
+from django.utils import timezone
+
+
+@dataclass(frozen=True)
+class Evento:
+    id: str
+    tipo: str
+    salida_id: int
+    fecha: str
+    datos: dict = field(default_factory=dict)
+
+    @property
+    def numero(self):
+        return int(self.id.rsplit('-', 1)[1])
+
+    def como_sse(self):
+        datos = json.dumps(
+            {'salida_id': self.salida_id, 'fecha': self.fecha, **self.datos},
+            separators=(',', ':'), ensure_ascii=False
+        )
+        return f'id: {self.id}\nevent: {self.tipo}\ndata: {datos}\n\n'
+
+
+class Suscripcion:
+    """Cola de eventos de un cliente, atada al loop asyncio que la consume"""
+
+    def __init__(self, salida_id=None, fecha=None, maximo=None):
+        self.salida_id = salida_id
+        self.fecha = fecha
+        self.desbordada = False
+        self._loop = asyncio.get_running_loop()
+        self._cola = asyncio.Queue(maxsize=maximo or 0)
+
+    @property
+    def clave(self):
+        return ('salida', self.salida_id) if self.salida_id is not None else ('fecha', self.fecha)
+
+    def acepta(self, evento):
+        if self.salida_id is not None:
+            return evento.salida_id == self.salida_id
+        return evento.fecha == self.fecha
+
+    def entregar(self, evento):
+        """Seguro desde cualquier hilo; False si el loop del cliente ya terminó"""
+        try:
+            self._loop.call_soon_threadsafe(self._poner, evento)
+        except RuntimeError:
+            return False
+        return True
+
+    def _poner(self, evento):
+        if self.desbordada:
+            return
+        try:
+            self._cola.put_nowait(evento)
+        except asyncio.QueueFull:
+            # Cliente demasiado lento: se le pide reconectar en vez de crecer sin límite
+            self.desbordada = True
+            self._cola.get_nowait()
+            self._cola.put_nowait(None)
+
+    async def siguiente(self, timeout=None):
+        """Próximo evento, None si se desbordó o TimeoutError si no hubo nada en `timeout` segundos"""
+        return await asyncio.wait_for(self._cola.get(), timeout)
+
+
+class Difusor:
+
+    def __init__(self, historial=None, cola_maxima=None):
+        self._historial_maximo = historial
+        self._cola_maxima = cola_maxima
+        self._candado = threading.Lock()
+        self._instancia = secrets.token_hex(4)
+        self._contador = 0
+        self._historial = deque(maxlen=self.historial_maximo)
+        self._suscripciones = {}  # ('salida', id) | ('fecha', 'AAAA-MM-DD') -> {Suscripcion}
+        self.publicados = 0
+        self.descartados = 0
+
+    @property
+    def historial_maximo(self):
+        return self._historial_maximo or getattr(settings, 'EVENTOS_HISTORIAL', 1000)
+
+    @property
+    def cola_maxima(self):
+        return self._cola_maxima or getattr(settings, 'EVENTOS_COLA_MAXIMA', 256)
+
+    def publicar(self, tipo, salida_id, fecha, **datos):
+        fecha = fecha.isoformat() if hasattr(fecha, 'isoformat') else fecha
+        with self._candado:
+            self._contador += 1
+            evento = Evento(f'{self._instancia}-{self._contador}', tipo, salida_id, fecha, datos)
+            self._historial.append(evento)
+            self.publicados += 1
+            destinatarios = [
+                *self._suscripciones.get(('salida', salida_id), ()),
+                *self._suscripciones.get(('fecha', fecha), ()),
+            ]
+        for suscripcion in destinatarios:
+            if not suscripcion.entregar(evento):
+                self.desuscribir(suscripcion)
+                self.descartados += 1
+        return evento
+
+    def suscribir(self, salida_id=None, fecha=None, desde=None):
+        """
+        Registra una suscripción (llamar desde el loop que la va a consumir) y
+        devuelve (suscripcion, eventos a reenviar). Con `desde` los eventos
+        pendientes salen del historial en la misma sección crítica del
+        registro: ninguno se pierde ni se repite entre el historial y la cola.
+        """
+        fecha = fecha.isoformat() if hasattr(fecha, 'isoformat') else fecha
+        suscripcion = Suscripcion(salida_id=salida_id, fecha=fecha, maximo=self.cola_maxima)
+        with self._candado:
+            self._suscripciones.setdefault(suscripcion.clave, set()).add(suscripcion)
+            pendientes = self._pendientes(suscripcion, desde) if desde else []
+        return suscripcion, pendientes
+
+    def _pendientes(self, suscripcion, desde):
+        instancia, _, numero = desde.rpartition('-')
+        primero = self._historial[0].numero if self._historial else self._contador + 1
+        if instancia != self._instancia or not numero.isdigit() or int(numero) < primero - 1:
+            return [self._reinicio(suscripcion, 'historial')]
+        numero = int(numero)
+        return [
+            evento for evento in self._historial
+            if evento.numero > numero and suscripcion.acepta(evento)
+        ]
+
+    def _reinicio(self, suscripcion, motivo):
+        # Con el id del último evento publicado: tras pedir el estado completo
+        # el cliente reconecta desde aquí
+        return Evento(
+            f'{self._instancia}-{self._contador}', 'reinicio', suscripcion.salida_id,
+            suscripcion.fecha, {'motivo': motivo}
+        )
+
+    def reinicio(self, suscripcion, motivo):
+        with self._candado:
+            return self._reinicio(suscripcion, motivo)
+
+    def desuscribir(self, suscripcion):
+        with self._candado:
+            suscripciones = self._suscripciones.get(suscripcion.clave)
+            if suscripciones is not None:
+                suscripciones.discard(suscripcion)
+                if not suscripciones:
+                    del self._suscripciones[suscripcion.clave]
+
+    def suscriptores(self):
+        with self._candado:
+            return sum(len(s) for s in self._suscripciones.values())
+
+    def estadisticas(self):
+        return {
+            'suscriptores': self.suscriptores(),
+            'publicados': self.publicados,
+            'descartados': self.descartados,
+            'historial': len(self._historial),
+        }
+
+    def limpiar(self):
+        with self._candado:
+            self._historial.clear()
+            self._suscripciones.clear()
+
+
+difusor = Difusor()
+
+
+def fecha_local(momento):
+    return timezone.localdate(momento)
+
+
+def publicar_al_confirmar(tipo, salida_id, fecha, **datos):
+    """Publica el evento cuando la transacción en curso se confirme (nunca si se revierte)"""
+    transaction.on_commit(lambda: difusor.publicar(tipo, salida_id, fecha, **datos))
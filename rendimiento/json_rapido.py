@@ -0,0 +1,111 @@
+"""
+Serialización JSON rápida para DRF y para las vistas con JsonResponse
+
+Las respuestas grandes (salidas, pasajes, manifiestos) pasaban por el
+JSONRenderer de DRF y por JsonResponse, ambos sobre el módulo json de la
+biblioteca estándar. Aquí las dos rutas comparten un mismo motor:
+
+- RenderizadorJSON reemplaza a JSONRenderer en DEFAULT_RENDERER_CLASSES.
+- JsonResponse tiene la firma de django.http.JsonResponse: las vistas solo
+  cambian el import.
+
+El motor se elige con JSON_MOTOR: 'orjson' (por defecto si está instalado)
+o 'json' (biblioteca estándar). Se pueden registrar otros con
+registrar_motor(nombre, funcion), donde funcion(datos, indentar) -> bytes.
+
+Con ambos motores Decimal se escribe como número (igual que el encoder de
+DRF) y datetime/date/time en ISO 8601, con 'Z' para UTC.
+"""
+import datetime
+import json
+import uuid
+from decimal import Decimal
+
+from django.conf import settings
+from django.http import HttpResponse
+from rest_framework.renderers import JSONRenderer
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - el motor estándar queda disponible
+    orjson = None
+
+_MOTORES = {}
+
+
+def registrar_motor(nombre, funcion):
+    _MOTORES[nombre] = funcion
+
+
+def motores_disponibles():
+    return sorted(_MOTORES)
+
+
+def _por_defecto(obj):
+    """Tipos que ningún motor escribe por sí solo"""
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    raise TypeError(f'Objeto de tipo {type(obj).__name__} no serializable a JSON')
+
+
+def _por_defecto_estandar(obj):
+    if isinstance(obj, datetime.datetime):
+        texto = obj.isoformat()
+        return texto[:-6] + 'Z' if texto.endswith('+00:00') else texto
+    if isinstance(obj, (datetime.date, datetime.time)):
+        return obj.isoformat()
+    return _por_defecto(obj)
+
+
+def _estandar(datos, indentar=False):
+    return json.dumps(
+        datos, default=_por_defecto_estandar, ensure_ascii=False, allow_nan=False,
+        indent=2 if indentar else None, separators=None if indentar else (',', ':')
+    ).encode()
+
+
+registrar_motor('json', _estandar)
+
+if orjson is not None:
+    _OPCIONES_ORJSON = orjson.OPT_UTC_Z | orjson.OPT_NON_STR_KEYS
+
+    def _orjson(datos, indentar=False):
+        opciones = _OPCIONES_ORJSON | orjson.OPT_INDENT_2 if indentar else _OPCIONES_ORJSON
+        return orjson.dumps(datos, default=_por_defecto, option=opciones)
+
+    registrar_motor('orjson', _orjson)
+
+
+def motor():
+    nombre = getattr(settings, 'JSON_MOTOR', None) or ('orjson' if 'orjson' in _MOTORES else 'json')
+    return _MOTORES[nombre]
+
+
+def dumps(datos, indentar=False):
+    """JSON en bytes UTF-8 con el motor configurado"""
+    return motor()(datos, indentar)
+
+
+class RenderizadorJSON(JSONRenderer):
+    """JSONRenderer de DRF con el motor rápido (respeta ?indent en Accept)"""
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indentar = bool(self.get_indent(accepted_media_type or '', renderer_context or {}))
+        return dumps(data, indentar)
+
+
+class JsonResponse(HttpResponse):
+    """Reemplazo de django.http.JsonResponse que serializa con el motor rápido"""
+
+    def __init__(self, data, encoder=None, safe=True, json_dumps_params=None, **kwargs):
+        # encoder y json_dumps_params se aceptan por compatibilidad y se ignoran
+        if safe and not isinstance(data, dict):
+            raise TypeError('In order to allow non-dict objects to be serialized set the safe parameter to False.')
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(content=dumps(data), **kwargs)
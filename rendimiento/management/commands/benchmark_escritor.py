@@ -0,0 +1,78 @@
+import threading
+import time
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test.utils import override_settings
+from django.utils import timezone
+
+from pasajes.asientos import asignar_asiento
+from rendimiento.escritor import escribir, escritor
+from rutas.models import Ruta, Salida
+from usuarios.models import Usuario
+from vehiculos.models import Vehiculo
+
+
+class Command(BaseCommand):
+    help = ('Compara ventas concurrentes por escritura directa y por el escritor único (group commit). '
+            'Crea y luego elimina sus propias salidas: usar en una base de datos de pruebas')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=8)
+        parser.add_argument('--ventas', type=int, default=40, help='Ventas por hilo, máximo 40 (default: 40)')
+
+    def handle(self, *args, **options):
+        hilos, ventas = options['hilos'], options['ventas']
+        if not 0 < ventas <= 40:
+            raise CommandError('--ventas debe estar entre 1 y 40 (capacidad de la salida)')
+        conductor = Usuario.objects.create(username=f'bench_escritor_{time.time_ns()}', tipo='conductor')
+        vehiculo = Vehiculo.objects.create(placa=f'BE{time.time_ns() % 10 ** 8}', marca='Bench', modelo='Bench',
+                                           año=2024, capacidad=40, conductor=conductor)
+        ruta = Ruta.objects.create(nombre='Benchmark escritor', origen='A', destino='B', distancia_km=1,
+                                   tiempo_estimado=timedelta(hours=1), precio_pasaje=10, precio_encomienda_kg=1)
+        try:
+            for nombre, unico in (('directa', False), ('escritor único', True)):
+                # Una salida por hilo: las ventas no compiten por el asiento, solo por el candado de escritura
+                salidas = [
+                    Salida.objects.create(ruta=ruta, vehiculo=vehiculo, conductor=conductor,
+                                          fecha_hora=timezone.now() + timedelta(days=1, minutes=n + 100 * unico))
+                    for n in range(hilos)
+                ]
+                peticiones, lotes = escritor.peticiones, escritor.lotes
+                with override_settings(ESCRITOR_UNICO=unico):
+                    por_segundo = self.medir([s.id for s in salidas], ventas)
+                detalle = ''
+                if unico and escritor.lotes > lotes:
+                    detalle = f' ({(escritor.peticiones - peticiones) / (escritor.lotes - lotes):.1f} ventas por COMMIT)'
+                self.stdout.write(f'{nombre:<15} {hilos * ventas} ventas, {por_segundo:8.1f} ventas/s{detalle}')
+        finally:
+            Salida.objects.filter(vehiculo=vehiculo).delete()
+            ruta.delete()
+            vehiculo.delete()
+            conductor.delete()
+
+    def medir(self, salida_ids, ventas):
+        inicio = threading.Barrier(len(salida_ids))
+        errores = []
+
+        def ventanilla(salida_id):
+            inicio.wait()
+            try:
+                for asiento in range(1, ventas + 1):
+                    escribir(asignar_asiento, salida_id, asiento, nombre='Bench', dni='12345678')
+            except Exception as e:
+                errores.append(repr(e))
+            finally:
+                connection.close()
+
+        t0 = time.perf_counter()
+        hilos = [threading.Thread(target=ventanilla, args=(salida_id,)) for salida_id in salida_ids]
+        for hilo in hilos:
+            hilo.start()
+        for hilo in hilos:
+            hilo.join()
+        duracion = time.perf_counter() - t0
+        if errores:
+            self.stderr.write(f'{len(errores)} errores, el primero: {errores[0]}')
+        return len(salida_ids) * ventas / duracion
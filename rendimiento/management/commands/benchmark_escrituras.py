@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+
+from rendimiento.contencion import CONFIGURACIONES, medir
+
+
+class Command(BaseCommand):
+    help = ('Compara ventas concurrentes de varios procesos sobre SQLite con la configuración '
+            'por defecto y con la afinada de transporte/sqlite.py')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--procesos', type=int, default=4)
+        parser.add_argument('--ventas', type=int, default=200, help='Ventas por proceso (default: 200)')
+        parser.add_argument('--salidas', type=int, default=20)
+
+    def handle(self, *args, **options):
+        resultados = [
+            medir(nombre, procesos=options['procesos'], ventas_por_proceso=options['ventas'],
+                  salidas=options['salidas'])
+            for nombre in CONFIGURACIONES
+        ]
+        total = options['procesos'] * options['ventas']
+        for r in resultados:
+            self.stdout.write(
+                f'{r["configuracion"]:<12} {r["confirmadas"]:>6}/{total} confirmadas, '
+                f'{r["bloqueos"]:>5} "database is locked", {r["segundos"]:>7.2f}s, '
+                f'{r["ventas_por_segundo"]:>8.1f} ventas/s'
+            )
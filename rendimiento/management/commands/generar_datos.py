@@ -0,0 +1,226 @@
+import random
+import time
+from datetime import date, datetime, timedelta
+from decimal import Decimal
+
+from django.contrib.auth.hashers import make_password
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.utils import timezone
+
+from encomiendas.models import Encomienda
+from pasajes.models import Pasaje
+from rendimiento.cache_catalogo import invalidar
+from rutas.models import Ruta, Salida
+from usuarios.models import Usuario
+from vehiculos.models import Vehiculo
+
+NOMBRES = ['Juan', 'María', 'José', 'Rosa', 'Luis', 'Ana', 'Carlos', 'Carmen', 'Jorge', 'Elena',
+           'Pedro', 'Julia', 'Miguel', 'Lucía', 'Víctor', 'Norma', 'Rubén', 'Sonia', 'Édgar', 'Yolanda']
+APELLIDOS = ['Quispe', 'Mamani', 'Condori', 'Huanca', 'Apaza', 'Ccama', 'Flores', 'Choque', 'Ticona',
+             'Pari', 'Coaquira', 'Cruz', 'Calla', 'Vilca', 'Luque', 'Chambi', 'Turpo', 'Larico']
+CIUDADES = ['Juliaca', 'Puno', 'La Rinconada', 'Ananea', 'Putina', 'Azángaro', 'Huancané', 'Ayaviri',
+            'Lampa', 'Ilave', 'Juli', 'Moho', 'Sandia', 'Macusani', 'Crucero']
+VEHICULOS = [('Toyota', 'Hiace', 15), ('Hyundai', 'H1', 12), ('Nissan', 'Urvan', 15),
+             ('Mercedes-Benz', 'Sprinter', 20), ('Toyota', 'Hilux', 4)]
+DESCRIPCIONES = ['Caja de víveres', 'Saco de papas', 'Repuestos', 'Medicinas', 'Ropa', 'Documentos',
+                 'Herramientas', 'Quesos', 'Chuño', 'Equipo de minería']
+
+# Hora de salida: (hora, peso de la hora en el total de salidas, ocupación media)
+# Las salidas de madrugada y mañana salen casi llenas
+HORARIOS = [(4, 3, 0.95), (5, 5, 0.95), (6, 5, 0.92), (7, 4, 0.85), (9, 3, 0.6), (11, 2, 0.45),
+            (13, 2, 0.5), (15, 3, 0.6), (17, 3, 0.7), (19, 1, 0.4)]
+
+
+class Command(BaseCommand):
+    help = ('Genera datos sintéticos (conductores, vehículos, rutas, salidas, pasajes y encomiendas) '
+            'con bulk_create por lotes y una semilla reproducible. Usar en una base de datos de pruebas')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--conductores', type=int, default=40)
+        parser.add_argument('--vehiculos', type=int, help='Default: uno por conductor')
+        parser.add_argument('--rutas', type=int, default=20)
+        parser.add_argument('--salidas', type=int, default=10000)
+        parser.add_argument('--meses', type=int, default=6,
+                            help='Meses hacia atrás sobre los que se reparten las salidas (más 7 días adelante)')
+        parser.add_argument('--pasajes', type=int,
+                            help='Total aproximado de pasajes. Default: según la ocupación típica por hora')
+        parser.add_argument('--encomiendas-por-salida', type=float, default=2.0, dest='encomiendas_por_salida')
+        parser.add_argument('--reservas-conductor', type=float, default=0.1, dest='reservas_conductor',
+                            help='Fracción de pasajes que son reserva_conductor (default: 0.1)')
+        parser.add_argument('--hasta', type=date.fromisoformat,
+                            help='Fecha de referencia YYYY-MM-DD (default: hoy). Misma semilla y fecha = mismos datos')
+        parser.add_argument('--semilla', type=int, default=42)
+        parser.add_argument('--prefijo', default='sim',
+                            help='Prefijo de usernames, placas y nombres de ruta, hasta 4 caracteres')
+        parser.add_argument('--lote', type=int, default=2000, help='Salidas por transacción (default: 2000)')
+
+    def handle(self, *args, **options):
+        self.rng = random.Random(options['semilla'])
+        self.prefijo = options['prefijo']
+        if not 0 < len(self.prefijo) <= 4:
+            raise CommandError('El prefijo debe tener entre 1 y 4 caracteres (se usa en las placas)')
+        if Usuario.objects.filter(username__startswith=f'{self.prefijo}_').exists():
+            raise CommandError(f'Ya existen datos con el prefijo "{self.prefijo}": usar otro --prefijo')
+
+        inicio = time.perf_counter()
+        conductores = self.crear_conductores(options['conductores'])
+        vehiculos = self.crear_vehiculos(options['vehiculos'] or len(conductores), conductores)
+        rutas = self.crear_rutas(options['rutas'])
+        self.stdout.write(f'{len(conductores)} conductores, {len(vehiculos)} vehículos, {len(rutas)} rutas')
+
+        hasta = options['hasta'] or timezone.localdate()
+        dias = list(range(-options['meses'] * 30, 8))
+        planes = self.planificar_salidas(options['salidas'], vehiculos, rutas, hasta, dias, options['pasajes'])
+
+        totales = {'salidas': 0, 'pasajes': 0, 'encomiendas': 0}
+        for desde in range(0, len(planes), options['lote']):
+            with transaction.atomic():
+                lote = self.crear_lote(planes[desde:desde + options['lote']], options)
+            for clave in totales:
+                totales[clave] += lote[clave]
+            self.stdout.write(
+                f'  salidas {totales["salidas"]}/{len(planes)}, pasajes {totales["pasajes"]}, '
+                f'encomiendas {totales["encomiendas"]}'
+            )
+
+        # bulk_create no dispara señales: descartar las respuestas de catálogo guardadas
+        invalidar()
+        self.stdout.write(self.style.SUCCESS(
+            f'{totales["salidas"]} salidas, {totales["pasajes"]} pasajes y {totales["encomiendas"]} '
+            f'encomiendas en {time.perf_counter() - inicio:.1f}s'
+        ))
+
+    def nombre(self):
+        return f'{self.rng.choice(NOMBRES)} {self.rng.choice(APELLIDOS)} {self.rng.choice(APELLIDOS)}'
+
+    def telefono(self):
+        return f'9{self.rng.randrange(10 ** 8):08d}'
+
+    def crear_conductores(self, cantidad):
+        # Un solo hash para todos: make_password por usuario tardaría minutos
+        password = make_password('conductor123')
+        conductores = []
+        for i in range(cantidad):
+            nombre, apellido = self.rng.choice(NOMBRES), self.rng.choice(APELLIDOS)
+            conductores.append(Usuario(
+                username=f'{self.prefijo}_conductor{i + 1}', first_name=nombre, last_name=apellido,
+                tipo='conductor', telefono=self.telefono(), password=password
+            ))
+        return Usuario.objects.bulk_create(conductores)
+
+    def crear_vehiculos(self, cantidad, conductores):
+        vehiculos = []
+        for i in range(cantidad):
+            marca, modelo, capacidad = self.rng.choices(VEHICULOS, weights=[5, 3, 3, 1, 1])[0]
+            vehiculos.append(Vehiculo(
+                placa=f'{self.prefijo.upper()}-{i + 1:05d}', marca=marca, modelo=modelo,
+                año=self.rng.randint(2008, 2024), capacidad=capacidad,
+                conductor=conductores[i % len(conductores)] if conductores else None
+            ))
+        return Vehiculo.objects.bulk_create(vehiculos)
+
+    def crear_rutas(self, cantidad):
+        rutas = []
+        for i in range(cantidad):
+            origen, destino = self.rng.sample(CIUDADES, 2)
+            distancia = Decimal(self.rng.randint(30, 300))
+            rutas.append(Ruta(
+                nombre=f'{self.prefijo} {origen} - {destino} {i + 1}', origen=origen, destino=destino,
+                distancia_km=distancia, tiempo_estimado=timedelta(minutes=int(distancia * 2)),
+                precio_pasaje=Decimal(max(5, int(distancia / 8))),
+                precio_encomienda_kg=Decimal('1.50') + Decimal(self.rng.randint(0, 10)) / 10
+            ))
+        return Ruta.objects.bulk_create(rutas)
+
+    def planificar_salidas(self, cantidad, vehiculos, rutas, hasta, dias, pasajes_objetivo):
+        """Lista de (vehiculo, ruta, fecha_hora, ocupados) sin repetir (vehiculo, fecha_hora)"""
+        if cantidad > len(vehiculos) * len(dias) * len(HORARIOS):
+            raise CommandError('Demasiadas salidas para los vehículos y meses indicados: '
+                               'aumentar --vehiculos o --meses')
+        horas = [h for h, _, _ in HORARIOS]
+        pesos = [p for _, p, _ in HORARIOS]
+        ocupacion_media = {h: o for h, _, o in HORARIOS}
+        zona = timezone.get_current_timezone()
+
+        usados = set()
+        planes = []
+        while len(planes) < cantidad:
+            vehiculo = self.rng.choice(vehiculos)
+            dia = self.rng.choice(dias)
+            hora = self.rng.choices(horas, weights=pesos)[0]
+            if (vehiculo.pk, dia, hora) in usados:
+                continue
+            usados.add((vehiculo.pk, dia, hora))
+            fecha_hora = datetime.combine(hasta + timedelta(days=dia), datetime.min.time()).replace(
+                hour=hora, minute=self.rng.choice([0, 15, 30, 45])
+            )
+            # Ocupación con ruido alrededor de la media de la hora
+            fraccion = min(1.0, max(0.0, self.rng.gauss(ocupacion_media[hora], 0.15)))
+            planes.append([vehiculo, self.rng.choice(rutas), timezone.make_aware(fecha_hora, zona), fraccion])
+
+        capacidad_total = sum(v.capacidad * f for v, _, _, f in planes) or 1
+        escala = pasajes_objetivo / capacidad_total if pasajes_objetivo else 1
+        for plan in planes:
+            plan[3] = min(plan[0].capacidad, round(plan[0].capacidad * plan[3] * escala))
+        planes.sort(key=lambda plan: plan[2])
+        return planes
+
+    def estado_salida(self, fecha_hora, ahora):
+        if fecha_hora.date() < ahora.date():
+            return 'cancelada' if self.rng.random() < 0.03 else 'completada'
+        if fecha_hora <= ahora:
+            return 'en_curso'
+        return 'programada'
+
+    def crear_lote(self, planes, options):
+        ahora = timezone.now()
+        salidas = []
+        encomiendas_por_salida = []
+        for vehiculo, ruta, fecha_hora, ocupados in planes:
+            estado = self.estado_salida(fecha_hora, ahora)
+            if estado == 'cancelada':
+                ocupados = 0
+            encomiendas = [
+                Decimal(self.rng.randint(5, 300)) / 10
+                for _ in range(int(self.rng.expovariate(1 / options['encomiendas_por_salida'])))
+            ] if estado != 'cancelada' and options['encomiendas_por_salida'] else []
+            encomiendas_por_salida.append(encomiendas)
+            salidas.append(Salida(
+                vehiculo=vehiculo, ruta=ruta, conductor_id=vehiculo.conductor_id, fecha_hora=fecha_hora,
+                estado=estado, pasajeros_count=ocupados, encomiendas_count=len(encomiendas),
+                peso_encomiendas_kg=sum(encomiendas, Decimal('0'))
+            ))
+        # bulk_create no pasa por save() ni por las señales: los contadores ya van calculados
+        salidas = Salida.objects.bulk_create(salidas)
+
+        pasajes = []
+        encomiendas = []
+        for salida, (vehiculo, ruta, _, _), pesos in zip(salidas, planes, encomiendas_por_salida):
+            pasada = salida.estado in ('completada', 'en_curso')
+            asientos = self.rng.sample(range(1, vehiculo.capacidad + 1), salida.pasajeros_count)
+            for asiento in asientos:
+                reserva = self.rng.random() < options['reservas_conductor']
+                if pasada:
+                    estado = 'no_show' if self.rng.random() < 0.04 else 'abordado'
+                else:
+                    estado = 'pagado' if reserva or self.rng.random() < 0.8 else 'reservado'
+                pasajes.append(Pasaje(
+                    salida=salida, nombre=self.nombre(), dni=f'{self.rng.randrange(10 ** 8):08d}',
+                    telefono=self.telefono() if self.rng.random() < 0.7 else '', asiento=asiento,
+                    precio=Decimal('0.00') if reserva else ruta.precio_pasaje,
+                    tipo_pasaje='reserva_conductor' if reserva else 'vendido',
+                    reservado_por_id=salida.conductor_id if reserva else None, estado=estado
+                ))
+            for peso in pesos:
+                encomiendas.append(Encomienda(
+                    salida=salida, remitente_nombre=self.nombre(), remitente_telefono=self.telefono(),
+                    destinatario_nombre=self.nombre(), destinatario_telefono=self.telefono(),
+                    descripcion=self.rng.choice(DESCRIPCIONES), peso_kg=peso,
+                    precio=(peso * ruta.precio_encomienda_kg).quantize(Decimal('0.01')),
+                    estado='entregada' if pasada else 'enviada',
+                    entregada_at=salida.fecha_hora + ruta.tiempo_estimado if pasada else None
+                ))
+        Pasaje.objects.bulk_create(pasajes, batch_size=5000)
+        Encomienda.objects.bulk_create(encomiendas, batch_size=5000)
+        return {'salidas': len(salidas), 'pasajes': len(pasajes), 'encomiendas': len(encomiendas)}
@@ -0,0 +1,120 @@
+"""
+Histogramas deslizantes por endpoint, en memoria del proceso
+
+Cada petición suma su duración, tiempo de SQL, consultas y bytes al tramo
+del minuto actual de su endpoint; las consultas agregan los últimos
+RENDIMIENTO_VENTANA_MINUTOS. Son por proceso: con varios workers cada uno
+ve su parte (para el total usar /metrics).
+"""
+import bisect
+import threading
+import time
+from dataclasses import dataclass, field
+
+from django.conf import settings
+
+# Límites superiores de los buckets de duración en milisegundos (el último es +Inf)
+LIMITES_MS = (5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+
+@dataclass
+class Tramo:
+    peticiones: int = 0
+    errores: int = 0
+    duracion_ms: float = 0
+    sql_ms: float = 0
+    consultas: int = 0
+    consultas_max: int = 0
+    bytes: int = 0
+    buckets: list = field(default_factory=lambda: [0] * (len(LIMITES_MS) + 1))
+
+    def sumar(self, otro):
+        self.peticiones += otro.peticiones
+        self.errores += otro.errores
+        self.duracion_ms += otro.duracion_ms
+        self.sql_ms += otro.sql_ms
+        self.consultas += otro.consultas
+        self.consultas_max = max(self.consultas_max, otro.consultas_max)
+        self.bytes += otro.bytes
+        self.buckets = [a + b for a, b in zip(self.buckets, otro.buckets)]
+
+    def percentil(self, p):
+        """Límite superior del bucket que contiene el percentil p (0-100)"""
+        objetivo = self.peticiones * p / 100
+        acumulado = 0
+        for limite, cantidad in zip(LIMITES_MS + (float('inf'),), self.buckets):
+            acumulado += cantidad
+            if cantidad and acumulado >= objetivo:
+                return limite
+        return 0
+
+    def como_dict(self):
+        n = self.peticiones or 1
+        return {
+            'peticiones': self.peticiones,
+            'errores': self.errores,
+            'duracion_media_ms': round(self.duracion_ms / n, 2),
+            'p50_ms': self.percentil(50),
+            'p95_ms': self.percentil(95),
+            'p99_ms': self.percentil(99),
+            'sql_medio_ms': round(self.sql_ms / n, 2),
+            'consultas_media': round(self.consultas / n, 2),
+            'consultas_max': self.consultas_max,
+            'bytes_medio': round(self.bytes / n),
+            'buckets_ms': dict(zip([str(l) for l in LIMITES_MS] + ['+Inf'], self.buckets)),
+        }
+
+
+class RegistroMetricas:
+
+    def __init__(self, ventana_minutos=None):
+        self._ventana_minutos = ventana_minutos
+        self._candado = threading.Lock()
+        self._tramos = {}  # (metodo, endpoint) -> {minuto: Tramo}
+
+    @property
+    def ventana_minutos(self):
+        return self._ventana_minutos or getattr(settings, 'RENDIMIENTO_VENTANA_MINUTOS', 15)
+
+    def observar(self, metodo, endpoint, status, duracion_ms, sql_ms, consultas, bytes_respuesta):
+        minuto = int(time.time() // 60)
+        with self._candado:
+            tramos = self._tramos.setdefault((metodo, endpoint), {})
+            tramo = tramos.get(minuto)
+            if tramo is None:
+                tramo = tramos[minuto] = Tramo()
+                self._descartar_viejos(tramos, minuto)
+            tramo.peticiones += 1
+            tramo.errores += status >= 500
+            tramo.duracion_ms += duracion_ms
+            tramo.sql_ms += sql_ms
+            tramo.consultas += consultas
+            tramo.consultas_max = max(tramo.consultas_max, consultas)
+            tramo.bytes += bytes_respuesta
+            tramo.buckets[bisect.bisect_left(LIMITES_MS, duracion_ms)] += 1
+
+    def _descartar_viejos(self, tramos, minuto):
+        for viejo in [m for m in tramos if m <= minuto - self.ventana_minutos]:
+            del tramos[viejo]
+
+    def instantanea(self):
+        """{'GET api/salidas/': {...}} con lo agregado en la ventana, más lento primero"""
+        desde = int(time.time() // 60) - self.ventana_minutos
+        resultado = []
+        with self._candado:
+            for (metodo, endpoint), tramos in self._tramos.items():
+                total = Tramo()
+                for minuto, tramo in tramos.items():
+                    if minuto > desde:
+                        total.sumar(tramo)
+                if total.peticiones:
+                    resultado.append((f'{metodo} {endpoint}', total))
+        resultado.sort(key=lambda item: item[1].duracion_ms / item[1].peticiones, reverse=True)
+        return {nombre: tramo.como_dict() for nombre, tramo in resultado}
+
+    def limpiar(self):
+        with self._candado:
+            self._tramos.clear()
+
+
+registro = RegistroMetricas()
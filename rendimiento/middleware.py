@@ -0,0 +1,128 @@
+"""
+Instrumentación por petición: consultas SQL, tiempo de SQL, tiempo total y bytes
+
+Agrega a cada respuesta las cabeceras X-Query-Count y Server-Timing (visibles
+en la pestaña Network del navegador), registra en el log `rendimiento` las
+peticiones que superan el presupuesto (salvo las respuestas en streaming) y
+alimenta los histogramas por endpoint de rendimiento.metricas y las métricas
+de Prometheus (/metrics).
+
+Funciona en WSGI y en ASGI: bajo ASGI no fuerza el salto a un hilo en cada
+petición (el flujo SSE queda en el bucle de eventos). Las conexiones de la
+base son por hilo, así que los contadores se instalan y se retiran con
+sync_to_async en el mismo hilo en que Django ejecuta las vistas síncronas.
+"""
+import logging
+import time
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.db import connections
+
+from . import prometheus
+from .metricas import registro
+
+logger = logging.getLogger('rendimiento')
+
+
+class Medicion:
+    """execute_wrapper que cuenta y cronometra las consultas de la petición"""
+
+    def __init__(self):
+        self.consultas = 0
+        self.sql_ms = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        inicio = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.consultas += 1
+            self.sql_ms += (time.perf_counter() - inicio) * 1000
+
+
+def nombre_vista(request):
+    """Nombre de la URL en transporte/urls.py (etiqueta de las métricas de Prometheus)"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<sin_ruta>'
+    return match.url_name or match.view_name
+
+
+def nombre_endpoint(request):
+    """Patrón de la URL (api/salida/<int:salida_id>/vender/): agrupa todas las salidas"""
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return '<sin ruta>'
+    return match.route or match.view_name
+
+
+def instalar_medicion(medicion):
+    """Instala la medición en las conexiones del hilo actual; se retira con close()"""
+    pila = ExitStack()
+    for conexion in connections.all():
+        pila.enter_context(conexion.execute_wrapper(medicion))
+    return pila
+
+
+class InstrumentacionMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.async_mode = iscoroutinefunction(get_response)
+        if self.async_mode:
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if self.async_mode:
+            return self.__acall__(request)
+        medicion = Medicion()
+        inicio = time.perf_counter()
+        with instalar_medicion(medicion):
+            response = self.get_response(request)
+        return self.registrar(request, response, medicion, inicio)
+
+    async def __acall__(self, request):
+        medicion = Medicion()
+        inicio = time.perf_counter()
+        pila = await sync_to_async(instalar_medicion)(medicion)
+        try:
+            response = await self.get_response(request)
+        finally:
+            await sync_to_async(pila.close)()
+        return self.registrar(request, response, medicion, inicio)
+
+    def registrar(self, request, response, medicion, inicio):
+        duracion_ms = (time.perf_counter() - inicio) * 1000
+
+        streaming = getattr(response, 'streaming', False)
+        tamano = 0 if streaming else len(response.content)
+        response['X-Query-Count'] = str(medicion.consultas)
+        response['Server-Timing'] = (
+            f'db;dur={medicion.sql_ms:.1f};desc="{medicion.consultas} consultas", '
+            f'total;dur={duracion_ms:.1f}'
+        )
+
+        endpoint = nombre_endpoint(request)
+        registro.observar(
+            request.method, endpoint, response.status_code, duracion_ms,
+            medicion.sql_ms, medicion.consultas, tamano
+        )
+        prometheus.observar_peticion(
+            request.method, nombre_vista(request), response.status_code, duracion_ms,
+            medicion.sql_ms, medicion.consultas
+        )
+        # Una respuesta en streaming (el flujo SSE) sigue abierta: su duración no es latencia
+        if streaming:
+            return response
+        if (duracion_ms > getattr(settings, 'RENDIMIENTO_PRESUPUESTO_MS', 500)
+                or medicion.consultas > getattr(settings, 'RENDIMIENTO_PRESUPUESTO_CONSULTAS', 30)):
+            logger.warning(
+                'Petición sobre presupuesto: %s %s (%s) → %s en %.1f ms, %d consultas (%.1f ms SQL), %d bytes',
+                request.method, request.get_full_path(), endpoint, response.status_code,
+                duracion_ms, medicion.consultas, medicion.sql_ms, tamano
+            )
+        return response
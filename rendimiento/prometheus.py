@@ -0,0 +1,109 @@
+"""
+Métricas para Prometheus, consistentes entre procesos
+
+Con varios workers (gunicorn, procesar_tareas) cada proceso escribe sus
+contadores en archivos mmap del directorio PROMETHEUS_MULTIPROC_DIR y
+/metrics suma los de todos. La variable debe apuntar a un directorio vacío
+antes de arrancar los procesos; en gunicorn, llamar a
+prometheus_client.multiprocess.mark_process_dead(worker.pid) en child_exit.
+Sin la variable las métricas son las del proceso actual.
+
+La profundidad de la cola de tareas se consulta a la base de datos en cada
+scrape, así que no depende de qué proceso responda.
+"""
+import os
+
+from prometheus_client import CollectorRegistry, Counter, Histogram, REGISTRY, multiprocess
+from prometheus_client.core import GaugeMetricFamily
+
+# Buckets de latencia en segundos (coinciden con los de rendimiento.metricas)
+BUCKETS_SEGUNDOS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+peticiones = Counter(
+    'transporte_http_peticiones_total', 'Peticiones HTTP atendidas',
+    ['metodo', 'vista', 'status']
+)
+duracion = Histogram(
+    'transporte_http_duracion_segundos', 'Duración de las peticiones HTTP',
+    ['metodo', 'vista'], buckets=BUCKETS_SEGUNDOS
+)
+consultas = Counter(
+    'transporte_db_consultas_total', 'Consultas SQL ejecutadas por las peticiones', ['vista']
+)
+duracion_sql = Counter(
+    'transporte_db_duracion_segundos_total', 'Tiempo acumulado en consultas SQL', ['vista']
+)
+operaciones_cache = Counter(
+    'transporte_cache_operaciones_total', 'Lecturas de caché por resultado (acierto/fallo)',
+    ['cache', 'resultado']
+)
+
+
+def multiproceso():
+    return bool(os.environ.get('PROMETHEUS_MULTIPROC_DIR'))
+
+
+def observar_peticion(metodo, vista, status, duracion_ms, sql_ms, cantidad_consultas):
+    peticiones.labels(metodo, vista, str(status)).inc()
+    duracion.labels(metodo, vista).observe(duracion_ms / 1000)
+    consultas.labels(vista).inc(cantidad_consultas)
+    duracion_sql.labels(vista).inc(sql_ms / 1000)
+
+
+def observar_cache(cache, acierto):
+    """cache: nombre lógico (manifiesto_pdf, ocupacion, ...)"""
+    operaciones_cache.labels(cache, 'acierto' if acierto else 'fallo').inc()
+
+
+def tasas_cache():
+    """Aciertos, fallos y tasa de aciertos por caché (de todos los procesos en modo multiproceso)"""
+    totales = {}
+    for metrica in registro_scrape().collect():
+        if metrica.name != 'transporte_cache_operaciones':
+            continue
+        for muestra in metrica.samples:
+            if muestra.name.endswith('_total'):
+                cache = totales.setdefault(muestra.labels['cache'], {'aciertos': 0, 'fallos': 0})
+                cache['aciertos' if muestra.labels['resultado'] == 'acierto' else 'fallos'] += int(muestra.value)
+    for cache in totales.values():
+        lecturas = cache['aciertos'] + cache['fallos']
+        cache['tasa_aciertos'] = round(cache['aciertos'] / lecturas, 3) if lecturas else None
+    return totales
+
+
+class ColaTareasCollector:
+    """Tareas por estado en la cola (tareas.Tarea), leídas al momento del scrape"""
+
+    def collect(self):
+        from django.db.models import Count
+        from tareas.models import Tarea
+
+        metrica = GaugeMetricFamily(
+            'transporte_tareas_en_cola', 'Tareas en segundo plano por estado', labels=['estado']
+        )
+        por_estado = dict(
+            Tarea.objects.filter(estado__in=['pendiente', 'en_proceso']).order_by().values_list('estado')
+            .annotate(total=Count('id'))
+        )
+        for estado in ('pendiente', 'en_proceso'):
+            metrica.add_metric([estado], por_estado.get(estado, 0))
+        yield metrica
+
+
+def registro_scrape():
+    """Registro a exponer: el agregado de todos los procesos en modo multiproceso"""
+    if multiproceso():
+        registro = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registro)
+    else:
+        registro = CollectorRegistry()
+        registro.register(_ProcesoActual())
+    registro.register(ColaTareasCollector())
+    return registro
+
+
+class _ProcesoActual:
+    """Expone el REGISTRY global dentro de un registro propio (para sumarle la cola)"""
+
+    def collect(self):
+        return REGISTRY.collect()
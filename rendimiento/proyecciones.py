@@ -0,0 +1,104 @@
+"""
+Proyecciones de solo lectura para serializar listas
+
+Las vistas de listas armaban cada dict desde instancias completas del
+modelo: una instancia por fila, get_full_name(), strftime, float(Decimal) y
+las propiedades del modelo fila por fila. Una Proyeccion declara solo las
+columnas que el JSON necesita, las lee con values_list (con los JOIN que
+hagan falta) y convierte cada columna de una pasada con map() antes de
+armar los dicts:
+
+    PASAJEROS = Proyeccion(
+        Columna('asiento'),
+        Columna('precio', convertir=float),
+        Columna('fecha_venta', 'created_at', convertir=fecha_hora_iso),
+    )
+    tabla = PASAJEROS.leer(Pasaje.objects.filter(salida=salida))
+    tabla.filas()            # [{'asiento': 1, 'precio': 25.0, ...}, ...]
+    sum(tabla['precio'])     # columnas completas para las estadísticas
+
+Los formatos de fecha replican los strftime que reemplazan (en la zona de
+la base de datos, como antes) sin pasar por strftime.
+"""
+
+
+class Columna:
+    """
+    Clave `nombre` del JSON a partir de los `campos` de values_list (por
+    defecto el mismo nombre). `convertir` recibe un valor por campo; con
+    `omitir_nulos` la clave no aparece en las filas donde vale None.
+    """
+
+    def __init__(self, nombre, *campos, convertir=None, omitir_nulos=False):
+        self.nombre = nombre
+        self.campos = campos or (nombre,)
+        self.convertir = convertir
+        self.omitir_nulos = omitir_nulos
+
+
+class Tabla:
+    """Resultado de una proyección guardado por columnas"""
+
+    def __init__(self, nombres, columnas, omitir_nulos=()):
+        self.nombres = nombres
+        self._columnas = dict(zip(nombres, columnas))
+        self._omitir_nulos = omitir_nulos
+
+    def __len__(self):
+        return len(next(iter(self._columnas.values()), ()))
+
+    def __getitem__(self, nombre):
+        return self._columnas[nombre]
+
+    def filas(self):
+        filas = [dict(zip(self.nombres, valores)) for valores in zip(*self._columnas.values())]
+        for nombre in self._omitir_nulos:
+            for fila in filas:
+                if fila[nombre] is None:
+                    del fila[nombre]
+        return filas
+
+
+class Proyeccion:
+
+    def __init__(self, *columnas):
+        self.columnas = columnas
+        # Cada campo se pide una sola vez aunque lo usen varias columnas
+        self.campos = list(dict.fromkeys(campo for columna in columnas for campo in columna.campos))
+        self._posicion = {campo: i for i, campo in enumerate(self.campos)}
+
+    def leer(self, queryset):
+        """Una consulta con solo los campos declarados; conversión columna por columna"""
+        filas = list(queryset.values_list(*self.campos))
+        leidas = list(zip(*filas)) if filas else [()] * len(self.campos)
+        columnas = []
+        for columna in self.columnas:
+            fuentes = [leidas[self._posicion[campo]] for campo in columna.campos]
+            if columna.convertir is None:
+                columnas.append(fuentes[0])
+            else:
+                columnas.append(list(map(columna.convertir, *fuentes)))
+        return Tabla(
+            [columna.nombre for columna in self.columnas],
+            columnas,
+            [columna.nombre for columna in self.columnas if columna.omitir_nulos]
+        )
+
+
+def nombre_completo(nombres, apellidos, username):
+    """Equivalente a get_full_name() or username"""
+    return f'{nombres} {apellidos}'.strip() or username
+
+
+def fecha_hora_iso(momento):
+    """'%Y-%m-%d %H:%M'"""
+    return momento.isoformat(' ', 'minutes')[:16]
+
+
+def fecha_hora_dmy(momento):
+    """'%d/%m/%Y %H:%M'"""
+    return f'{momento.day:02d}/{momento.month:02d}/{momento.year} {momento.hour:02d}:{momento.minute:02d}'
+
+
+def telefono_o_na(telefono):
+    return telefono or 'N/A'
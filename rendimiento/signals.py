@@ -0,0 +1,64 @@
+from django.apps import apps
+from django.db.models.signals import post_delete, post_save
+
+from .cache_catalogo import GRUPOS_POR_MODELO, invalidar_por_modelo
+from .eventos import fecha_local, publicar_al_confirmar
+
+
+def invalidar_catalogo(sender, update_fields=None, **kwargs):
+    # El login solo actualiza last_login: no cambia ningún catálogo
+    if update_fields is not None and set(update_fields) == {'last_login'}:
+        return
+    invalidar_por_modelo(sender._meta.label_lower)
+
+
+for modelo in GRUPOS_POR_MODELO:
+    post_save.connect(invalidar_catalogo, sender=modelo, dispatch_uid=f'catalogo_guardado_{modelo}')
+    post_delete.connect(invalidar_catalogo, sender=modelo, dispatch_uid=f'catalogo_borrado_{modelo}')
+
+
+def _fecha_salida(instance):
+    """Fecha local de la salida del pasaje o encomienda (sin consulta si ya está cargada)"""
+    if 'salida' in instance._state.fields_cache:
+        return fecha_local(instance.salida.fecha_hora)
+    Salida = apps.get_model('rutas', 'Salida')
+    fecha_hora = Salida.objects.filter(pk=instance.salida_id).values_list('fecha_hora', flat=True).first()
+    return fecha_hora and fecha_local(fecha_hora)
+
+
+def publicar_pasaje(sender, instance, created, **kwargs):
+    if created:
+        publicar_al_confirmar(
+            'asiento_vendido', instance.salida_id, _fecha_salida(instance),
+            asientos=[instance.asiento], tipo_pasaje=instance.tipo_pasaje
+        )
+    elif instance.estado == 'abordado':
+        publicar_al_confirmar(
+            'check_in', instance.salida_id, _fecha_salida(instance),
+            pasaje_id=instance.id, asiento=instance.asiento
+        )
+
+
+def publicar_pasaje_eliminado(sender, instance, **kwargs):
+    fecha = _fecha_salida(instance)
+    # Sin fecha la salida se eliminó con sus pasajes: no queda mapa que actualizar
+    if fecha:
+        publicar_al_confirmar('asiento_liberado', instance.salida_id, fecha, asientos=[instance.asiento])
+
+
+def publicar_encomienda(sender, instance, created, **kwargs):
+    if not created and instance.estado == 'entregada':
+        publicar_al_confirmar(
+            'encomienda_entregada', instance.salida_id, _fecha_salida(instance), encomienda_id=instance.id
+        )
+
+
+def publicar_salida(sender, instance, **kwargs):
+    publicar_al_confirmar('salida_estado', instance.id, fecha_local(instance.fecha_hora), estado=instance.estado)
+
+
+# Eventos en vivo (rendimiento.eventos); bulk_create y las retenciones publican por su cuenta
+post_save.connect(publicar_pasaje, sender='pasajes.pasaje', dispatch_uid='eventos_pasaje')
+post_delete.connect(publicar_pasaje_eliminado, sender='pasajes.pasaje', dispatch_uid='eventos_pasaje_eliminado')
+post_save.connect(publicar_encomienda, sender='encomiendas.encomienda', dispatch_uid='eventos_encomienda')
+post_save.connect(publicar_salida, sender='rutas.salida', dispatch_uid='eventos_salida')
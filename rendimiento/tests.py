@@ -0,0 +1,968 @@
+import asyncio
+import gzip
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+import uuid
+from datetime import date, datetime, timedelta, timezone as dt_timezone
+from decimal import Decimal
+from io import StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.locmem import LocMemCache
+from django.core.management import CommandError, call_command
+from django.db import OperationalError, connection
+from django.db.models import Count, Q
+from asgiref.sync import iscoroutinefunction
+from django.http import HttpResponse, StreamingHttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings, tag
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from prometheus_client import REGISTRY
+
+from encomiendas.models import Encomienda
+from pasajes.asientos import asignar_asiento
+from pasajes.errores import AsientoOcupado
+from pasajes.models import Pasaje
+from pasajes.proyecciones import PASAJEROS_MANIFIESTO, PASAJES_SALIDA
+from rutas.models import Salida
+from rutas.tests import crear_salida
+from tareas.models import Tarea
+from transporte.asgi import application
+from transporte.sqlite import configuracion_sqlite
+from . import benchmarks, compresion, contencion, json_rapido
+from .escritor import EscrituraDemorada, Escritura, escribir, escritor, respuesta_demorada
+from .eventos import Difusor, difusor
+from .metricas import RegistroMetricas, registro
+from .prometheus import registro_scrape
+
+
+class InstrumentacionMiddlewareTests(TestCase):
+
+    def setUp(self):
+        registro.limpiar()
+        self.addCleanup(registro.limpiar)
+        crear_salida(1, pasajeros=2)
+
+    def test_cabeceras_de_consultas_y_tiempos(self):
+        response = self.client.get('/api/salidas-hoy/')
+
+        self.assertEqual(response['X-Query-Count'], '1')
+        self.assertRegex(response['Server-Timing'], r'^db;dur=[\d.]+;desc="1 consultas", total;dur=[\d.]+$')
+
+    def test_histograma_por_patron_de_url(self):
+        for _ in range(3):
+            self.client.get('/api/salidas-hoy/')
+        self.client.get('/api/salida/1/asientos-conductor/')
+        self.client.get('/api/salida/2/asientos-conductor/')
+
+        endpoints = registro.instantanea()
+
+        hoy = endpoints['GET api/salidas-hoy/']
+        self.assertEqual(hoy['peticiones'], 3)
+        self.assertEqual(hoy['consultas_max'], 1)
+        self.assertGreater(hoy['bytes_medio'], 0)
+        self.assertEqual(sum(hoy['buckets_ms'].values()), 3)
+        self.assertEqual(endpoints['GET api/salida/<int:salida_id>/asientos-conductor/']['peticiones'], 2)
+
+    @override_settings(RENDIMIENTO_PRESUPUESTO_CONSULTAS=0)
+    def test_registra_peticiones_sobre_presupuesto(self):
+        with self.assertLogs('rendimiento', level='WARNING') as logs:
+            self.client.get('/api/salidas-hoy/')
+        self.assertIn('api/salidas-hoy/', logs.output[0])
+        self.assertIn('1 consultas', logs.output[0])
+
+    @override_settings(RENDIMIENTO_PRESUPUESTO_MS=0, RENDIMIENTO_PRESUPUESTO_CONSULTAS=-1)
+    def test_streaming_fuera_del_presupuesto(self):
+        from .middleware import InstrumentacionMiddleware
+
+        middleware = InstrumentacionMiddleware(lambda request: StreamingHttpResponse(
+            iter([b'data: 1\n\n']), content_type='text/event-stream'
+        ))
+        with self.assertNoLogs('rendimiento', level='WARNING'):
+            response = middleware(RequestFactory().get('/api/eventos/'))
+        self.assertEqual(response['X-Query-Count'], '0')
+
+    async def test_modo_asincrono_bajo_asgi(self):
+        from .middleware import InstrumentacionMiddleware
+
+        async def vista(request):
+            return HttpResponse('ok')
+
+        self.assertTrue(iscoroutinefunction(InstrumentacionMiddleware(vista)))
+        response = await self.async_client.get('/api/salidas-hoy/')
+
+        self.assertEqual(response['X-Query-Count'], '1')
+        self.assertIn('GET api/salidas-hoy/', registro.instantanea())
+
+    def test_endpoint_de_estadisticas(self):
+        self.assertEqual(self.client.get('/api/rendimiento/').status_code, 404)
+        self.client.get('/api/salidas-hoy/')
+        with self.settings(DEBUG=True):
+            data = self.client.get('/api/rendimiento/').json()
+        self.assertIn('GET api/salidas-hoy/', data['endpoints'])
+
+
+class RegistroMetricasTests(TestCase):
+
+    def test_percentiles_y_ventana(self):
+        metricas = RegistroMetricas(ventana_minutos=5)
+        for duracion in [3] * 90 + [300] * 9 + [20000]:
+            metricas.observar('GET', 'api/x/', 200, duracion, 1, 2, 100)
+
+        datos = metricas.instantanea()['GET api/x/']
+
+        self.assertEqual(datos['p50_ms'], 5)
+        self.assertEqual(datos['p95_ms'], 500)
+        self.assertEqual(datos['p99_ms'], 500)
+        self.assertEqual(datos['buckets_ms']['+Inf'], 1)
+        self.assertEqual(datos['consultas_media'], 2)
+
+
+class MetricasPrometheusTests(TestCase):
+
+    def test_peticiones_consultas_y_cola(self):
+        etiquetas = {'metodo': 'GET', 'vista': 'salidas_hoy', 'status': '200'}
+        antes = REGISTRY.get_sample_value('transporte_http_peticiones_total', etiquetas) or 0
+        Tarea.objects.create(tipo='manifiesto_pdf')
+        Tarea.objects.create(tipo='manifiesto_pdf')
+
+        self.client.get('/api/salidas-hoy/')
+        response = self.client.get('/metrics')
+
+        self.assertTrue(response['Content-Type'].startswith('text/plain'))
+        texto = response.content.decode()
+        self.assertEqual(REGISTRY.get_sample_value('transporte_http_peticiones_total', etiquetas), antes + 1)
+        self.assertIn('transporte_http_duracion_segundos_bucket{le="0.005",metodo="GET",vista="salidas_hoy"}',
+                      texto)
+        self.assertIn('transporte_db_consultas_total{vista="salidas_hoy"}', texto)
+        self.assertIn('transporte_tareas_en_cola{estado="pendiente"} 2.0', texto)
+
+    def test_aciertos_y_fallos_de_cache(self):
+        from pasajes.manifiesto import obtener_manifiesto_pdf
+
+        caches['compartida'].clear()
+        salida = crear_salida(1, pasajeros=1)
+
+        def valor(resultado):
+            return REGISTRY.get_sample_value(
+                'transporte_cache_operaciones_total', {'cache': 'manifiesto_pdf', 'resultado': resultado}
+            ) or 0
+
+        aciertos, fallos = valor('acierto'), valor('fallo')
+        obtener_manifiesto_pdf(salida)
+        obtener_manifiesto_pdf(salida)
+        self.assertEqual((valor('acierto') - aciertos, valor('fallo') - fallos), (1, 1))
+
+    def test_modo_multiproceso_suma_todos_los_procesos(self):
+        with tempfile.TemporaryDirectory() as directorio:
+            entorno = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': directorio,
+                       'DJANGO_SETTINGS_MODULE': 'transporte.settings'}
+            codigo = (
+                'import django; django.setup()\n'
+                'from rendimiento import prometheus\n'
+                'prometheus.observar_peticion("GET", "salidas_hoy", 200, 12, 3, 1)\n'
+            )
+            for _ in range(2):
+                subprocess.run([sys.executable, '-c', codigo], env=entorno, check=True, cwd=settings.BASE_DIR)
+
+            with mock.patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': directorio}):
+                registro_multiproceso = registro_scrape()
+                total = registro_multiproceso.get_sample_value(
+                    'transporte_http_peticiones_total', {'metodo': 'GET', 'vista': 'salidas_hoy', 'status': '200'}
+                )
+        self.assertEqual(total, 2)
+
+
+class GenerarDatosTests(TestCase):
+
+    def generar(self, **opciones):
+        opciones = {'conductores': 3, 'rutas': 2, 'salidas': 60, 'meses': 1, 'hasta': date(2025, 6, 1), **opciones}
+        call_command('generar_datos', stdout=StringIO(), **opciones)
+
+    def test_contadores_coinciden_con_las_tablas(self):
+        self.generar()
+
+        self.assertEqual(Salida.objects.count(), 60)
+        salidas = Salida.objects.annotate(
+            reales=Count('pasajes', distinct=True), encomiendas_reales=Count('encomiendas', distinct=True)
+        )
+        for salida in salidas:
+            self.assertEqual(salida.pasajeros_count, salida.reales)
+            self.assertEqual(salida.encomiendas_count, salida.encomiendas_reales)
+        tipos = set(Pasaje.objects.values_list('tipo_pasaje', flat=True))
+        self.assertEqual(tipos, {'vendido', 'reserva_conductor'})
+
+    def test_madrugada_mas_llena_que_la_tarde(self):
+        self.generar(salidas=300, conductores=5)
+
+        def ocupacion(filtro):
+            salidas = Salida.objects.filter(filtro).exclude(estado='cancelada').select_related('vehiculo')
+            return sum(s.pasajeros_count / s.vehiculo.capacidad for s in salidas) / len(salidas)
+
+        self.assertGreater(ocupacion(Q(fecha_hora__hour__lt=7)), ocupacion(Q(fecha_hora__hour__gte=11)))
+
+    def test_misma_semilla_mismos_datos(self):
+        self.generar(prefijo='a')
+        primeros = list(Pasaje.objects.order_by('id').values_list('asiento', 'dni', 'tipo_pasaje'))
+        self.generar(prefijo='b')
+        segundos = list(Pasaje.objects.order_by('id').values_list('asiento', 'dni', 'tipo_pasaje'))
+
+        self.assertEqual(primeros, segundos[len(primeros):])
+
+    def test_prefijo_repetido(self):
+        self.generar()
+        with self.assertRaises(CommandError):
+            self.generar()
+
+
+# El PDF se genera en la primera petición (sin worker): se mide la descarga desde caché
+@tag('benchmark')
+@override_settings(MANIFIESTO_PDF_SINCRONO=True)
+class EndpointsBenchmarkTests(TestCase):
+    """Latencia y consultas de los endpoints de lectura a varias escalas de datos"""
+
+    def test_benchmark_endpoints(self):
+        resultados = {}
+        generadas = 0
+        for indice, escala in enumerate(benchmarks.escalas()):
+            # Las escalas son acumulativas: se agregan las salidas que faltan
+            call_command('generar_datos', salidas=escala - generadas, conductores=max(5, escala // 100),
+                         rutas=10, meses=3, prefijo=f'b{indice}', stdout=StringIO())
+            generadas = escala
+            salida = Salida.objects.filter(
+                fecha_hora__date=timezone.localdate(), pasajes__tipo_pasaje='reserva_conductor'
+            ).order_by('-pasajeros_count').first() or Salida.objects.order_by('-pasajeros_count').first()
+            resultados[str(escala)] = benchmarks.medir_endpoints(self.client, salida.id, salida.conductor_id)
+
+        benchmarks.logger.info(f'[benchmark] endpoints\n{benchmarks.formatear(resultados)}')
+        for mediciones in resultados.values():
+            for nombre, medicion in mediciones.items():
+                self.assertEqual(medicion['estado'], 200, nombre)
+        if os.environ.get('BENCHMARK_ACTUALIZAR') == '1':
+            benchmarks.guardar_linea_base(resultados)
+            return
+        linea_base = benchmarks.cargar_linea_base()
+        # Las consultas no dependen de la máquina: siempre se exigen
+        regresiones = benchmarks.regresiones(resultados, linea_base, latencia=benchmarks.comparar_latencia())
+        self.assertEqual(regresiones, [], '\n'.join(regresiones))
+        if not benchmarks.comparar_latencia():
+            for aviso in benchmarks.regresiones(resultados, linea_base):
+                benchmarks.logger.warning(f'[benchmark] aviso (BENCHMARK_LATENCIA=1 para exigirlo): {aviso}')
+
+
+class RegresionesBenchmarkTests(TestCase):
+
+    def test_detecta_consultas_y_latencia(self):
+        medicion = {'estado': 200, 'consultas': 1, 'p50_ms': 2.0, 'p95_ms': 3.0}
+        base = {'200': {'vehiculos': medicion, 'salidas': medicion}}
+        resultados = {'200': {
+            'vehiculos': {**medicion, 'consultas': 41},
+            'salidas': {**medicion, 'p95_ms': 20.0},
+        }}
+
+        mensajes = benchmarks.regresiones(resultados, base, factor=2)
+
+        self.assertEqual(len(mensajes), 3)
+        self.assertEqual(len(benchmarks.regresiones(resultados, base, factor=2, latencia=False)), 2)
+        self.assertIn('vehiculos @ 200: 41 consultas (techo 1)', mensajes)
+        self.assertTrue(any(m.startswith('salidas @ 200: p95 20.0 ms') for m in mensajes))
+        self.assertEqual(benchmarks.regresiones(base, base, factor=2), [])
+
+    def test_percentil(self):
+        self.assertEqual(benchmarks.percentil(list(range(1, 101)), 50), 50)
+        self.assertEqual(benchmarks.percentil(list(range(1, 101)), 95), 95)
+        self.assertEqual(benchmarks.percentil([7], 95), 7)
+
+
+class SqliteAfinadoTests(TestCase):
+
+    def test_configuracion(self):
+        config = configuracion_sqlite('db.sqlite3', pragmas={'mmap_size': None, 'cache_size': -4000})
+
+        self.assertEqual(config['OPTIONS']['transaction_mode'], 'IMMEDIATE')
+        self.assertEqual(config['OPTIONS']['timeout'], 5)
+        self.assertIn('PRAGMA journal_mode=WAL', config['OPTIONS']['init_command'])
+        self.assertIn('PRAGMA cache_size=-4000', config['OPTIONS']['init_command'])
+        self.assertNotIn('mmap_size', config['OPTIONS']['init_command'])
+        self.assertTrue(config['CONN_HEALTH_CHECKS'])
+
+    def test_salud_reporta_pragmas_de_la_conexion(self):
+        data = self.client.get('/api/salud/').json()
+
+        self.assertTrue(data['success'])
+        self.assertEqual(data['base_datos']['busy_timeout'], 5000)
+        self.assertEqual(data['base_datos']['synchronous'], 1)  # NORMAL
+
+    def test_salud_sin_base_de_datos(self):
+        with mock.patch('rendimiento.views.verificar_conexion', side_effect=OperationalError('disk I/O error')):
+            response = self.client.get('/api/salud/')
+
+        self.assertEqual(response.status_code, 503)
+        self.assertFalse(response.json()['success'])
+
+    @tag('stress')
+    def test_contencion_de_escrituras(self):
+        por_defecto = contencion.medir('por_defecto', procesos=4, ventas_por_proceso=100)
+        afinada = contencion.medir('afinada', procesos=4, ventas_por_proceso=100)
+
+        self.assertEqual(afinada['bloqueos'], 0)
+        self.assertEqual(afinada['confirmadas'], 400)
+        self.assertGreaterEqual(afinada['confirmadas'], por_defecto['confirmadas'])
+        benchmarks.logger.info(
+            f'[benchmark] contención SQLite, 4 procesos: por defecto {por_defecto["ventas_por_segundo"]} '
+            f'ventas/s con {por_defecto["bloqueos"]} bloqueos / afinada {afinada["ventas_por_segundo"]} '
+            f'ventas/s con {afinada["bloqueos"]} bloqueos'
+        )
+
+
+@override_settings(ESCRITOR_UNICO=True)
+class EscritorUnicoTests(TransactionTestCase):
+
+    def setUp(self):
+        self.salida = crear_salida(1, capacidad=40)
+
+    def vender(self, asiento):
+        return escribir(asignar_asiento, self.salida.id, asiento, nombre=f'P{asiento}', dni='12345678')
+
+    def test_cada_escritura_del_lote_recibe_su_resultado(self):
+        Pasaje.objects.create(salida=self.salida, nombre='X', dni='1', asiento=2, precio=Decimal('25'))
+        lote = [
+            Escritura(asignar_asiento, (self.salida.id, asiento), {'nombre': 'Ana', 'dni': '12345678'})
+            for asiento in (1, 2, 3)
+        ]
+
+        escritor._aplicar(lote)
+
+        self.assertEqual(lote[0].futuro.result()[0].asiento, 1)
+        self.assertIsInstance(lote[1].futuro.exception(), AsientoOcupado)
+        self.assertEqual(lote[2].futuro.result()[0].asiento, 3)
+        self.assertEqual(Salida.objects.get(pk=self.salida.pk).pasajeros_count, 3)
+
+    def test_vistas_escriben_a_traves_del_escritor(self):
+        lotes = escritor.lotes
+        response = self.client.post(f'/api/salida/{self.salida.id}/vender/',
+                                    {'nombre': 'ana', 'dni': '12345678', 'asiento': 4},
+                                    content_type='application/json')
+
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(escritor.lotes, lotes + 1)
+        self.assertTrue(Pasaje.objects.filter(salida=self.salida, asiento=4).exists())
+
+    @override_settings(ESCRITOR_TIMEOUT_SEGUNDOS=0.05)
+    def test_escritura_demorada_sigue_en_cola(self):
+        with self.assertRaises(EscrituraDemorada) as demora:
+            escribir(time.sleep, 0.3)
+
+        # No falló: termina después y el futuro lo informa
+        self.assertIsNone(demora.exception.futuro.result(timeout=5))
+        response = respuesta_demorada(demora.exception)
+        self.assertEqual(response.status_code, 503)
+        self.assertEqual(response['Retry-After'], '5')
+
+    @tag('stress')
+    def test_rendimiento_frente_a_escritura_directa(self):
+        """
+        Solo mide, no compara: la base de las pruebas está en memoria, sin disco
+        que esperar, y ahí el escritor único es más lento que la escritura
+        directa (unas 175 contra 180-240 ventas/s). La comparación que importa
+        es la de benchmark_escritor sobre la base en archivo.
+        """
+        def medir(hilos, ventas, primer_asiento):
+            inicio = threading.Barrier(hilos)
+            errores = []
+
+            def ventanilla(numero):
+                inicio.wait()
+                try:
+                    for i in range(ventas):
+                        self.vender(primer_asiento + numero * ventas + i)
+                except Exception as e:
+                    errores.append(repr(e))
+                finally:
+                    connection.close()
+
+            t0 = time.perf_counter()
+            lanzados = [threading.Thread(target=ventanilla, args=(n,)) for n in range(hilos)]
+            for hilo in lanzados:
+                hilo.start()
+            for hilo in lanzados:
+                hilo.join()
+            self.assertEqual(errores, [])
+            return hilos * ventas / (time.perf_counter() - t0)
+
+        with override_settings(ESCRITOR_UNICO=False):
+            directa = medir(4, 5, 1)
+        peticiones, lotes = escritor.peticiones, escritor.lotes
+        serializada = medir(4, 5, 21)
+
+        self.assertEqual(Salida.objects.get(pk=self.salida.pk).pasajeros_count, 40)
+        por_lote = (escritor.peticiones - peticiones) / (escritor.lotes - lotes)
+        benchmarks.logger.info(
+            f'[stress] 4 ventanillas: escritura directa {directa:.0f} ventas/s / '
+            f'escritor único {serializada:.0f} ventas/s ({por_lote:.1f} ventas por COMMIT)'
+        )
+
+
+class PlanesDeConsultaTests(TestCase):
+    """EXPLAIN QUERY PLAN de las consultas que hacen las vistas con filtros frecuentes"""
+
+    TABLAS = ('salidas', 'pasajes', 'encomiendas', 'usuarios')
+
+    def setUp(self):
+        self.salida = crear_salida(1, pasajeros=2, encomiendas=2)
+
+    def planes(self, url):
+        planes = benchmarks.planes_de_consultas(self.client, url)
+        for sql, plan in planes:
+            for tabla in self.TABLAS:
+                self.assertNotRegex(plan, rf'\bSCAN {tabla}\b', f'Recorrido completo de {tabla}:\n{sql}')
+        return '\n'.join(plan for _, plan in planes)
+
+    def test_salidas_del_dia_por_rango_de_fecha_hora(self):
+        self.assertIn('USING INDEX salidas_fecha_id_idx (fecha_hora>? AND fecha_hora<?)',
+                      self.planes('/api/salidas-hoy/'))
+        self.assertIn('USING INDEX salidas_conductor_fecha_idx (conductor_id=? AND fecha_hora>? AND fecha_hora<?)',
+                      self.planes(f'/api/salidas-hoy/?conductor_id={self.salida.conductor_id}'))
+        self.assertIn('USING INDEX salidas_estado_fecha_idx (estado=? AND fecha_hora>? AND fecha_hora<?)',
+                      self.planes('/api/salidas-disponibles/'))
+
+    def test_conflicto_de_vehiculo_por_rango(self):
+        with CaptureQueriesContext(connection) as consultas:
+            self.client.post('/api/salidas/crear/', {
+                'ruta_id': self.salida.ruta_id, 'vehiculo_id': self.salida.vehiculo_id,
+                'conductor_id': self.salida.conductor_id,
+                'fecha_hora': (self.salida.fecha_hora + timedelta(hours=2)).strftime('%Y-%m-%dT%H:%M'),
+            }, content_type='application/json')
+
+        conflicto = next(c['sql'] for c in consultas.captured_queries if 'vehiculo_id' in c['sql']
+                         and c['sql'].startswith('SELECT 1'))
+        self.assertNotIn('django_datetime_cast_date', conflicto)
+        self.assertIn('"fecha_hora" >=', conflicto)
+
+    def test_pasajes_y_encomiendas_por_salida(self):
+        self.assertIn('pasajes_salida_id_asiento', self.planes(f'/api/salida/{self.salida.id}/manifiesto/'))
+        self.assertIn('USING INDEX encomiendas_salida_fecha_idx (salida_id=?)',
+                      self.planes(f'/api/salida/{self.salida.id}/encomiendas/'))
+
+    def test_conductores_por_tipo(self):
+        self.assertIn('USING INDEX usuarios_tipo_activo_idx (tipo=?)',
+                      self.planes('/api/conductores/'))
+        self.assertIn('usuarios_tipo_activo_idx', self.planes('/api/conductores/lista/'))
+
+
+class CacheCatalogoTests(TestCase):
+
+    def setUp(self):
+        caches['catalogo'].clear()
+        self.salida = crear_salida(1)
+
+    def test_pruebas_sin_cache_en_archivo(self):
+        for alias in ('catalogo', 'compartida'):
+            self.assertIsInstance(caches[alias], LocMemCache)
+
+    def test_segunda_lectura_sin_consultas(self):
+        primera = self.client.get('/api/vehiculos/')
+        with self.assertNumQueries(0):
+            segunda = self.client.get('/api/vehiculos/')
+
+        self.assertEqual(primera['X-Cache'], 'MISS')
+        self.assertEqual(segunda['X-Cache'], 'HIT')
+        self.assertEqual(primera.json(), segunda.json())
+        self.assertEqual(self.client.get('/api/vehiculos/?v=2')['X-Cache'], 'MISS')
+
+    def test_senales_invalidan_los_grupos_afectados(self):
+        for url in ('/api/rutas/', '/api/vehiculos/', '/api/conductores/lista/'):
+            self.client.get(url)
+
+        conductor = self.salida.conductor
+        conductor.first_name = 'Rosa'
+        conductor.save()
+
+        self.assertEqual(self.client.get('/api/rutas/')['X-Cache'], 'HIT')
+        vehiculos = self.client.get('/api/vehiculos/')
+        self.assertEqual(vehiculos['X-Cache'], 'MISS')
+        self.assertTrue(vehiculos.json()[0]['conductor'].startswith('Rosa'))
+        self.assertEqual(self.client.get('/api/conductores/lista/')['X-Cache'], 'MISS')
+
+        crear_salida(2)
+        self.assertEqual(len(self.client.get('/api/rutas/').json()), 2)
+
+    def test_login_no_invalida(self):
+        self.salida.conductor.set_password('clave12345')
+        self.salida.conductor.save()
+        self.client.get('/api/conductores/')
+
+        self.client.post('/api/login/', {'username': 'conductor1', 'password': 'clave12345'},
+                         content_type='application/json')
+
+        self.assertEqual(self.client.get('/api/conductores/')['X-Cache'], 'HIT')
+
+    @override_settings(DEBUG=True)
+    def test_tasa_de_aciertos_expuesta(self):
+        self.client.get('/api/vehiculos/')
+        self.client.get('/api/vehiculos/')
+
+        caches_data = self.client.get('/api/rendimiento/').json()['caches']
+
+        self.assertGreaterEqual(caches_data['catalogo_vehiculos']['aciertos'], 1)
+        self.assertIsNotNone(caches_data['catalogo_vehiculos']['tasa_aciertos'])
+
+
+class GetCondicionalTests(TestCase):
+
+    def setUp(self):
+        caches['compartida'].clear()
+        caches['catalogo'].clear()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.salida = crear_salida(1, pasajeros=2)
+
+    def test_detalle_de_salida_304_sin_armar_el_json(self):
+        url = f'/api/salida/{self.salida.id}/pasajes/'
+        primera = self.client.get(url)
+        etag = primera['ETag']
+
+        with self.assertNumQueries(1):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response.content, b'')
+        modificada = self.client.get(url, HTTP_IF_MODIFIED_SINCE=primera['Last-Modified'])
+        self.assertEqual(modificada.status_code, 304)
+
+        asignar_asiento(self.salida.id, 4, nombre='Ana', dni='12345678')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.json()['estadisticas']['total_pasajes'], 3)
+
+    def test_encomiendas_cambian_el_etag_de_la_salida(self):
+        url = f'/api/salida/{self.salida.id}/encomiendas/'
+        etag = self.client.get(url)['ETag']
+
+        Encomienda.objects.create(
+            salida=self.salida, remitente_nombre='A', remitente_telefono='1', destinatario_nombre='B',
+            destinatario_telefono='2', descripcion='Caja', peso_kg=Decimal('2'), precio=Decimal('5')
+        )
+
+        self.assertEqual(self.client.get(url, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_listas_con_sello_por_tabla(self):
+        etag = self.client.get('/api/vehiculos/')['ETag']
+        with self.assertNumQueries(0):
+            self.assertEqual(self.client.get('/api/vehiculos/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+
+        vehiculo = self.salida.vehiculo
+        vehiculo.capacidad = 12
+        vehiculo.save()
+
+        response = self.client.get('/api/vehiculos/', HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()[0]['capacidad'], 12)
+
+    def test_ventas_cambian_el_etag_de_las_listas_de_salidas(self):
+        etag = self.client.get('/api/salidas/')['ETag']
+        self.assertEqual(self.client.get('/api/salidas/', HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertNotEqual(self.client.get('/api/salidas/?estado=programada')['ETag'], etag)
+
+        # El sello de la tabla cambia al confirmar, una sola vez por transacción
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            asignar_asiento(self.salida.id, 3, nombre='Ana', dni='12345678')
+            asignar_asiento(self.salida.id, 4, nombre='Luis', dni='87654321')
+        self.assertEqual(sum(hasattr(c, 'grupos_catalogo') for c in callbacks), 1)
+
+        self.assertEqual(self.client.get('/api/salidas/', HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+    def test_salida_inexistente(self):
+        self.assertFalse(self.client.get('/api/salida/999/pasajes/').json()['success'])
+
+
+class DifusorEventosTests(SimpleTestCase):
+
+    async def test_entrega_por_salida_y_por_dia(self):
+        difusor = Difusor()
+        por_salida, _ = difusor.suscribir(salida_id=1)
+        por_dia, _ = difusor.suscribir(fecha=date(2025, 6, 2))
+        otra, _ = difusor.suscribir(salida_id=2)
+
+        await asyncio.to_thread(difusor.publicar, 'asiento_vendido', 1, date(2025, 6, 2), asientos=[4])
+
+        for suscripcion in (por_salida, por_dia):
+            evento = await suscripcion.siguiente(1)
+            self.assertEqual((evento.tipo, evento.datos), ('asiento_vendido', {'asientos': [4]}))
+        with self.assertRaises(asyncio.TimeoutError):
+            await otra.siguiente(0.05)
+        self.assertIn('"salida_id":1,"fecha":"2025-06-02","asientos":[4]', evento.como_sse())
+
+    async def test_reenvio_desde_last_event_id(self):
+        difusor = Difusor(historial=2)
+        eventos = [difusor.publicar('check_in', 1, '2025-06-02', asiento=a) for a in range(1, 5)]
+
+        _, pendientes = difusor.suscribir(salida_id=1, desde=eventos[1].id)
+        self.assertEqual([e.datos['asiento'] for e in pendientes], [3, 4])
+
+        # Fuera del historial o de otro proceso: el cliente debe recargar el estado
+        for desde in (eventos[0].id, 'otro-3', 'basura'):
+            _, pendientes = difusor.suscribir(salida_id=1, desde=desde)
+            self.assertEqual([e.tipo for e in pendientes], ['reinicio'])
+
+    async def test_cliente_lento_recibe_reinicio(self):
+        difusor = Difusor(cola_maxima=2)
+        suscripcion, _ = difusor.suscribir(salida_id=1)
+        for asiento in range(5):
+            difusor.publicar('asiento_retenido', 1, '2025-06-02', asientos=[asiento])
+        await asyncio.sleep(0)
+
+        # Se descarta el más antiguo para dejar la marca de desborde al final
+        self.assertEqual((await suscripcion.siguiente(1)).datos['asientos'], [1])
+        self.assertIsNone(await suscripcion.siguiente(1))
+        self.assertTrue(suscripcion.desbordada)
+
+
+class EventosEscriturasTests(TestCase):
+
+    def setUp(self):
+        caches['compartida'].clear()
+        difusor.limpiar()
+        self.salida = crear_salida(1, pasajeros=0)
+
+    def publicados(self):
+        return [(e.tipo, e.salida_id, e.datos) for e in difusor._historial]
+
+    def test_venta_check_in_y_estado_se_publican_al_confirmar(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            pasaje, _ = asignar_asiento(self.salida.id, 3, nombre='Ana', dni='12345678')
+            self.assertEqual(self.publicados(), [])
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.put(f'/api/pasaje/{pasaje.id}/check-in/')
+            self.client.put(f'/api/salidas/{self.salida.id}/marcar-salida/')
+
+        self.assertEqual(self.publicados(), [
+            ('asiento_vendido', self.salida.id, {'asientos': [3], 'tipo_pasaje': 'vendido'}),
+            ('check_in', self.salida.id, {'pasaje_id': pasaje.id, 'asiento': 3}),
+            ('salida_estado', self.salida.id, {'estado': 'en_curso'}),
+        ])
+        self.assertEqual(difusor._historial[0].fecha, timezone.localdate(self.salida.fecha_hora).isoformat())
+
+    def test_retencion_y_venta_en_grupo(self):
+        url = f'/api/salida/{self.salida.id}/'
+        token = self.client.post(url + 'retener/', {'asiento': 2}, content_type='application/json').json()
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post(url + 'vender-grupo/', {'pasajeros': [
+                {'nombre': 'Ana', 'dni': '1', 'asiento': 2, 'token_retencion': token['retencion']['token']},
+                {'nombre': 'Luis', 'dni': '2', 'asiento': 'auto'},
+            ]}, content_type='application/json')
+
+        # Dentro de la transacción de la prueba la venta se publica al final
+        self.assertCountEqual([tipo for tipo, _, _ in self.publicados()], [
+            'asiento_retenido', 'asiento_vendido', 'retencion_liberada'
+        ])
+        self.assertIn(('asiento_vendido', self.salida.id, {'asientos': [2, 1], 'tipo_pasaje': 'vendido'}),
+                      self.publicados())
+
+    def test_parametros_invalidos(self):
+        response = self.client.get('/api/eventos/?fecha=ayer')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(response.json()['success'])
+
+
+class FlujoEventosAsgiTests(SimpleTestCase):
+    """Cientos de clientes SSE conectados a la vez a transporte.asgi.application"""
+
+    CLIENTES = 300
+
+    def setUp(self):
+        difusor.limpiar()
+        self.addCleanup(difusor.limpiar)
+
+    async def conectar(self, consulta, desconectar):
+        recibido = []
+        peticion_enviada = False
+
+        async def receive():
+            nonlocal peticion_enviada
+            if not peticion_enviada:
+                peticion_enviada = True
+                return {'type': 'http.request', 'body': b'', 'more_body': False}
+            await desconectar.wait()
+            return {'type': 'http.disconnect'}
+
+        async def send(mensaje):
+            recibido.append(mensaje)
+
+        scope = {
+            'type': 'http', 'asgi': {'version': '3.0'}, 'http_version': '1.1', 'method': 'GET',
+            'scheme': 'http', 'path': '/api/eventos/', 'raw_path': b'/api/eventos/',
+            'query_string': consulta.encode(), 'headers': [(b'host', b'testserver')],
+            'client': ('127.0.0.1', 50000), 'server': ('testserver', 80),
+        }
+        tarea = asyncio.create_task(application(scope, receive, send))
+        return tarea, recibido
+
+    @staticmethod
+    def cuerpo(mensajes):
+        return b''.join(m.get('body', b'') for m in mensajes if m['type'] == 'http.response.body').decode()
+
+    async def test_cientos_de_suscriptores_concurrentes(self):
+        desconectar = asyncio.Event()
+        consultas = ['salida=7' if i % 2 else 'fecha=2025-06-02' for i in range(self.CLIENTES)]
+        clientes = [await self.conectar(c, desconectar) for c in consultas]
+        ajeno = await self.conectar('salida=8', desconectar)
+
+        inicio = time.perf_counter()
+        while difusor.suscriptores() < self.CLIENTES + 1:
+            self.assertLess(time.perf_counter() - inicio, 30, 'los clientes no se suscribieron')
+            await asyncio.sleep(0.01)
+
+        inicio = time.perf_counter()
+        await asyncio.to_thread(difusor.publicar, 'asiento_vendido', 7, '2025-06-02', asientos=[5])
+        while not all('event: asiento_vendido' in self.cuerpo(recibido) for _, recibido in clientes):
+            self.assertLess(time.perf_counter() - inicio, 10, 'eventos sin entregar')
+            await asyncio.sleep(0.01)
+        entrega_ms = (time.perf_counter() - inicio) * 1000
+
+        desconectar.set()
+        await asyncio.wait_for(asyncio.gather(*(t for t, _ in clientes), ajeno[0]), 30)
+
+        inicio_respuesta = clientes[0][1][0]
+        self.assertEqual(inicio_respuesta['status'], 200)
+        self.assertIn((b'Content-Type', b'text/event-stream'), inicio_respuesta['headers'])
+        self.assertNotIn('asiento_vendido', self.cuerpo(ajeno[1]))
+        self.assertEqual(difusor.suscriptores(), 0)
+        benchmarks.logger.info(f'[sse] {self.CLIENTES} clientes: evento entregado a todos en {entrega_ms:.0f} ms')
+
+    async def test_reconexion_con_last_event_id(self):
+        perdido = difusor.publicar('salida_estado', 7, '2025-06-02', estado='programada')
+        difusor.publicar('salida_estado', 7, '2025-06-02', estado='en_curso')
+
+        desconectar = asyncio.Event()
+        tarea, recibido = await self.conectar(f'salida=7&desde={perdido.id}', desconectar)
+        while 'en_curso' not in self.cuerpo(recibido):
+            await asyncio.sleep(0.01)
+        desconectar.set()
+        await asyncio.wait_for(tarea, 10)
+
+        self.assertNotIn('"estado":"programada"', self.cuerpo(recibido))
+
+
+def pasajes_con_instancias(salida):
+    """Serialización anterior de get_pasajes_salida (instancias completas), referencia de las pruebas"""
+    data = []
+    for pasaje in Pasaje.objects.filter(salida=salida).select_related('reservado_por').order_by('asiento'):
+        info = {
+            'id': pasaje.id,
+            'nombre': pasaje.nombre,
+            'dni': pasaje.dni,
+            'telefono': pasaje.telefono,
+            'asiento': pasaje.asiento,
+            'precio': float(pasaje.precio),
+            'estado': pasaje.estado,
+            'fecha_venta': pasaje.created_at.strftime('%Y-%m-%d %H:%M'),
+            'tipo_pasaje': pasaje.tipo_pasaje,
+            'es_reserva_conductor': pasaje.es_reserva_conductor,
+            'genera_ingresos': pasaje.genera_ingresos
+        }
+        if pasaje.es_reserva_conductor and pasaje.reservado_por:
+            info['reservado_por'] = {
+                'id': pasaje.reservado_por.id,
+                'nombre': pasaje.reservado_por.get_full_name() or pasaje.reservado_por.username
+            }
+        data.append(info)
+    return data
+
+
+class ProyeccionesTests(TestCase):
+
+    def setUp(self):
+        caches['compartida'].clear()
+        self.salida = crear_salida(1, pasajeros=2, encomiendas=1, capacidad=6)
+        conductor = self.salida.conductor
+        Pasaje.objects.create(salida=self.salida, nombre='Reserva', dni='1', asiento=5, precio=Decimal('0'),
+                              tipo_pasaje='reserva_conductor', reservado_por=conductor)
+        Pasaje.objects.create(salida=self.salida, nombre='Sin usuario', dni='2', asiento=6, precio=Decimal('0'),
+                              tipo_pasaje='reserva_conductor')
+
+    def test_mismo_json_que_con_instancias(self):
+        tabla = PASAJES_SALIDA.leer(Pasaje.objects.filter(salida=self.salida).order_by('asiento'))
+
+        self.assertEqual(tabla.filas(), pasajes_con_instancias(self.salida))
+        self.assertEqual(tabla.filas()[2]['reservado_por']['nombre'], 'Juan Pérez 1')
+        self.assertNotIn('reservado_por', tabla.filas()[3])
+
+        with self.assertNumQueries(2):
+            data = self.client.get(f'/api/salida/{self.salida.id}/pasajes/').json()
+        self.assertEqual(data['estadisticas']['total_ingresos'], 50.0)
+        self.assertEqual(data['estadisticas']['reservas_conductor'], 2)
+        self.assertEqual(data['estadisticas']['pasajes_vendidos'], 2)
+
+    def test_encomiendas_y_manifiestos(self):
+        encomienda = Encomienda.objects.get()
+        data = self.client.get(f'/api/salida/{self.salida.id}/encomiendas/').json()
+        self.assertEqual(data[0]['fecha_envio'], encomienda.created_at.strftime('%d/%m/%Y %H:%M'))
+        self.assertEqual(data[0]['peso_kg'], 3.0)
+
+        manifiesto = self.client.get(
+            f'/api/salida/{self.salida.id}/manifiesto-conductor/?conductor_id={self.salida.conductor_id}'
+        ).json()['manifiesto']
+        self.assertEqual([p['tipo'] for p in manifiesto['pasajeros']][-2:], ['Reserva del Conductor'] * 2)
+        self.assertEqual(manifiesto['pasajeros'][0]['telefono'], 'N/A')
+        self.assertEqual(manifiesto['estadisticas']['ingresos_generados'], 50.0)
+
+    def test_listado_vacio(self):
+        tabla = PASAJEROS_MANIFIESTO.leer(Pasaje.objects.none())
+
+        self.assertEqual(len(tabla), 0)
+        self.assertEqual(tabla.filas(), [])
+        self.assertEqual(sum(tabla['precio']), 0)
+
+
+@tag('benchmark')
+class ProyeccionesBenchmarkTests(TestCase):
+    """Antes/después de serializar con instancias completas o con la proyección"""
+
+    def test_pasajes_salida(self):
+        salida = crear_salida(1, capacidad=3000)
+        Pasaje.objects.bulk_create(
+            Pasaje(salida=salida, nombre=f'Pasajero {a}', dni=f'{a:08d}', asiento=a, precio=Decimal('25.00'),
+                   tipo_pasaje='reserva_conductor' if a % 10 == 0 else 'vendido',
+                   reservado_por=salida.conductor if a % 10 == 0 else None)
+            for a in range(1, 3001)
+        )
+        consulta = Pasaje.objects.filter(salida=salida).order_by('asiento')
+
+        resultado = benchmarks.comparar_serializacion(
+            lambda: pasajes_con_instancias(salida),
+            lambda: PASAJES_SALIDA.leer(consulta).filas(),
+        )
+
+        antes, despues = resultado['antes'], resultado['despues']
+        benchmarks.logger.info(
+            f'[benchmark] pasajes_salida 3000 filas: antes {antes["ms"]} ms / {antes["pico_kib"]} KiB, '
+            f'después {despues["ms"]} ms / {despues["pico_kib"]} KiB'
+        )
+        self.assertLess(despues['ms'], antes['ms'])
+        self.assertLess(despues['pico_kib'], antes['pico_kib'])
+
+
+class JsonRapidoTests(TestCase):
+
+    DATOS = {
+        'precio': Decimal('25.50'),
+        'momento': datetime(2025, 6, 2, 8, 30, tzinfo=dt_timezone.utc),
+        'fecha': date(2025, 6, 2),
+        'id': uuid.UUID(int=1),
+        'asientos': {1: 'Ana'},
+        'nombre': 'Ñuñoa → Juliaca',
+    }
+
+    def test_motores_equivalentes(self):
+        esperado = {
+            'precio': 25.5, 'momento': '2025-06-02T08:30:00Z', 'fecha': '2025-06-02',
+            'id': '00000000-0000-0000-0000-000000000001', 'asientos': {'1': 'Ana'}, 'nombre': 'Ñuñoa → Juliaca',
+        }
+        for motor in json_rapido.motores_disponibles():
+            with self.subTest(motor=motor), override_settings(JSON_MOTOR=motor):
+                self.assertEqual(json.loads(json_rapido.dumps(self.DATOS)), esperado)
+
+    def test_drf_y_json_response_usan_el_motor(self):
+        caches['catalogo'].clear()
+        crear_salida(1)
+        with mock.patch.dict(json_rapido._MOTORES, {'prueba': lambda datos, indentar: b'{"motor":"prueba"}'}), \
+                override_settings(JSON_MOTOR='prueba'):
+            self.assertEqual(self.client.get('/api/vehiculos/').content, b'{"motor":"prueba"}')
+            self.assertEqual(self.client.get('/api/salud/').content, b'{"motor":"prueba"}')
+        # La caché de catálogos guardó la respuesta del motor de prueba
+        caches['catalogo'].clear()
+
+        response = self.client.get('/api/vehiculos/')
+        self.assertEqual(response['Content-Type'], 'application/json')
+        self.assertEqual(response.json()[0]['placa'], 'ABC-001')
+        with self.assertRaises(TypeError):
+            json_rapido.JsonResponse([1, 2])
+
+
+class CompresionTests(TestCase):
+
+    def setUp(self):
+        caches['compartida'].clear()
+        self.salida = crear_salida(1, pasajeros=20, capacidad=20)
+        self.url = f'/api/salida/{self.salida.id}/pasajes/'
+
+    def test_negociacion(self):
+        self.assertEqual(compresion.negociar('gzip, deflate, br', ('br', 'gzip')), 'br')
+        self.assertEqual(compresion.negociar('br;q=0, gzip', ('br', 'gzip')), 'gzip')
+        self.assertEqual(compresion.negociar('gzip;q=0.5, br;q=0.2', ('br', 'gzip')), 'gzip')
+        self.assertEqual(compresion.negociar('*', ('br', 'gzip')), 'br')
+        self.assertEqual(compresion.negociar('gzip, br', ('gzip',)), 'gzip')
+        self.assertIsNone(compresion.negociar('identity', ('br', 'gzip')))
+        self.assertIsNone(compresion.negociar('', ('br', 'gzip')))
+
+    def test_respuesta_grande_comprimida_y_get_condicional(self):
+        plano = self.client.get(self.url)
+        self.assertNotIn('Content-Encoding', plano)
+        self.assertIn('Accept-Encoding', plano['Vary'])
+
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip')
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+        self.assertLess(len(response.content), len(plano.content))
+        self.assertEqual(gzip.decompress(response.content), plano.content)
+        self.assertTrue(response['ETag'].startswith('W/"'))
+        repetida = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip', HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(repetida.status_code, 304)
+
+    @unittest.skipIf(compresion.brotli is None, 'brotli no está instalado')
+    def test_brotli(self):
+        response = self.client.get(self.url, HTTP_ACCEPT_ENCODING='gzip, br')
+
+        self.assertEqual(response['Content-Encoding'], 'br')
+        self.assertEqual(json.loads(compresion.brotli.decompress(response.content))['estadisticas']['total_pasajes'], 20)
+
+    async def test_modo_asincrono(self):
+        async def vista(request):
+            return HttpResponse(b'{"a": 1}' * 500, content_type='application/json')
+
+        middleware = compresion.CompresionMiddleware(vista)
+        self.assertTrue(iscoroutinefunction(middleware))
+        response = await middleware(RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip'))
+
+        self.assertEqual(response['Content-Encoding'], 'gzip')
+
+    def test_respuestas_pequenas_y_streaming_sin_comprimir(self):
+        self.assertNotIn('Content-Encoding', self.client.get('/api/salud/', HTTP_ACCEPT_ENCODING='gzip'))
+        with override_settings(COMPRESION_MINIMO_BYTES=10):
+            pdf = self.client.get(f'/api/salida/{self.salida.id}/manifiesto-pdf/', HTTP_ACCEPT_ENCODING='gzip')
+        self.assertNotIn('Content-Encoding', pdf)
+        self.assertFalse(compresion.es_comprimible(StreamingHttpResponse(iter([b'data: 1\n\n']),
+                                                                        content_type='text/event-stream')))
+
+
+@tag('benchmark')
+class JsonRapidoBenchmarkTests(TestCase):
+    """Tiempo de serialización y bytes en la red de una respuesta de 1000 salidas"""
+
+    def test_respuesta_de_mil_salidas(self):
+        call_command('generar_datos', salidas=1000, conductores=10, rutas=10, meses=3,
+                     prefijo='j', stdout=StringIO())
+        primera = self.client.get('/api/salidas/?limit=500')
+        segunda = self.client.get(f'/api/salidas/?limit=500&cursor={primera["X-Next-Cursor"]}')
+        datos = primera.json() + segunda.json()
+        self.assertEqual(len(datos), 1000)
+
+        resultado = benchmarks.comparar_json(datos)
+
+        red = ', '.join(f'{codificacion} {total} B' for codificacion, total in resultado['bytes_red'].items())
+        benchmarks.logger.info(
+            f'[benchmark] 1000 salidas: DRF json {resultado["drf_json"]["ms"]} ms / '
+            f'json rápido {resultado["json_rapido"]["ms"]} ms; en la red: {red}'
+        )
+        self.assertLess(resultado['json_rapido']['ms'], resultado['drf_json']['ms'])
+        self.assertLess(resultado['bytes_red']['gzip'], resultado['bytes_red']['identity'] / 4)
+        if 'br' in resultado['bytes_red']:
+            self.assertLess(resultado['bytes_red']['br'], resultado['bytes_red']['gzip'])
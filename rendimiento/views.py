@@ -0,0 +1,97 @@
+import asyncio
+import datetime
+
+from django.conf import settings
+from django.db import DatabaseError
+from django.http import Http404, HttpResponse, StreamingHttpResponse
+from django.utils import timezone
+from django.views.decorators.http import require_http_methods
+from prometheus_client import CONTENT_TYPE_LATEST, generate_latest
+
+from transporte.sqlite import verificar_conexion
+from .eventos import difusor
+from .json_rapido import JsonResponse
+from .metricas import registro
+from .prometheus import registro_scrape, tasas_cache
+
+
+@require_http_methods(["GET"])
+def estadisticas_endpoints(request):
+    """
+    Histogramas por endpoint de este proceso en la ventana deslizante
+    (solo con DEBUG o para usuarios staff)
+    """
+    if not (settings.DEBUG or request.user.is_staff):
+        raise Http404
+    return JsonResponse({
+        'success': True,
+        'ventana_minutos': registro.ventana_minutos,
+        'endpoints': registro.instantanea(),
+        'caches': tasas_cache(),
+        'eventos': difusor.estadisticas()
+    })
+
+
+@require_http_methods(["GET"])
+def metricas_prometheus(request):
+    """Métricas en formato de texto de Prometheus (sumadas entre procesos)"""
+    return HttpResponse(generate_latest(registro_scrape()), content_type=CONTENT_TYPE_LATEST)
+
+
+@require_http_methods(["GET"])
+def salud(request):
+    """Chequeo de salud para el balanceador: 503 si la base de datos no responde"""
+    try:
+        base_datos = verificar_conexion()
+    except DatabaseError as e:
+        return JsonResponse({'success': False, 'error': f'Base de datos no disponible: {e}'}, status=503)
+    return JsonResponse({'success': True, 'base_datos': base_datos})
+
+
+async def _flujo_eventos(suscripcion, pendientes):
+    latido = getattr(settings, 'EVENTOS_LATIDO_SEGUNDOS', 15)
+    try:
+        yield f'retry: {getattr(settings, "EVENTOS_REINTENTO_MS", 3000)}\n\n'
+        for evento in pendientes:
+            yield evento.como_sse()
+        while True:
+            try:
+                evento = await suscripcion.siguiente(latido)
+            except asyncio.TimeoutError:
+                # Comentario SSE: mantiene viva la conexión a través de proxies
+                yield ': latido\n\n'
+                continue
+            if evento is None:
+                yield difusor.reinicio(suscripcion, 'cliente_lento').como_sse()
+                return
+            yield evento.como_sse()
+    finally:
+        difusor.desuscribir(suscripcion)
+
+
+@require_http_methods(["GET"])
+async def flujo_eventos(request):
+    """
+    Flujo Server-Sent Events de una salida (?salida=<id>) o de un día
+    (?fecha=AAAA-MM-DD, por defecto hoy). Reenvía los eventos posteriores a
+    Last-Event-ID (o ?desde=<id>) que sigan en el historial. Servir con ASGI
+    (transporte/asgi.py): con WSGI cada cliente ocupa un worker.
+    """
+    salida = request.GET.get('salida')
+    fecha = request.GET.get('fecha')
+    try:
+        salida_id = int(salida) if salida else None
+        fecha = datetime.date.fromisoformat(fecha) if fecha else timezone.localdate()
+    except ValueError:
+        return JsonResponse({'success': False, 'error': 'Parámetros salida o fecha inválidos'}, status=400)
+
+    suscripcion, pendientes = difusor.suscribir(
+        salida_id=salida_id,
+        fecha=None if salida_id else fecha,
+        desde=request.headers.get('Last-Event-ID') or request.GET.get('desde')
+    )
+    response = StreamingHttpResponse(_flujo_eventos(suscripcion, pendientes), content_type='text/event-stream')
+    response['Cache-Control'] = 'no-cache'
+    # nginx: entregar cada evento sin esperar a llenar el buffer
+    response['X-Accel-Buffering'] = 'no'
+    return response
@@ -0,0 +1,43 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from rutas.models import Salida
+
+
+class Command(BaseCommand):
+    help = 'Recalcula y repara los contadores de ocupación (pasajeros, encomiendas, peso) de las salidas'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--salida', type=int, action='append', dest='salidas',
+                            help='ID de salida a recalcular (se puede repetir). Por defecto: todas')
+        parser.add_argument('--lote', type=int, default=5000,
+                            help='Cantidad de salidas por transacción (default: 5000)')
+        parser.add_argument('--verificar', action='store_true',
+                            help='Solo reportar las salidas desfasadas, sin modificarlas')
+
+    def handle(self, *args, **options):
+        salidas = Salida.objects.all()
+        if options['salidas']:
+            salidas = salidas.filter(pk__in=options['salidas'])
+
+        desfasadas = list(salidas.con_contadores_desfasados().values_list('pk', flat=True))
+        self.stdout.write(f'Salidas con contadores desfasados: {len(desfasadas)}')
+
+        if options['verificar']:
+            for salida_id in desfasadas[:50]:
+                self.stdout.write(f'  - salida {salida_id}')
+            return
+
+        # Lotes por rango de id para no bloquear la base de datos en una sola transacción larga
+        ids = list(salidas.order_by('pk').values_list('pk', flat=True))
+        actualizadas = 0
+        for inicio in range(0, len(ids), options['lote']):
+            lote = ids[inicio:inicio + options['lote']]
+            with transaction.atomic():
+                actualizadas += salidas.filter(
+                    pk__gte=lote[0], pk__lte=lote[-1]
+                ).recalcular_contadores()
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Contadores recalculados en {actualizadas} salidas ({len(desfasadas)} reparadas)'
+        ))
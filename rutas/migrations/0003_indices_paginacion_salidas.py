@@ -0,0 +1,32 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:11
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rutas', '0002_initial'),
+        ('vehiculos', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='salida',
+            index=models.Index(fields=['fecha_hora', 'id'], name='salidas_fecha_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salida',
+            index=models.Index(fields=['estado', 'fecha_hora', 'id'], name='salidas_estado_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salida',
+            index=models.Index(fields=['ruta', 'fecha_hora', 'id'], name='salidas_ruta_fecha_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='salida',
+            index=models.Index(fields=['conductor', 'fecha_hora', 'id'], name='salidas_conductor_fecha_idx'),
+        ),
+    ]
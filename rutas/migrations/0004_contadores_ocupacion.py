@@ -0,0 +1,52 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:12
+
+from decimal import Decimal
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+
+
+def recalcular_contadores(apps, schema_editor):
+    Salida = apps.get_model('rutas', 'Salida')
+    Pasaje = apps.get_model('pasajes', 'Pasaje')
+    Encomienda = apps.get_model('encomiendas', 'Encomienda')
+
+    def agregado(modelo, expresion, cero):
+        subconsulta = modelo.objects.filter(salida=OuterRef('pk')).order_by().values('salida').annotate(
+            total=expresion
+        ).values('total')
+        return Coalesce(Subquery(subconsulta), Value(cero))
+
+    Salida.objects.update(
+        pasajeros_count=agregado(Pasaje, Count('pk'), 0),
+        encomiendas_count=agregado(Encomienda, Count('pk'), 0),
+        peso_encomiendas_kg=agregado(Encomienda, Sum('peso_kg'), Decimal('0')),
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rutas', '0003_indices_paginacion_salidas'),
+        ('pasajes', '0003_pasaje_reservado_por_pasaje_tipo_pasaje'),
+        ('encomiendas', '0002_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salida',
+            name='encomiendas_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='salida',
+            name='pasajeros_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='salida',
+            name='peso_encomiendas_kg',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0'), max_digits=9),
+        ),
+        migrations.RunPython(recalcular_contadores, migrations.RunPython.noop),
+    ]
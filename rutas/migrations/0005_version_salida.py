@@ -0,0 +1,18 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:16
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rutas', '0004_contadores_ocupacion'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salida',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
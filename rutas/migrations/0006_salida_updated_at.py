@@ -0,0 +1,25 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:23
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('rutas', '0005_version_salida'),
+        ('vehiculos', '0001_initial'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='salida',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True),
+        ),
+        migrations.AddIndex(
+            model_name='salida',
+            index=models.Index(fields=['conductor', 'updated_at'], name='salidas_conductor_cambio_idx'),
+        ),
+    ]
@@ -1,4 +1,11 @@
+from decimal import Decimal
+
+from django.apps import apps
 from django.db import models
+from django.db.models import Count, DecimalField, F, IntegerField, OuterRef, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
+from django.utils import timezone
+from rendimiento.cache_catalogo import invalidar_una_vez_al_confirmar
 from vehiculos.models import Vehiculo
 from django.conf import settings
 
@@ -19,6 +26,70 @@ class Ruta(models.Model):
     def __str__(self):
         return f"{self.origen} → {self.destino}"
 
+class SalidaQuerySet(models.QuerySet):
+
+    def ajustar_contadores(self, pasajeros=0, encomiendas=0, peso_kg=0):
+        """
+        Suma (o resta) a los contadores de ocupación con una sola sentencia UPDATE
+        e incrementa la versión de contenido de la salida (y su updated_at).
+        Usar dentro de la misma transacción que crea, modifica o elimina el Pasaje/Encomienda.
+        """
+        cambios = {'version': F('version') + 1, 'updated_at': timezone.now()}
+        if pasajeros:
+            cambios['pasajeros_count'] = F('pasajeros_count') + pasajeros
+        if encomiendas:
+            cambios['encomiendas_count'] = F('encomiendas_count') + encomiendas
+        if peso_kg:
+            cambios['peso_encomiendas_kg'] = F('peso_encomiendas_kg') + Decimal(str(peso_kg))
+        if pasajeros or encomiendas or peso_kg:
+            # update() no dispara señales: sello de la tabla para los ETag de las listas de
+            # salidas, que muestran los contadores (un solo set en la caché por transacción)
+            invalidar_una_vez_al_confirmar('salidas')
+        return self.update(**cambios)
+
+    def con_contadores_reales(self):
+        """Anota pasajeros_real, encomiendas_real y peso_real calculados desde las tablas"""
+        return self.annotate(**{
+            f'{nombre}_real': expresion for nombre, expresion in _contadores_reales().items()
+        })
+
+    def con_contadores_desfasados(self):
+        """Salidas cuyos contadores no coinciden con las tablas"""
+        return self.con_contadores_reales().exclude(
+            pasajeros_count=F('pasajeros_real'),
+            encomiendas_count=F('encomiendas_real'),
+            peso_encomiendas_kg=F('peso_real'),
+        )
+
+    def recalcular_contadores(self):
+        """Recalcula los contadores de todas las salidas del queryset en un solo UPDATE"""
+        reales = _contadores_reales()
+        return self.update(
+            pasajeros_count=reales['pasajeros'],
+            encomiendas_count=reales['encomiendas'],
+            peso_encomiendas_kg=reales['peso'],
+        )
+
+
+def _agregado_por_salida(modelo, expresion, output_field, cero):
+    subconsulta = modelo.objects.filter(salida=OuterRef('pk')).order_by().values('salida').annotate(
+        total=expresion
+    ).values('total')
+    return Coalesce(Subquery(subconsulta), Value(cero), output_field=output_field)
+
+
+def _contadores_reales():
+    Pasaje = apps.get_model('pasajes', 'Pasaje')
+    Encomienda = apps.get_model('encomiendas', 'Encomienda')
+    return {
+        'pasajeros': _agregado_por_salida(Pasaje, Count('pk'), IntegerField(), 0),
+        'encomiendas': _agregado_por_salida(Encomienda, Count('pk'), IntegerField(), 0),
+        'peso': _agregado_por_salida(
+            Encomienda, Sum('peso_kg'), DecimalField(max_digits=9, decimal_places=2), Decimal('0')
+        ),
+    }
+
+
 class Salida(models.Model):
     ESTADOS = [
         ('programada', 'Programada'),
@@ -34,14 +105,54 @@ class Salida(models.Model):
     fecha_hora = models.DateTimeField()
     estado = models.CharField(max_length=15, choices=ESTADOS, default='programada')
     
+    # Contadores de ocupación desnormalizados
+    # Se actualizan al crear/eliminar Pasaje y Encomienda (ver ajustar_contadores)
+    # Reparar con: python manage.py recalcular_contadores
+    pasajeros_count = models.PositiveIntegerField(default=0)
+    encomiendas_count = models.PositiveIntegerField(default=0)
+    peso_encomiendas_kg = models.DecimalField(max_digits=9, decimal_places=2, default=Decimal('0'))
+    
+    # Versión de contenido: cambia con cada alta/cambio/baja de sus pasajes y
+    # encomiendas y con cada save(). Sirve de clave para cachés (ej. manifiesto PDF)
+    version = models.PositiveIntegerField(default=0)
+    
+    # Última modificación (incluye los contadores): base de la sincronización incremental
+    updated_at = models.DateTimeField(auto_now=True)
+    
+    CAMPOS_CONTADORES = ('pasajeros_count', 'encomiendas_count', 'peso_encomiendas_kg', 'version')
+    
+    objects = SalidaQuerySet.as_manager()
+    
     class Meta:
         db_table = 'salidas'
         ordering = ['-fecha_hora']
         unique_together = ['vehiculo', 'fecha_hora']
+        # Índices para la paginación por cursor (fecha_hora, id) y sus filtros
+        # (vehiculo ya está cubierto por unique_together)
+        indexes = [
+            models.Index(fields=['fecha_hora', 'id'], name='salidas_fecha_id_idx'),
+            models.Index(fields=['estado', 'fecha_hora', 'id'], name='salidas_estado_fecha_idx'),
+            models.Index(fields=['ruta', 'fecha_hora', 'id'], name='salidas_ruta_fecha_idx'),
+            models.Index(fields=['conductor', 'fecha_hora', 'id'], name='salidas_conductor_fecha_idx'),
+            models.Index(fields=['conductor', 'updated_at'], name='salidas_conductor_cambio_idx'),
+        ]
     
     @property
     def capacidad_disponible(self):
-        return self.vehiculo.capacidad - self.pasajes.count()
+        return self.vehiculo.capacidad - self.pasajeros_count
+    
+    def save(self, *args, **kwargs):
+        # Un save() de una instancia ya existente no debe pisar los contadores
+        # que otras transacciones actualizaron con F() mientras tanto
+        existente = not self._state.adding
+        if existente and kwargs.get('update_fields') is None:
+            kwargs['update_fields'] = [
+                campo.attname for campo in self._meta.concrete_fields
+                if not campo.primary_key and campo.name not in self.CAMPOS_CONTADORES
+            ]
+        super().save(*args, **kwargs)
+        if existente:
+            Salida.objects.filter(pk=self.pk).update(version=F('version') + 1)
     
     def __str__(self):
         return f"{self.ruta} - {self.fecha_hora.strftime('%d/%m %H:%M')}"
\ No newline at end of file
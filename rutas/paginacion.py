@@ -0,0 +1,72 @@
+"""
+Paginación por cursor (keyset) sobre (fecha_hora, id)
+
+El cursor es opaco para el cliente: codifica la fecha_hora y el id de la
+última salida entregada. La siguiente página se obtiene con un filtro
+sobre el índice en lugar de OFFSET, por lo que su costo no crece con el
+historial.
+
+Solo se pagina si el cliente lo pide con `limit` o `cursor`: sin ellos la
+lista sale completa, como antes, para no truncar a los clientes que aún no
+siguen el cursor.
+"""
+import base64
+from datetime import datetime
+
+from django.db.models import Q
+
+LIMITE_POR_DEFECTO = 100
+LIMITE_MAXIMO = 500
+
+
+class CursorInvalido(ValueError):
+    pass
+
+
+def codificar_cursor(salida):
+    valor = f"{salida.fecha_hora.isoformat()}|{salida.id}"
+    return base64.urlsafe_b64encode(valor.encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    try:
+        relleno = '=' * (-len(cursor) % 4)
+        valor = base64.urlsafe_b64decode(cursor + relleno).decode()
+        fecha_hora, salida_id = valor.split('|')
+        return datetime.fromisoformat(fecha_hora), int(salida_id)
+    except (ValueError, UnicodeDecodeError):
+        raise CursorInvalido('Cursor inválido')
+
+
+def leer_limite(valor, cursor=None):
+    """Límite de la página; None (sin paginar) si no se pidió `limit` ni `cursor`"""
+    if not valor:
+        return LIMITE_POR_DEFECTO if cursor else None
+    limite = int(valor)
+    if limite < 1:
+        raise ValueError('El límite debe ser mayor a 0')
+    return min(limite, LIMITE_MAXIMO)
+
+
+def paginar_salidas(salidas, cursor=None, limite=LIMITE_POR_DEFECTO):
+    """
+    Devuelve (página, siguiente_cursor) ordenando de la más reciente a la más antigua.
+    `siguiente_cursor` es None cuando no hay más resultados. Con limite=None
+    devuelve todas las salidas.
+    """
+    salidas = salidas.order_by('-fecha_hora', '-id')
+    if cursor:
+        fecha_hora, salida_id = decodificar_cursor(cursor)
+        salidas = salidas.filter(
+            Q(fecha_hora__lt=fecha_hora) | Q(fecha_hora=fecha_hora, id__lt=salida_id)
+        )
+
+    if limite is None:
+        return list(salidas), None
+
+    # Pedir un elemento extra para saber si existe otra página
+    pagina = list(salidas[:limite + 1])
+    if len(pagina) > limite:
+        pagina = pagina[:limite]
+        return pagina, codificar_cursor(pagina[-1])
+    return pagina, None
@@ -1,3 +1,224 @@
+from datetime import timedelta
+from decimal import Decimal
+from io import StringIO
+from unittest.mock import patch
+
+from django.core.management import call_command
 from django.test import TestCase
+from django.utils import timezone
+
+from usuarios.models import Usuario
+from vehiculos.models import Vehiculo
+from pasajes.models import Pasaje
+from encomiendas.models import Encomienda
+from .models import Ruta, Salida
+
+
+def crear_salida(numero, fecha_hora=None, pasajeros=0, encomiendas=0, capacidad=4):
+    """Crea una salida completa (conductor, vehículo, ruta) para las pruebas"""
+    conductor = Usuario.objects.create(
+        username=f'conductor{numero}', first_name='Juan', last_name=f'Pérez {numero}', tipo='conductor'
+    )
+    vehiculo = Vehiculo.objects.create(
+        placa=f'ABC-{numero:03d}', marca='Toyota', modelo='Hilux', año=2020,
+        capacidad=capacidad, conductor=conductor
+    )
+    ruta = Ruta.objects.create(
+        nombre=f'Ruta {numero}', origen='Juliaca', destino='La Rinconada',
+        distancia_km=Decimal('120.50'), tiempo_estimado=timedelta(hours=3),
+        precio_pasaje=Decimal('25.00'), precio_encomienda_kg=Decimal('2.50')
+    )
+    salida = Salida.objects.create(
+        vehiculo=vehiculo, ruta=ruta, conductor=conductor,
+        fecha_hora=fecha_hora or timezone.now()
+    )
+    for asiento in range(1, pasajeros + 1):
+        Pasaje.objects.create(
+            salida=salida, nombre=f'Pasajero {asiento}', dni=f'{asiento:08d}',
+            asiento=asiento, precio=ruta.precio_pasaje, estado='pagado'
+        )
+    for i in range(encomiendas):
+        Encomienda.objects.create(
+            salida=salida, remitente_nombre='Ana', remitente_telefono='999888777',
+            destinatario_nombre='Luis', destinatario_telefono='999111222',
+            descripcion=f'Caja {i}', peso_kg=Decimal('3.00'), precio=Decimal('7.50')
+        )
+    return salida
+
+
+class SalidasHoyTests(TestCase):
+
+    def test_respuesta_conserva_formato(self):
+        salida = crear_salida(1, pasajeros=3, encomiendas=2)
+
+        response = self.client.get('/api/salidas-hoy/')
+
+        self.assertEqual(response.status_code, 200)
+        item = response.json()['salidas'][0]
+        self.assertEqual(item['id'], salida.id)
+        self.assertEqual(item['conductor']['nombre'], 'Juan Pérez 1')
+        self.assertEqual(item['vehiculo']['placa'], 'ABC-001')
+        self.assertEqual(item['pasajeros_count'], 3)
+        self.assertEqual(item['encomiendas_count'], 2)
+        self.assertEqual(item['capacidad_disponible'], 1)
+
+    def test_numero_de_consultas_constante(self):
+        crear_salida(1, pasajeros=2, encomiendas=1)
+        with self.assertNumQueries(1):
+            self.client.get('/api/salidas-hoy/')
+
+        for numero in range(2, 12):
+            crear_salida(numero, pasajeros=numero % 4, encomiendas=numero % 3)
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/salidas-hoy/')
+        self.assertEqual(len(response.json()['salidas']), 11)
+
+    def test_filtra_por_conductor(self):
+        salida = crear_salida(1)
+        crear_salida(2)
+
+        response = self.client.get('/api/salidas-hoy/', {'conductor_id': salida.conductor_id})
+
+        self.assertEqual([s['id'] for s in response.json()['salidas']], [salida.id])
+
+
+class GetSalidasPaginacionTests(TestCase):
+
+    def setUp(self):
+        base = timezone.now().replace(microsecond=0)
+        self.salidas = [
+            crear_salida(numero, fecha_hora=base - timedelta(days=numero))
+            for numero in range(1, 8)
+        ]
+
+    def test_recorre_todas_las_paginas_sin_repetir(self):
+        vistos = []
+        params = {'limit': 3}
+        while True:
+            response = self.client.get('/api/salidas/', params)
+            self.assertEqual(response.status_code, 200)
+            vistos.extend(s['id'] for s in response.json())
+            cursor = response.headers.get('X-Next-Cursor')
+            if not cursor:
+                break
+            self.assertIn('rel="next"', response.headers['Link'])
+            params['cursor'] = cursor
+
+        self.assertEqual(vistos, [s.id for s in self.salidas])
+
+    def test_consultas_por_pagina_constantes(self):
+        with self.assertNumQueries(1):
+            response = self.client.get('/api/salidas/', {'limit': 5})
+        with self.assertNumQueries(1):
+            self.client.get('/api/salidas/', {'limit': 5, 'cursor': response.headers['X-Next-Cursor']})
+
+    def test_filtros(self):
+        cancelada = self.salidas[2]
+        cancelada.estado = 'cancelada'
+        cancelada.save()
+
+        response = self.client.get('/api/salidas/', {'estado': 'cancelada'})
+        self.assertEqual([s['id'] for s in response.json()], [cancelada.id])
+
+        response = self.client.get('/api/salidas/', {'conductor_id': self.salidas[0].conductor_id})
+        self.assertEqual([s['id'] for s in response.json()], [self.salidas[0].id])
+
+        dia = self.salidas[3].fecha_hora.strftime('%Y-%m-%d')
+        response = self.client.get('/api/salidas/', {'desde': dia, 'hasta': dia})
+        self.assertEqual([s['id'] for s in response.json()], [self.salidas[3].id])
+
+    @patch('rutas.paginacion.LIMITE_POR_DEFECTO', 3)
+    def test_sin_limit_ni_cursor_no_trunca(self):
+        response = self.client.get('/api/salidas/')
+
+        self.assertEqual(len(response.json()), 7)
+        self.assertNotIn('X-Next-Cursor', response.headers)
+
+    def test_cursor_invalido(self):
+        response = self.client.get('/api/salidas/', {'cursor': 'no-es-un-cursor'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_filtros_invalidos(self):
+        for parametro in ('ruta_id', 'vehiculo_id', 'conductor_id'):
+            response = self.client.get('/api/salidas/', {parametro: 'abc'})
+            self.assertEqual(response.status_code, 400, parametro)
+
+
+class ContadoresOcupacionTests(TestCase):
+
+    def test_alta_y_baja_actualizan_contadores(self):
+        salida = crear_salida(1, pasajeros=2, encomiendas=2)
+        salida.refresh_from_db()
+        self.assertEqual(salida.pasajeros_count, 2)
+        self.assertEqual(salida.encomiendas_count, 2)
+        self.assertEqual(salida.peso_encomiendas_kg, Decimal('6.00'))
+        self.assertEqual(salida.capacidad_disponible, 2)
+
+        salida.pasajes.first().delete()
+        salida.encomiendas.all().delete()
+        salida.refresh_from_db()
+        self.assertEqual(salida.pasajeros_count, 1)
+        self.assertEqual(salida.encomiendas_count, 0)
+        self.assertEqual(salida.peso_encomiendas_kg, Decimal('0'))
+
+    def test_save_de_instancia_vieja_no_pisa_contadores(self):
+        salida = crear_salida(1)
+        vieja = Salida.objects.get(pk=salida.pk)
+        Pasaje.objects.create(salida=salida, nombre='Ana', dni='12345678', asiento=1, precio=Decimal('25.00'))
+
+        vieja.estado = 'cancelada'
+        vieja.save()
+
+        salida.refresh_from_db()
+        self.assertEqual(salida.estado, 'cancelada')
+        self.assertEqual(salida.pasajeros_count, 1)
+
+    def test_comando_repara_contadores(self):
+        salida = crear_salida(1, pasajeros=3, encomiendas=1)
+        Salida.objects.filter(pk=salida.pk).update(pasajeros_count=0, encomiendas_count=7)
+        self.assertEqual(Salida.objects.con_contadores_desfasados().count(), 1)
+
+        call_command('recalcular_contadores', stdout=StringIO())
+
+        salida.refresh_from_db()
+        self.assertEqual(salida.pasajeros_count, 3)
+        self.assertEqual(salida.encomiendas_count, 1)
+        self.assertEqual(salida.peso_encomiendas_kg, Decimal('3.00'))
+        self.assertFalse(Salida.objects.con_contadores_desfasados().exists())
+
+
+class DisponibilidadVentaTests(TestCase):
+
+    def test_mapa_de_asientos_y_saldo(self):
+        salida = crear_salida(1, pasajeros=2)
+        Pasaje.objects.create(
+            salida=salida, nombre='Chofer', dni='99999999', asiento=4,
+            precio=Decimal('0.00'), tipo_pasaje='reserva_conductor'
+        )
+        llena = crear_salida(2, pasajeros=4)
+        crear_salida(3, fecha_hora=timezone.now() + timedelta(days=9))
+
+        response = self.client.get('/api/disponibilidad-venta/')
+
+        self.assertEqual(response.status_code, 200)
+        data = response.json()
+        self.assertEqual([item['id'] for item in data], [salida.id])
+        self.assertNotIn(llena.id, [item['id'] for item in data])
+        item = data[0]
+        self.assertEqual(item['asientos']['ocupados'], [1, 2, 4])
+        self.assertEqual(item['asientos']['disponibles'], [3])
+        self.assertEqual(item['reservas_conductor'], [4])
+        self.assertEqual(item['total_pasajeros'], 3)
+        self.assertEqual(item['saldo_total'], 50.0)
+
+    def test_numero_de_consultas_constante(self):
+        for numero in range(1, 3):
+            crear_salida(numero, pasajeros=numero)
+        with self.assertNumQueries(2):
+            self.client.get('/api/disponibilidad-venta/')
 
-# Create your tests here.
+        for numero in range(3, 13):
+            crear_salida(numero, pasajeros=numero % 4)
+        with self.assertNumQueries(2):
+            response = self.client.get('/api/disponibilidad-venta/')
+        self.assertEqual(len(response.json()), 12)
@@ -1,32 +1,51 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
+from idempotencia.decoradores import idempotente
+from django.db.models import Count, F, Q
 from django.utils import timezone
+from collections import defaultdict
 from datetime import datetime, timedelta
+from pasajes.asientos import mapa_asientos
+from pasajes.models import Pasaje
+from rendimiento.cache_catalogo import cachear_catalogo
+from rendimiento.condicional import condicional_tablas
+from rendimiento.escritor import EscrituraDemorada, escribir, respuesta_demorada
 from .models import Ruta, Salida
+from .paginacion import CursorInvalido, leer_limite, paginar_salidas
 from vehiculos.models import Vehiculo
 from usuarios.models import Usuario
 
 
+def _rango_dia(fecha, dias=1):
+    """
+    Rango semiabierto [inicio, fin) en la zona horaria actual que cubre `dias`
+    días desde `fecha`. A diferencia de fecha_hora__date, que aplica una
+    función a la columna, la comparación directa usa los índices por fecha_hora.
+    """
+    inicio = timezone.make_aware(datetime.combine(fecha, datetime.min.time()))
+    return inicio, inicio + timedelta(days=dias)
+
+
+@condicional_tablas('salidas', 'rutas', 'vehiculos', por_dia=True)
 @api_view(['GET'])
 def salidas_hoy(request):
     """
     API: Obtener salidas del día de hoy
     ACTUALIZADA: Con restricciones de seguridad para conductores
     """
-    hoy = timezone.now().date()
+    hoy = timezone.localdate()
+    inicio, fin = _rango_dia(hoy)
     
     # Verificar si es petición de conductor específico
     conductor_id = request.GET.get('conductor_id')
     
+    salidas = Salida.objects.filter(fecha_hora__gte=inicio, fecha_hora__lt=fin)
     if conductor_id:
         # CONDUCTOR: Solo ver sus propias salidas
-        salidas = Salida.objects.filter(
-            fecha_hora__date=hoy,
-            conductor_id=conductor_id
-        ).order_by('fecha_hora')
-    else:
-        # ADMIN: Ver todas las salidas
-        salidas = Salida.objects.filter(fecha_hora__date=hoy).order_by('fecha_hora')
+        salidas = salidas.filter(conductor_id=conductor_id)
+    
+    # Una sola consulta: JOIN a ruta/vehículo/conductor y contadores desnormalizados
+    salidas = salidas.select_related('ruta', 'vehiculo', 'conductor').order_by('fecha_hora')
     
     data = []
     for salida in salidas:
@@ -50,8 +69,8 @@ def salidas_hoy(request):
                 'nombre': salida.conductor.get_full_name() or salida.conductor.username
             },
             'estado': salida.estado,
-            'pasajeros_count': salida.pasajes.count(),
-            'encomiendas_count': salida.encomiendas.count(),
+            'pasajeros_count': salida.pasajeros_count,
+            'encomiendas_count': salida.encomiendas_count,
             'capacidad_disponible': salida.capacidad_disponible
         })
     
@@ -62,6 +81,7 @@ def salidas_hoy(request):
     })
 
 
+@condicional_tablas('salidas', 'rutas', 'vehiculos')
 @api_view(['GET'])
 def mis_salidas_conductor(request):
     """
@@ -81,8 +101,6 @@ def mis_salidas_conductor(request):
     
     data = []
     for salida in salidas:
-        total_pasajeros = salida.pasajes.count()
-        
         data.append({
             'id': salida.id,
             'fecha_hora': salida.fecha_hora.strftime('%Y-%m-%d %H:%M'),
@@ -102,8 +120,8 @@ def mis_salidas_conductor(request):
                 'nombre': salida.conductor.get_full_name() or salida.conductor.username
             },
             'estado': salida.estado,
-            'pasajeros_count': total_pasajeros,
-            'encomiendas_count': salida.encomiendas.count()
+            'pasajeros_count': salida.pasajeros_count,
+            'encomiendas_count': salida.encomiendas_count
         })
     
     return Response({
@@ -112,17 +130,20 @@ def mis_salidas_conductor(request):
     })
 
 
+@condicional_tablas('rutas', periodo=60)
+@cachear_catalogo('rutas')
 @api_view(['GET'])
 def get_rutas(request):
     """Obtener todas las rutas"""
-    rutas = Ruta.objects.filter(activa=True).order_by('nombre')
+    # Salidas programadas por ruta contadas en la misma consulta
+    rutas = Ruta.objects.filter(activa=True).annotate(
+        salidas_programadas=Count('salida', filter=Q(
+            salida__fecha_hora__gte=timezone.now(), salida__estado='programada'
+        ))
+    ).order_by('nombre')
     data = []
     for ruta in rutas:
-        # Contar salidas programadas para esta ruta
-        salidas_programadas = ruta.salida_set.filter(
-            fecha_hora__gte=timezone.now(),
-            estado='programada'
-        ).count()
+        salidas_programadas = ruta.salidas_programadas
         
         data.append({
             'id': ruta.id,
@@ -138,6 +159,7 @@ def get_rutas(request):
         })
     return Response(data)
 
+@idempotente
 @api_view(['POST'])
 def crear_ruta(request):
     """Crear nueva ruta"""
@@ -296,6 +318,7 @@ def eliminar_ruta(request, ruta_id):
     except Ruta.DoesNotExist:
         return Response({'error': 'Ruta no encontrada'}, status=404)
 
+@idempotente
 @api_view(['POST'])
 def crear_salida(request):
     """Crear nueva salida"""
@@ -322,9 +345,11 @@ def crear_salida(request):
         fecha_hora = datetime.strptime(data['fecha_hora'], '%Y-%m-%dT%H:%M')
         
         # Verificar que no haya conflictos de vehículo
+        inicio, fin = _rango_dia(fecha_hora.date())
         conflictos = Salida.objects.filter(
             vehiculo=vehiculo,
-            fecha_hora__date=fecha_hora.date(),
+            fecha_hora__gte=inicio,
+            fecha_hora__lt=fin,
             estado__in=['programada', 'en_curso']
         ).exists()
         
@@ -351,25 +376,56 @@ def crear_salida(request):
     except Exception as e:
         return Response({'error': str(e)}, status=400)
 
+@condicional_tablas('salidas', 'rutas', 'vehiculos')
 @api_view(['GET'])
 def get_salidas(request):
     """
     Obtener salidas con restricciones de seguridad
+    Paginado por cursor: la respuesta sigue siendo una lista y el cursor de la
+    siguiente página viaja en las cabeceras X-Next-Cursor y Link
+    
+    Filtros opcionales: estado, ruta_id, vehiculo_id, conductor_id,
+    desde y hasta (YYYY-MM-DD, ambos inclusive), limit, cursor.
+    Sin limit ni cursor devuelve la lista completa, sin cabeceras de paginación.
     """
-    # Verificar si es petición de conductor específico
-    conductor_id = request.GET.get('conductor_id')
+    params = request.GET
+    salidas = Salida.objects.all()
     
-    if conductor_id:
-        # CONDUCTOR: Solo ver sus propias salidas
-        salidas = Salida.objects.filter(
-            conductor_id=conductor_id
-        ).order_by('-fecha_hora')
-    else:
-        # ADMIN: Ver todas las salidas
-        salidas = Salida.objects.all().order_by('-fecha_hora')
+    # Verificar si es petición de conductor específico
+    # CONDUCTOR: Solo ver sus propias salidas / ADMIN: Ver todas las salidas
+    filtros = {
+        'estado': 'estado',
+        'ruta_id': 'ruta_id',
+        'vehiculo_id': 'vehiculo_id',
+        'conductor_id': 'conductor_id',
+    }
+    try:
+        for parametro, campo in filtros.items():
+            if params.get(parametro):
+                # Los ids se validan aquí: un valor no numérico es un 400, no un error del servidor
+                valor = params[parametro] if parametro == 'estado' else int(params[parametro])
+                salidas = salidas.filter(**{campo: valor})
+        
+        # Rangos semiabiertos sobre fecha_hora para aprovechar los índices
+        if params.get('desde'):
+            desde = datetime.strptime(params['desde'], '%Y-%m-%d')
+            salidas = salidas.filter(fecha_hora__gte=timezone.make_aware(desde))
+        if params.get('hasta'):
+            hasta = datetime.strptime(params['hasta'], '%Y-%m-%d') + timedelta(days=1)
+            salidas = salidas.filter(fecha_hora__lt=timezone.make_aware(hasta))
+        limite = leer_limite(params.get('limit'), params.get('cursor'))
+        pagina, siguiente_cursor = paginar_salidas(
+            salidas.select_related('ruta', 'vehiculo', 'conductor'),
+            cursor=params.get('cursor'),
+            limite=limite
+        )
+    except CursorInvalido as e:
+        return Response({'error': str(e)}, status=400)
+    except ValueError:
+        return Response({'error': 'Parámetros de filtro inválidos'}, status=400)
     
     data = []
-    for salida in salidas:
+    for salida in pagina:
         data.append({
             'id': salida.id,
             'fecha_hora': salida.fecha_hora.strftime('%d/%m/%Y %H:%M'),
@@ -389,10 +445,17 @@ def get_salidas(request):
                 'nombre': salida.conductor.get_full_name() or salida.conductor.username
             },
             'estado': salida.estado,
-            'pasajeros_count': salida.pasajes.count(),
-            'encomiendas_count': salida.encomiendas.count()
+            'pasajeros_count': salida.pasajeros_count,
+            'encomiendas_count': salida.encomiendas_count
         })
-    return Response(data)
+    
+    response = Response(data)
+    if siguiente_cursor:
+        query = params.copy()
+        query['cursor'] = siguiente_cursor
+        response['X-Next-Cursor'] = siguiente_cursor
+        response['Link'] = f'<{request.build_absolute_uri(request.path)}?{query.urlencode()}>; rel="next"'
+    return response
 
 @api_view(['PUT'])
 def cancelar_salida(request, salida_id):
@@ -418,40 +481,74 @@ def cancelar_salida(request, salida_id):
     except Salida.DoesNotExist:
         return Response({'error': 'Salida no encontrada'}, status=404)
 
+def _salidas_en_venta():
+    """Salidas programadas o en curso de hoy a 7 días que todavía tienen cupo"""
+    inicio, fin = _rango_dia(timezone.localdate(), dias=8)
+    return Salida.objects.filter(
+        fecha_hora__gte=inicio,
+        fecha_hora__lt=fin,
+        estado__in=['programada', 'en_curso'],
+        pasajeros_count__lt=F('vehiculo__capacidad')
+    ).select_related('ruta', 'vehiculo', 'conductor').order_by('fecha_hora', 'id')
+
+
+def _datos_salida_venta(salida):
+    return {
+        'id': salida.id,
+        'hora': salida.fecha_hora.strftime('%H:%M'),
+        'fecha': salida.fecha_hora.strftime('%d/%m/%Y'),
+        'fecha_completa': salida.fecha_hora.strftime('%d/%m/%Y %H:%M'),
+        'ruta': f"{salida.ruta.origen} → {salida.ruta.destino}",
+        'ruta_nombre': salida.ruta.nombre,
+        'vehiculo': salida.vehiculo.placa,
+        'conductor': salida.conductor.get_full_name() or salida.conductor.username,
+        'capacidad': salida.vehiculo.capacidad,
+        'ocupados': salida.pasajeros_count,
+        'disponibles': salida.capacidad_disponible,
+        'precio': float(salida.ruta.precio_pasaje),
+        'estado': salida.estado
+    }
+
+
+@condicional_tablas('salidas', 'rutas', 'vehiculos', por_dia=True)
 @api_view(['GET'])
 def salidas_disponibles_venta(request):
     """API: Obtener salidas disponibles para venta (hoy y próximos días)"""
-    from datetime import datetime, timedelta
+    # Una sola consulta: el filtro de cupo usa el contador desnormalizado
+    return Response([_datos_salida_venta(salida) for salida in _salidas_en_venta()])
+
+
+@api_view(['GET'])
+def disponibilidad_venta(request):
+    """
+    API: Salidas en venta de los próximos 7 días con su mapa de asientos
     
-    # Obtener salidas desde hoy hasta los próximos 7 días
-    hoy = timezone.now().date()
-    limite = hoy + timedelta(days=7)
+    Reemplaza la llamada a /api/salida/<id>/pasajes/ por cada salida de la
+    pantalla de venta: dos consultas en total sin importar cuántas salidas haya
+    (salidas con sus relaciones y todos sus pasajes de una vez).
+    """
+    salidas = list(_salidas_en_venta())
     
-    salidas = Salida.objects.filter(
-        fecha_hora__date__gte=hoy,
-        fecha_hora__date__lte=limite,
-        estado__in=['programada', 'en_curso']
-    ).order_by('fecha_hora')
+    pasajes_por_salida = defaultdict(list)
+    pasajes = Pasaje.objects.filter(salida__in=[s.id for s in salidas]).order_by('asiento').values_list(
+        'salida_id', 'asiento', 'tipo_pasaje', 'precio'
+    )
+    for salida_id, asiento, tipo_pasaje, precio in pasajes:
+        pasajes_por_salida[salida_id].append((asiento, tipo_pasaje, precio))
     
     data = []
     for salida in salidas:
-        # Solo mostrar salidas que tienen cupo disponible
-        if salida.capacidad_disponible > 0:
-            data.append({
-                'id': salida.id,
-                'hora': salida.fecha_hora.strftime('%H:%M'),
-                'fecha': salida.fecha_hora.strftime('%d/%m/%Y'),
-                'fecha_completa': salida.fecha_hora.strftime('%d/%m/%Y %H:%M'),
-                'ruta': f"{salida.ruta.origen} → {salida.ruta.destino}",
-                'ruta_nombre': salida.ruta.nombre,
-                'vehiculo': salida.vehiculo.placa,
-                'conductor': salida.conductor.get_full_name() or salida.conductor.username,
-                'capacidad': salida.vehiculo.capacidad,
-                'ocupados': salida.pasajes.count(),
-                'disponibles': salida.capacidad_disponible,
-                'precio': float(salida.ruta.precio_pasaje),
-                'estado': salida.estado
-            })
+        pasajes_salida = pasajes_por_salida[salida.id]
+        ocupados = [asiento for asiento, _, _ in pasajes_salida]
+        item = _datos_salida_venta(salida)
+        item.update({
+            # capacidad, ocupados, retenidos (ventanillas) y disponibles
+            'asientos': mapa_asientos(salida, ocupados),
+            'reservas_conductor': [a for a, tipo, _ in pasajes_salida if tipo == 'reserva_conductor'],
+            'total_pasajeros': len(pasajes_salida),
+            'saldo_total': float(sum(p for _, tipo, p in pasajes_salida if tipo == 'vendido')),
+        })
+        data.append(item)
     
     return Response(data)
 
@@ -471,12 +568,14 @@ def marcar_salida(request, salida_id):
             }, status=403)
         
         salida.estado = 'en_curso'
-        salida.save()
+        escribir(salida.save)
         
         return Response({
             'success': True,
             'message': 'Salida marcada correctamente'
         })
+    except EscrituraDemorada as e:
+        return respuesta_demorada(e)
     except Salida.DoesNotExist:
         return Response({'error': 'Salida no encontrada'}, status=404)
 
@@ -496,12 +595,14 @@ def marcar_llegada(request, salida_id):
             }, status=403)
         
         salida.estado = 'completada'
-        salida.save()
+        escribir(salida.save)
         
         return Response({
             'success': True,
             'message': 'Viaje completado correctamente'
         })
+    except EscrituraDemorada as e:
+        return respuesta_demorada(e)
     except Salida.DoesNotExist:
         return Response({'error': 'Salida no encontrada'}, status=404)
 
@@ -0,0 +1,9 @@
+from django.apps import AppConfig
+
+
+class SincronizacionConfig(AppConfig):
+    default_auto_field = 'django.db.models.BigAutoField'
+    name = 'sincronizacion'
+
+    def ready(self):
+        from . import signals  # noqa: F401
@@ -0,0 +1,26 @@
+from datetime import timedelta
+
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from sincronizacion.models import Eliminacion, MutacionAplicada
+from sincronizacion.views import retencion_eliminaciones
+
+
+class Command(BaseCommand):
+    help = ('Elimina las lápidas de sincronización y los registros de operaciones offline '
+            'más viejos que la retención. Los dispositivos con un cursor anterior reciben '
+            'una sincronización completa')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int,
+                            help='Días de retención (default: SINCRONIZACION_RETENCION_DIAS)')
+
+    def handle(self, *args, **options):
+        retencion = timedelta(days=options['dias']) if options['dias'] else retencion_eliminaciones()
+        limite = timezone.now() - retencion
+        borradas, _ = Eliminacion.objects.filter(eliminado_en__lt=limite).delete()
+        mutaciones, _ = MutacionAplicada.objects.filter(aplicada_en__lt=limite).delete()
+        self.stdout.write(self.style.SUCCESS(
+            f'Lápidas eliminadas: {borradas}, operaciones offline eliminadas: {mutaciones}'
+        ))
@@ -0,0 +1,31 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:24
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Eliminacion',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('modelo', models.CharField(choices=[('salida', 'Salida'), ('pasaje', 'Pasaje'), ('encomienda', 'Encomienda')], max_length=15)),
+                ('objeto_id', models.BigIntegerField()),
+                ('salida_id', models.BigIntegerField()),
+                ('conductor_id', models.BigIntegerField()),
+                ('eliminado_en', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'db_table': 'eliminaciones',
+                'ordering': ['eliminado_en'],
+                'indexes': [models.Index(fields=['conductor_id', 'eliminado_en'], name='eliminaciones_conductor_idx'), models.Index(fields=['eliminado_en'], name='eliminaciones_fecha_idx')],
+            },
+        ),
+    ]
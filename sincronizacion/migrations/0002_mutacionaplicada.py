@@ -0,0 +1,29 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:26
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sincronizacion', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='MutacionAplicada',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operacion_id', models.CharField(max_length=64, unique=True)),
+                ('conductor_id', models.BigIntegerField()),
+                ('tipo', models.CharField(max_length=30)),
+                ('resultado', models.JSONField(default=dict)),
+                ('aplicada_en', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'mutaciones_aplicadas',
+                'ordering': ['aplicada_en'],
+                'indexes': [models.Index(fields=['aplicada_en'], name='mutaciones_fecha_idx')],
+            },
+        ),
+    ]
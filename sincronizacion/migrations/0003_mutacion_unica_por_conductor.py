@@ -0,0 +1,22 @@
+# Generated by Django 5.2.2 on 2026-10-18 14:35
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('sincronizacion', '0002_mutacionaplicada'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='mutacionaplicada',
+            name='operacion_id',
+            field=models.CharField(max_length=64),
+        ),
+        migrations.AlterUniqueTogether(
+            name='mutacionaplicada',
+            unique_together={('conductor_id', 'operacion_id')},
+        ),
+    ]
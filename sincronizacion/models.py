@@ -0,0 +1,57 @@
+from django.db import models
+from django.utils import timezone
+
+
+class Eliminacion(models.Model):
+    """
+    Lápida de una salida, pasaje o encomienda eliminada: permite que la app
+    del conductor borre su copia local en la siguiente sincronización.
+    Se purgan con: python manage.py purgar_eliminaciones
+    """
+    MODELOS = [
+        ('salida', 'Salida'),
+        ('pasaje', 'Pasaje'),
+        ('encomienda', 'Encomienda'),
+    ]
+    
+    modelo = models.CharField(max_length=15, choices=MODELOS)
+    objeto_id = models.BigIntegerField()
+    salida_id = models.BigIntegerField()
+    conductor_id = models.BigIntegerField()
+    eliminado_en = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        db_table = 'eliminaciones'
+        ordering = ['eliminado_en']
+        indexes = [
+            models.Index(fields=['conductor_id', 'eliminado_en'], name='eliminaciones_conductor_idx'),
+            models.Index(fields=['eliminado_en'], name='eliminaciones_fecha_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.modelo} #{self.objeto_id} eliminado {self.eliminado_en:%d/%m %H:%M}"
+
+
+class MutacionAplicada(models.Model):
+    """
+    Operación de la cola offline del conductor ya procesada, con su resultado.
+    Si el dispositivo reenvía el lote (se cortó la señal antes de recibir la
+    respuesta) la operación no se aplica dos veces: se devuelve este resultado.
+    """
+    operacion_id = models.CharField(max_length=64)
+    conductor_id = models.BigIntegerField()
+    tipo = models.CharField(max_length=30)
+    resultado = models.JSONField(default=dict)
+    aplicada_en = models.DateTimeField(auto_now_add=True)
+    
+    class Meta:
+        db_table = 'mutaciones_aplicadas'
+        ordering = ['aplicada_en']
+        # Los ids los genera cada dispositivo: únicos por conductor, no en toda la tabla
+        unique_together = ['conductor_id', 'operacion_id']
+        indexes = [
+            models.Index(fields=['aplicada_en'], name='mutaciones_fecha_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.tipo} {self.operacion_id}"
@@ -0,0 +1,178 @@
+"""
+Operaciones que la app del conductor encola sin señal y envía en lote
+
+Cada tipo recibe (conductor_id, datos, realizada_en) y devuelve el mensaje
+de éxito, o lanza ErrorMutacion. El lote se aplica en orden dentro de una
+transacción; cada operación en su propio savepoint, para que una rechazada
+(ej. pasaje eliminado mientras tanto) no bloquee la cola del dispositivo.
+"""
+from datetime import datetime
+
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+
+from encomiendas.models import Encomienda
+from pasajes.models import Pasaje
+from rutas.models import Salida
+from .models import MutacionAplicada
+
+_TIPOS = {}
+
+
+class ErrorMutacion(Exception):
+
+    def __init__(self, mensaje, status=400):
+        super().__init__(mensaje)
+        self.status = status
+
+
+def mutacion(nombre):
+    def registrar(funcion):
+        _TIPOS[nombre] = funcion
+        return funcion
+    return registrar
+
+
+def tipos_mutacion():
+    return sorted(_TIPOS)
+
+
+def _obtener(modelo, pk, error):
+    consulta = modelo.objects.all() if modelo is Salida else modelo.objects.select_related('salida')
+    try:
+        return consulta.get(pk=pk)
+    except (modelo.DoesNotExist, ValueError, TypeError):
+        raise ErrorMutacion(error, status=404)
+
+
+def _verificar_conductor(salida, conductor_id):
+    if salida.conductor_id != conductor_id:
+        raise ErrorMutacion('No tienes permisos sobre esta salida', status=403)
+
+
+@mutacion('check_in')
+def check_in(conductor_id, datos, realizada_en):
+    pasaje = _obtener(Pasaje, datos.get('pasaje_id'), 'Pasaje no encontrado')
+    _verificar_conductor(pasaje.salida, conductor_id)
+    pasaje.estado = 'abordado'
+    pasaje.save()
+    return f'Check-in realizado para {pasaje.nombre}'
+
+
+@mutacion('entregar_encomienda')
+def entregar_encomienda(conductor_id, datos, realizada_en):
+    encomienda = _obtener(Encomienda, datos.get('encomienda_id'), 'Encomienda no encontrada')
+    _verificar_conductor(encomienda.salida, conductor_id)
+    encomienda.estado = 'entregada'
+    encomienda.entregada_at = realizada_en
+    encomienda.save()
+    return f'Encomienda entregada: {encomienda.descripcion}'
+
+
+def _cambiar_estado_salida(conductor_id, datos, estado):
+    salida = _obtener(Salida, datos.get('salida_id'), 'Salida no encontrada')
+    _verificar_conductor(salida, conductor_id)
+    if salida.estado == 'cancelada':
+        raise ErrorMutacion('La salida fue cancelada', status=409)
+    salida.estado = estado
+    salida.save()
+
+
+@mutacion('marcar_salida')
+def marcar_salida(conductor_id, datos, realizada_en):
+    _cambiar_estado_salida(conductor_id, datos, 'en_curso')
+    return 'Salida marcada correctamente'
+
+
+@mutacion('marcar_llegada')
+def marcar_llegada(conductor_id, datos, realizada_en):
+    _cambiar_estado_salida(conductor_id, datos, 'completada')
+    return 'Viaje completado correctamente'
+
+
+def _leer_momento(valor):
+    """Momento en que el conductor hizo la operación en el dispositivo (por defecto: ahora)"""
+    if not valor:
+        return timezone.now()
+    try:
+        momento = datetime.fromisoformat(valor)
+    except (TypeError, ValueError):
+        raise ErrorMutacion('realizada_en inválido')
+    if timezone.is_naive(momento):
+        momento = timezone.make_aware(momento)
+    return min(momento, timezone.now())
+
+
+def _aplicar(conductor_id, operacion):
+    tipo = operacion.get('tipo')
+    if tipo not in _TIPOS:
+        raise ErrorMutacion(f'Tipo de operación desconocido: {tipo}')
+    datos = operacion.get('datos') or {}
+    return _TIPOS[tipo](conductor_id, datos, _leer_momento(operacion.get('realizada_en')))
+
+
+def _registrar(conductor_id, operacion, resultado):
+    with transaction.atomic():
+        return MutacionAplicada.objects.create(
+            operacion_id=resultado['id'], conductor_id=conductor_id,
+            tipo=str(operacion.get('tipo'))[:30], resultado=resultado
+        )
+
+
+def _registrada(conductor_id, operacion_id):
+    return MutacionAplicada.objects.filter(conductor_id=conductor_id, operacion_id=operacion_id).first()
+
+
+def _procesar(conductor_id, operacion_id, operacion):
+    """Aplica y registra una operación nueva; devuelve (resultado, repetida)"""
+    try:
+        # Savepoint por operación: el cambio y su registro se confirman juntos
+        with transaction.atomic():
+            resultado = {'id': operacion_id, 'estado': 'aplicada', 'status': 200,
+                         'mensaje': _aplicar(conductor_id, operacion)}
+            _registrar(conductor_id, operacion, resultado)
+        return resultado, False
+    except ErrorMutacion as e:
+        resultado = {'id': operacion_id, 'estado': 'rechazada', 'status': e.status, 'error': str(e)}
+    except IntegrityError:
+        previa = _registrada(conductor_id, operacion_id)
+        if previa is not None:
+            # Otro envío del mismo lote la registró primero
+            return previa.resultado, True
+        # Falló la propia operación contra una restricción de la base de datos
+        resultado = {'id': operacion_id, 'estado': 'rechazada', 'status': 409,
+                     'error': 'La operación entra en conflicto con los datos actuales'}
+    try:
+        # El rechazo también se registra: reenviarlo no lo va a cambiar
+        _registrar(conductor_id, operacion, resultado)
+        return resultado, False
+    except IntegrityError:
+        return _registrada(conductor_id, operacion_id).resultado, True
+
+
+def aplicar_lote(conductor_id, operaciones):
+    """
+    Aplica las operaciones en orden y devuelve un resultado por operación:
+    {'id', 'estado': aplicada|rechazada|repetida, 'status', 'mensaje' o 'error'}
+    """
+    ids = [str(op['id']) for op in operaciones if op.get('id')]
+    # Los ids los genera cada dispositivo: solo se comparan con los del mismo conductor
+    previas = {
+        m.operacion_id: m.resultado
+        for m in MutacionAplicada.objects.filter(conductor_id=conductor_id, operacion_id__in=ids)
+    }
+    resultados = []
+    with transaction.atomic():
+        for operacion in operaciones:
+            operacion_id = str(operacion.get('id') or '')
+            if not operacion_id:
+                resultados.append({'id': None, 'estado': 'rechazada', 'status': 400,
+                                   'error': 'Cada operación necesita un id'})
+                continue
+            if operacion_id in previas:
+                resultados.append({**previas[operacion_id], 'estado': 'repetida'})
+                continue
+            resultado, repetida = _procesar(conductor_id, operacion_id, operacion)
+            previas[operacion_id] = resultado
+            resultados.append({**resultado, 'estado': 'repetida'} if repetida else resultado)
+    return resultados
@@ -0,0 +1,57 @@
+from django.db.models.signals import post_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from encomiendas.models import Encomienda
+from pasajes.models import Pasaje
+from rutas.models import Salida
+from .models import Eliminacion
+
+
+@receiver(post_delete, sender=Salida)
+def registrar_salida_eliminada(sender, instance, **kwargs):
+    Eliminacion.objects.create(
+        modelo='salida', objeto_id=instance.pk, salida_id=instance.pk, conductor_id=instance.conductor_id
+    )
+
+
+@receiver(pre_save, sender=Salida)
+def registrar_cambio_de_conductor(sender, instance, update_fields=None, **kwargs):
+    """
+    Para el conductor anterior, una salida reasignada equivale a una eliminada.
+    Para el nuevo, sus pasajes y encomiendas son nuevos aunque no hayan
+    cambiado: se les toca updated_at para que entren en su próxima
+    sincronización incremental.
+    """
+    if instance._state.adding or (update_fields is not None and 'conductor' not in update_fields
+                                  and 'conductor_id' not in update_fields):
+        return
+    anterior = Salida.objects.filter(pk=instance.pk).values_list('conductor_id', flat=True).first()
+    if anterior is not None and anterior != instance.conductor_id:
+        Eliminacion.objects.create(
+            modelo='salida', objeto_id=instance.pk, salida_id=instance.pk, conductor_id=anterior
+        )
+        ahora = timezone.now()
+        Pasaje.objects.filter(salida_id=instance.pk).update(updated_at=ahora)
+        Encomienda.objects.filter(salida_id=instance.pk).update(updated_at=ahora)
+
+
+def _registrar_hijo(modelo, instance, origin):
+    if isinstance(origin, Salida) or getattr(origin, 'model', None) is Salida:
+        # La lápida de la salida cubre sus pasajes y encomiendas
+        return
+    conductor_id = Salida.objects.filter(pk=instance.salida_id).values_list('conductor_id', flat=True).first()
+    if conductor_id is not None:
+        Eliminacion.objects.create(
+            modelo=modelo, objeto_id=instance.pk, salida_id=instance.salida_id, conductor_id=conductor_id
+        )
+
+
+@receiver(post_delete, sender=Pasaje)
+def registrar_pasaje_eliminado(sender, instance, origin=None, **kwargs):
+    _registrar_hijo('pasaje', instance, origin)
+
+
+@receiver(post_delete, sender=Encomienda)
+def registrar_encomienda_eliminada(sender, instance, origin=None, **kwargs):
+    _registrar_hijo('encomienda', instance, origin)
@@ -0,0 +1,207 @@
+from datetime import timedelta
+from io import StringIO
+from unittest import mock
+
+from django.core.management import call_command
+from django.db import IntegrityError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+
+from encomiendas.models import Encomienda
+from pasajes.models import Pasaje
+from rutas.models import Salida
+from rutas.tests import crear_salida
+from . import mutaciones
+from .models import Eliminacion, MutacionAplicada
+
+
+@override_settings(SINCRONIZACION_MARGEN_SEGUNDOS=0)
+class SincronizarConductorTests(TestCase):
+
+    def setUp(self):
+        self.salida = crear_salida(1, pasajeros=2, encomiendas=1)
+        self.conductor_id = self.salida.conductor_id
+        crear_salida(2, pasajeros=1)  # de otro conductor
+
+    def sincronizar(self, desde=None):
+        params = {'conductor_id': self.conductor_id}
+        if desde:
+            params['desde'] = desde
+        return self.client.get('/api/sincronizar/', params).json()
+
+    def test_primera_sincronizacion_es_completa(self):
+        data = self.sincronizar()
+
+        self.assertTrue(data['completo'])
+        self.assertEqual([s['id'] for s in data['salidas']], [self.salida.id])
+        self.assertEqual([p['asiento'] for p in data['pasajes']], [1, 2])
+        self.assertEqual(len(data['encomiendas']), 1)
+        self.assertEqual(data['salidas'][0]['pasajeros_count'], 2)
+
+    def test_sin_cambios_la_respuesta_queda_vacia(self):
+        cursor = self.sincronizar()['cursor']
+
+        with self.assertNumQueries(4):
+            data = self.sincronizar(cursor)
+
+        self.assertFalse(data['completo'])
+        self.assertEqual(data['salidas'] + data['pasajes'] + data['encomiendas'], [])
+        self.assertEqual(data['eliminados'], {'salidas': [], 'pasajes': [], 'encomiendas': []})
+
+    def test_solo_envia_cambios_y_eliminaciones(self):
+        cursor = self.sincronizar()['cursor']
+        pasaje = Pasaje.objects.get(salida=self.salida, asiento=1)
+        pasaje.estado = 'abordado'
+        pasaje.save()
+        Pasaje.objects.get(salida=self.salida, asiento=2).delete()
+        encomienda = Encomienda.objects.get(salida=self.salida)
+        Encomienda.objects.filter(pk=encomienda.pk).delete()
+
+        data = self.sincronizar(cursor)
+
+        self.assertEqual([(p['id'], p['estado']) for p in data['pasajes']], [(pasaje.id, 'abordado')])
+        # El contador cambió: la salida viaja de nuevo
+        self.assertEqual(data['salidas'][0]['pasajeros_count'], 1)
+        self.assertEqual(len(data['eliminados']['pasajes']), 1)
+        self.assertEqual(data['eliminados']['encomiendas'], [encomienda.id])
+
+    def test_salida_eliminada_o_reasignada(self):
+        cursor = self.sincronizar()['cursor']
+        otra = Salida.objects.get(conductor_id=self.conductor_id)
+        otra.conductor = Salida.objects.exclude(pk=otra.pk).get().conductor
+        otra.save()
+
+        data = self.sincronizar(cursor)
+
+        self.assertEqual(data['eliminados']['salidas'], [self.salida.id])
+        # Las lápidas de la salida cubren sus pasajes: no se registran por separado
+        Salida.objects.filter(pk=self.salida.pk).delete()
+        self.assertFalse(Eliminacion.objects.filter(modelo='pasaje').exists())
+
+    def test_el_nuevo_conductor_recibe_los_pasajes_de_la_salida_reasignada(self):
+        anterior = self.conductor_id
+        cursor_anterior = self.sincronizar()['cursor']
+        self.conductor_id = Salida.objects.exclude(pk=self.salida.pk).get().conductor_id
+        cursor = self.sincronizar()['cursor']
+        self.salida.conductor_id = self.conductor_id
+        self.salida.save()
+
+        data = self.sincronizar(cursor)
+
+        self.assertEqual([s['id'] for s in data['salidas']], [self.salida.id])
+        self.assertEqual([p['asiento'] for p in data['pasajes']], [1, 2])
+        self.assertEqual([e['salida_id'] for e in data['encomiendas']], [self.salida.id])
+        # El conductor anterior solo recibe la lápida
+        self.conductor_id = anterior
+        data = self.sincronizar(cursor_anterior)
+        self.assertEqual(data['eliminados']['salidas'], [self.salida.id])
+        self.assertEqual(data['pasajes'], [])
+
+    def test_cursor_vencido_o_invalido(self):
+        viejo = (timezone.now() - timedelta(days=60)).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+        self.assertTrue(self.sincronizar(viejo)['completo'])
+
+        response = self.client.get('/api/sincronizar/', {'conductor_id': self.conductor_id, 'desde': 'ayer'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_purgar_eliminaciones(self):
+        Pasaje.objects.filter(salida=self.salida).delete()
+        Eliminacion.objects.update(eliminado_en=timezone.now() - timedelta(days=45))
+        Encomienda.objects.get(salida=self.salida).delete()
+
+        call_command('purgar_eliminaciones', stdout=StringIO())
+
+        self.assertEqual(list(Eliminacion.objects.values_list('modelo', flat=True)), ['encomienda'])
+
+
+class AplicarMutacionesTests(TestCase):
+
+    def setUp(self):
+        self.salida = crear_salida(1, pasajeros=2, encomiendas=1)
+        self.conductor_id = self.salida.conductor_id
+        self.pasajes = list(Pasaje.objects.filter(salida=self.salida).order_by('asiento'))
+        self.encomienda = Encomienda.objects.get(salida=self.salida)
+
+    def enviar(self, operaciones, conductor_id=None):
+        return self.client.post('/api/sincronizar/operaciones/', {
+            'conductor_id': conductor_id or self.conductor_id,
+            'operaciones': operaciones
+        }, content_type='application/json')
+
+    def viaje_completo(self):
+        entregada = '2026-03-01T10:30:00+00:00'
+        return [
+            {'id': 'op-1', 'tipo': 'check_in', 'datos': {'pasaje_id': self.pasajes[0].id}},
+            {'id': 'op-2', 'tipo': 'check_in', 'datos': {'pasaje_id': self.pasajes[1].id}},
+            {'id': 'op-3', 'tipo': 'marcar_salida', 'datos': {'salida_id': self.salida.id}},
+            {'id': 'op-4', 'tipo': 'entregar_encomienda', 'datos': {'encomienda_id': self.encomienda.id},
+             'realizada_en': entregada},
+            {'id': 'op-5', 'tipo': 'marcar_llegada', 'datos': {'salida_id': self.salida.id}},
+        ]
+
+    def test_aplica_el_viaje_en_un_solo_envio(self):
+        data = self.enviar(self.viaje_completo()).json()
+
+        self.assertEqual(data['aplicadas'], 5)
+        self.assertEqual([r['estado'] for r in data['resultados']], ['aplicada'] * 5)
+        self.salida.refresh_from_db()
+        self.assertEqual(self.salida.estado, 'completada')
+        self.assertEqual(set(Pasaje.objects.values_list('estado', flat=True)), {'abordado'})
+        self.encomienda.refresh_from_db()
+        self.assertEqual(self.encomienda.estado, 'entregada')
+        self.assertEqual(self.encomienda.entregada_at.isoformat(), '2026-03-01T10:30:00+00:00')
+
+    def test_reenviar_el_lote_no_aplica_dos_veces(self):
+        self.enviar(self.viaje_completo())
+        Salida.objects.filter(pk=self.salida.pk).update(estado='programada')
+
+        data = self.enviar(self.viaje_completo()).json()
+
+        self.assertEqual(data['aplicadas'], 0)
+        self.assertEqual({r['estado'] for r in data['resultados']}, {'repetida'})
+        self.salida.refresh_from_db()
+        self.assertEqual(self.salida.estado, 'programada')
+        self.assertEqual(MutacionAplicada.objects.count(), 5)
+
+    def test_una_operacion_rechazada_no_detiene_el_lote(self):
+        otra = crear_salida(2, pasajeros=1)
+        data = self.enviar([
+            {'id': 'a', 'tipo': 'check_in', 'datos': {'pasaje_id': 999999}},
+            {'id': 'b', 'tipo': 'check_in', 'datos': {'pasaje_id': otra.pasajes.get().id}},
+            {'id': 'c', 'tipo': 'teletransportar', 'datos': {}},
+            {'tipo': 'check_in', 'datos': {'pasaje_id': self.pasajes[0].id}},
+            {'id': 'd', 'tipo': 'check_in', 'datos': {'pasaje_id': self.pasajes[0].id}},
+        ]).json()
+
+        self.assertEqual([r['status'] for r in data['resultados']], [404, 403, 400, 400, 200])
+        self.assertEqual(data['aplicadas'], 1)
+        self.assertEqual(otra.pasajes.get().estado, 'pagado')
+        # Los rechazos quedan registrados con su resultado
+        self.assertEqual(self.enviar([{'id': 'a', 'tipo': 'check_in'}]).json()['resultados'][0]['status'], 404)
+
+    def test_ids_de_operacion_son_por_conductor(self):
+        otra = crear_salida(2, pasajeros=1)
+        self.enviar([{'id': 'op-1', 'tipo': 'check_in', 'datos': {'pasaje_id': self.pasajes[0].id}}])
+
+        data = self.enviar([{'id': 'op-1', 'tipo': 'check_in', 'datos': {'pasaje_id': otra.pasajes.get().id}}],
+                           conductor_id=otra.conductor_id).json()
+
+        self.assertEqual(data['resultados'][0]['estado'], 'aplicada')
+        self.assertEqual(otra.pasajes.get().estado, 'abordado')
+        self.assertEqual(MutacionAplicada.objects.filter(operacion_id='op-1').count(), 2)
+
+    def test_error_de_integridad_de_la_operacion_se_rechaza(self):
+        def falla(conductor_id, datos, realizada_en):
+            raise IntegrityError('UNIQUE constraint failed')
+
+        with mock.patch.dict(mutaciones._TIPOS, {'falla': falla}):
+            data = self.enviar([{'id': 'x', 'tipo': 'falla'}]).json()
+
+        self.assertEqual(data['resultados'][0]['estado'], 'rechazada')
+        self.assertEqual(data['resultados'][0]['status'], 409)
+        self.assertEqual(MutacionAplicada.objects.get(operacion_id='x').resultado['status'], 409)
+
+    def test_validacion_del_lote(self):
+        self.assertEqual(self.enviar('no es lista').status_code, 400)
+        self.assertEqual(self.client.post('/api/sincronizar/operaciones/', {'operaciones': []},
+                                          content_type='application/json').status_code, 400)
@@ -0,0 +1,200 @@
+"""
+Sincronización incremental para la app del conductor
+
+La app guarda una copia local de sus salidas, pasajes y encomiendas y pide
+solo lo que cambió desde el último cursor: filas con updated_at posterior y
+lápidas (Eliminacion) de lo que se borró. El tamaño de la respuesta depende
+de la cantidad de cambios, no del total de datos del conductor.
+"""
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.utils import timezone
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from encomiendas.models import Encomienda
+from pasajes.models import Pasaje
+from rendimiento.escritor import EscrituraDemorada, escribir, respuesta_demorada
+from rutas.models import Salida
+from .models import Eliminacion
+from .mutaciones import aplicar_lote
+
+# Operaciones por lote: un viaje completo cabe de sobra
+MAXIMO_OPERACIONES = 500
+
+
+def margen_sincronizacion():
+    """
+    El cursor devuelto retrocede unos segundos: una transacción que empezó
+    antes de la consulta y confirma después tiene updated_at anterior al
+    cursor. Esas filas se vuelven a enviar y la app las aplica de nuevo.
+    """
+    return timedelta(seconds=getattr(settings, 'SINCRONIZACION_MARGEN_SEGUNDOS', 5))
+
+
+def retencion_eliminaciones():
+    return timedelta(days=getattr(settings, 'SINCRONIZACION_RETENCION_DIAS', 30))
+
+
+def codificar_cursor(momento):
+    # En UTC con 'Z': sin '+' que se pierda al ir en la URL sin codificar
+    return momento.astimezone(dt_timezone.utc).strftime('%Y-%m-%dT%H:%M:%S.%fZ')
+
+
+def leer_cursor(valor):
+    cursor = datetime.fromisoformat(valor)
+    if timezone.is_naive(cursor):
+        cursor = timezone.make_aware(cursor)
+    return cursor
+
+
+def _datos_salida(salida):
+    return {
+        'id': salida.id,
+        'fecha_hora': salida.fecha_hora.strftime('%d/%m/%Y %H:%M'),
+        'ruta': {
+            'id': salida.ruta.id,
+            'nombre': salida.ruta.nombre,
+            'origen': salida.ruta.origen,
+            'destino': salida.ruta.destino
+        },
+        'vehiculo': {
+            'id': salida.vehiculo.id,
+            'placa': salida.vehiculo.placa,
+            'capacidad': salida.vehiculo.capacidad
+        },
+        'conductor': {
+            'id': salida.conductor.id,
+            'nombre': salida.conductor.get_full_name() or salida.conductor.username
+        },
+        'estado': salida.estado,
+        'pasajeros_count': salida.pasajeros_count,
+        'encomiendas_count': salida.encomiendas_count,
+        'updated_at': salida.updated_at.isoformat()
+    }
+
+
+def _datos_pasaje(pasaje):
+    return {
+        'id': pasaje.id,
+        'salida_id': pasaje.salida_id,
+        'nombre': pasaje.nombre,
+        'dni': pasaje.dni,
+        'telefono': pasaje.telefono,
+        'asiento': pasaje.asiento,
+        'precio': float(pasaje.precio),
+        'estado': pasaje.estado,
+        'fecha_venta': pasaje.created_at.strftime('%Y-%m-%d %H:%M'),
+        'tipo_pasaje': pasaje.tipo_pasaje,
+        'es_reserva_conductor': pasaje.es_reserva_conductor,
+        'genera_ingresos': pasaje.genera_ingresos,
+        'updated_at': pasaje.updated_at.isoformat()
+    }
+
+
+def _datos_encomienda(encomienda):
+    return {
+        'id': encomienda.id,
+        'salida_id': encomienda.salida_id,
+        'remitente_nombre': encomienda.remitente_nombre,
+        'remitente_telefono': encomienda.remitente_telefono,
+        'destinatario_nombre': encomienda.destinatario_nombre,
+        'destinatario_telefono': encomienda.destinatario_telefono,
+        'descripcion': encomienda.descripcion,
+        'peso_kg': float(encomienda.peso_kg),
+        'precio': float(encomienda.precio),
+        'estado': encomienda.estado,
+        'fecha_envio': encomienda.created_at.strftime('%d/%m/%Y %H:%M'),
+        'updated_at': encomienda.updated_at.isoformat()
+    }
+
+
+@api_view(['GET'])
+def sincronizar_conductor(request):
+    """
+    API: Cambios de las salidas del conductor desde el cursor `desde`
+    
+    Sin cursor, o con uno más viejo que la retención de lápidas, responde
+    con todos los datos y `completo: true` (la app reemplaza su copia local).
+    Guardar `cursor` de la respuesta y enviarlo como `desde` la próxima vez.
+    """
+    conductor_id = request.GET.get('conductor_id')
+    if not conductor_id:
+        return Response({
+            'success': False,
+            'error': 'conductor_id es requerido'
+        }, status=400)
+    
+    ahora = timezone.now()
+    desde = None
+    if request.GET.get('desde'):
+        try:
+            desde = leer_cursor(request.GET['desde'])
+        except ValueError:
+            return Response({'success': False, 'error': 'Cursor de sincronización inválido'}, status=400)
+    completo = desde is None or desde < ahora - retencion_eliminaciones()
+    
+    salidas = Salida.objects.filter(conductor_id=conductor_id).select_related('ruta', 'vehiculo', 'conductor')
+    pasajes = Pasaje.objects.filter(salida__conductor_id=conductor_id)
+    encomiendas = Encomienda.objects.filter(salida__conductor_id=conductor_id)
+    eliminados = {'salidas': [], 'pasajes': [], 'encomiendas': []}
+    
+    if not completo:
+        salidas = salidas.filter(updated_at__gte=desde)
+        pasajes = pasajes.filter(updated_at__gte=desde)
+        encomiendas = encomiendas.filter(updated_at__gte=desde)
+        lapidas = Eliminacion.objects.filter(
+            conductor_id=conductor_id, eliminado_en__gte=desde
+        ).values_list('modelo', 'objeto_id')
+        for modelo, objeto_id in lapidas:
+            eliminados[f'{modelo}s'].append(objeto_id)
+    
+    return Response({
+        'success': True,
+        'completo': completo,
+        'cursor': codificar_cursor(ahora - margen_sincronizacion()),
+        'salidas': [_datos_salida(s) for s in salidas.order_by('fecha_hora', 'id')],
+        'pasajes': [_datos_pasaje(p) for p in pasajes.order_by('salida_id', 'asiento')],
+        'encomiendas': [_datos_encomienda(e) for e in encomiendas.order_by('salida_id', 'id')],
+        'eliminados': eliminados
+    })
+
+
+@api_view(['POST'])
+def aplicar_mutaciones(request):
+    """
+    API: Aplica en orden la cola de operaciones offline del conductor
+    
+    Body: {"conductor_id": 3, "operaciones": [{"id": "<uuid del dispositivo>",
+    "tipo": "check_in", "datos": {"pasaje_id": 10}, "realizada_en": "<ISO>"}]}
+    
+    Tipos: check_in, entregar_encomienda, marcar_salida, marcar_llegada.
+    Responde un resultado por operación; reenviar un lote ya aplicado es
+    seguro (las operaciones vuelven con estado "repetida").
+    """
+    conductor_id = request.data.get('conductor_id')
+    operaciones = request.data.get('operaciones')
+    try:
+        conductor_id = int(conductor_id)
+    except (TypeError, ValueError):
+        return Response({'success': False, 'error': 'conductor_id es requerido'}, status=400)
+    if not isinstance(operaciones, list) or not all(isinstance(op, dict) for op in operaciones):
+        return Response({'success': False, 'error': 'operaciones debe ser una lista'}, status=400)
+    if len(operaciones) > MAXIMO_OPERACIONES:
+        return Response({
+            'success': False,
+            'error': f'Máximo {MAXIMO_OPERACIONES} operaciones por lote'
+        }, status=400)
+    
+    try:
+        resultados = escribir(aplicar_lote, conductor_id, operaciones)
+    except EscrituraDemorada as e:
+        # Reenviar el lote es seguro: las operaciones ya aplicadas vuelven como "repetida"
+        return respuesta_demorada(e)
+    return Response({
+        'success': True,
+        'aplicadas': sum(1 for r in resultados if r['estado'] == 'aplicada'),
+        'rechazadas': sum(1 for r in resultados if r['estado'] == 'rechazada'),
+        'resultados': resultados
+    })
@@ -0,0 +1,133 @@
+"""
+Cola de tareas en segundo plano respaldada por la base de datos
+
+Las vistas encolan el trabajo pesado (PDFs, reportes, importaciones) y
+responden al instante; el comando `procesar_tareas` lo ejecuta en un pool
+de hilos o procesos fuera de los workers WSGI.
+
+Registrar un tipo de tarea en el módulo tareas.py de cualquier app:
+
+    @tarea('manifiesto_pdf', validar=validar_manifiesto)
+    def generar_manifiesto(parametros):
+        return Resultado(contenido=pdf, tipo='application/pdf', nombre='manifiesto.pdf')
+"""
+import logging
+import traceback
+from dataclasses import dataclass
+from datetime import timedelta
+
+from django.db.models import F
+from django.utils import timezone
+
+from .models import Tarea
+
+logger = logging.getLogger(__name__)
+
+_TIPOS = {}
+
+
+class TipoDesconocido(ValueError):
+    pass
+
+
+@dataclass
+class Resultado:
+    contenido: bytes
+    tipo: str = 'application/octet-stream'
+    nombre: str = 'resultado'
+
+
+@dataclass
+class TipoTarea:
+    funcion: callable
+    validar: callable = None
+
+
+def tarea(nombre, validar=None):
+    """
+    Registra una función como tipo de tarea. `validar(parametros)` se llama al
+    encolar y puede lanzar ValueError o PermissionError para rechazarla.
+    """
+    def registrar(funcion):
+        _TIPOS[nombre] = TipoTarea(funcion=funcion, validar=validar)
+        return funcion
+    return registrar
+
+
+def tipos_registrados():
+    return sorted(_TIPOS)
+
+
+def encolar(tipo, parametros=None):
+    if tipo not in _TIPOS:
+        raise TipoDesconocido(f'Tipo de tarea desconocido: {tipo}')
+    parametros = parametros or {}
+    if _TIPOS[tipo].validar:
+        _TIPOS[tipo].validar(parametros)
+    return Tarea.objects.create(tipo=tipo, parametros=parametros)
+
+
+def reclamar(limite=1):
+    """
+    Marca hasta `limite` tareas pendientes como en_proceso y devuelve sus ids.
+    El UPDATE condicionado al estado evita que dos workers tomen la misma tarea.
+    """
+    reclamadas = []
+    candidatas = Tarea.objects.filter(estado='pendiente').order_by('creada_en', 'id').values_list(
+        'id', flat=True
+    )[:limite * 2]
+    for tarea_id in candidatas:
+        tomada = Tarea.objects.filter(id=tarea_id, estado='pendiente').update(
+            estado='en_proceso', iniciada_en=timezone.now(), intentos=F('intentos') + 1
+        )
+        if tomada:
+            reclamadas.append(tarea_id)
+        if len(reclamadas) >= limite:
+            break
+    return reclamadas
+
+
+def ejecutar(tarea_id):
+    """Ejecuta una tarea ya reclamada y guarda su resultado o su error"""
+    tarea_obj = Tarea.objects.get(id=tarea_id)
+    try:
+        tipo = _TIPOS.get(tarea_obj.tipo)
+        if tipo is None:
+            raise TipoDesconocido(f'Tipo de tarea desconocido: {tarea_obj.tipo}')
+        resultado = tipo.funcion(tarea_obj.parametros)
+    except Exception:
+        logger.exception('Falló la tarea %s', tarea_obj)
+        tarea_obj.estado = 'fallida'
+        tarea_obj.error = traceback.format_exc(limit=5)
+    else:
+        tarea_obj.estado = 'completada'
+        tarea_obj.resultado = resultado.contenido
+        tarea_obj.resultado_tipo = resultado.tipo
+        tarea_obj.resultado_nombre = resultado.nombre
+    tarea_obj.finalizada_en = timezone.now()
+    tarea_obj.save()
+    return tarea_obj.estado
+
+
+def liberar_atascadas(minutos):
+    """Devuelve a la cola las tareas en_proceso de un worker que murió hace más de `minutos`"""
+    limite = timezone.now() - timedelta(minutes=minutos)
+    return Tarea.objects.filter(estado='en_proceso', iniciada_en__lt=limite).update(estado='pendiente')
+
+
+def purgar_finalizadas(dias):
+    """Elimina las tareas completadas o fallidas (con su resultado) de hace más de `dias`"""
+    limite = timezone.now() - timedelta(days=dias)
+    borradas, _ = Tarea.objects.filter(estado__in=('completada', 'fallida'), finalizada_en__lt=limite).delete()
+    return borradas
+
+
+def ejecutar_pendientes():
+    """Ejecuta en el hilo actual todas las tareas pendientes (pruebas y depuración)"""
+    ejecutadas = 0
+    while True:
+        ids = reclamar()
+        if not ids:
+            return ejecutadas
+        ejecutar(ids[0])
+        ejecutadas += 1
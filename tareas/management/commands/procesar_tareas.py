@@ -0,0 +1,86 @@
+import signal
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import close_old_connections, connections
+
+from tareas.cola import ejecutar, liberar_atascadas, reclamar
+
+
+def _ejecutar_en_worker(tarea_id):
+    # Cada hilo/proceso del pool usa su propia conexión y la cierra al terminar
+    close_old_connections()
+    try:
+        return ejecutar(tarea_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = 'Procesa la cola de tareas en segundo plano (PDFs, reportes, importaciones)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--hilos', type=int, default=getattr(settings, 'TAREAS_HILOS', 2),
+                            help='Tamaño del pool de ejecución (default: TAREAS_HILOS)')
+        parser.add_argument('--procesos', action='store_true',
+                            help='Usar un pool de procesos en lugar de hilos')
+        parser.add_argument('--intervalo', type=float, default=1.0,
+                            help='Segundos de espera cuando la cola está vacía')
+        parser.add_argument('--una-vez', action='store_true',
+                            help='Procesar las tareas pendientes y terminar')
+        parser.add_argument('--liberar-tras', type=int, default=15,
+                            help='Minutos tras los cuales una tarea en_proceso se considera abandonada')
+
+    def handle(self, *args, **options):
+        self.detener = False
+        signal.signal(signal.SIGTERM, self._detener)
+
+        liberadas = liberar_atascadas(options['liberar_tras'])
+        if liberadas:
+            self.stdout.write(f'{liberadas} tareas abandonadas devueltas a la cola')
+
+        tamano = max(1, options['hilos'])
+        if options['procesos']:
+            # Los procesos hijos no deben heredar conexiones abiertas
+            connections.close_all()
+            pool = ProcessPoolExecutor(max_workers=tamano)
+        else:
+            pool = ThreadPoolExecutor(max_workers=tamano, thread_name_prefix='tarea')
+
+        self.stdout.write(f'Procesando tareas con {tamano} {"procesos" if options["procesos"] else "hilos"}')
+        en_curso = set()
+        procesadas = 0
+        ultima_liberacion = time.monotonic()
+        try:
+            while not self.detener:
+                # Las de otro worker que murió mientras este sigue en marcha
+                if time.monotonic() - ultima_liberacion >= 60:
+                    ultima_liberacion = time.monotonic()
+                    liberadas = liberar_atascadas(options['liberar_tras'])
+                    if liberadas:
+                        self.stdout.write(f'{liberadas} tareas abandonadas devueltas a la cola')
+                libres = tamano - len(en_curso)
+                ids = reclamar(libres) if libres else []
+                for tarea_id in ids:
+                    en_curso.add(pool.submit(_ejecutar_en_worker, tarea_id))
+
+                if not en_curso:
+                    if options['una_vez']:
+                        break
+                    time.sleep(options['intervalo'])
+                    continue
+
+                terminadas, en_curso = wait(en_curso, timeout=options['intervalo'], return_when=FIRST_COMPLETED)
+                for futuro in terminadas:
+                    procesadas += 1
+                    if futuro.exception():
+                        self.stderr.write(f'Error del worker: {futuro.exception()!r}')
+        finally:
+            pool.shutdown(wait=True)
+
+        self.stdout.write(self.style.SUCCESS(f'{procesadas} tareas procesadas'))
+
+    def _detener(self, *args):
+        self.detener = True
@@ -0,0 +1,23 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from tareas.cola import liberar_atascadas, purgar_finalizadas
+
+
+class Command(BaseCommand):
+    help = ('Elimina las tareas finalizadas más viejas que la retención (los PDF guardados '
+            'contienen datos de pasajeros) y devuelve a la cola las abandonadas')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dias', type=int,
+                            help='Días de retención (default: TAREAS_RETENCION_DIAS)')
+        parser.add_argument('--liberar-tras', type=int, default=15,
+                            help='Minutos tras los cuales una tarea en_proceso se considera abandonada')
+
+    def handle(self, *args, **options):
+        dias = options['dias'] or getattr(settings, 'TAREAS_RETENCION_DIAS', 7)
+        borradas = purgar_finalizadas(dias)
+        liberadas = liberar_atascadas(options['liberar_tras'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Tareas eliminadas: {borradas}, tareas abandonadas devueltas a la cola: {liberadas}'
+        ))
@@ -0,0 +1,36 @@
+# Generated by Django 5.2.2 on 2026-10-18 13:18
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Tarea',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('tipo', models.CharField(max_length=50)),
+                ('parametros', models.JSONField(default=dict)),
+                ('estado', models.CharField(choices=[('pendiente', 'Pendiente'), ('en_proceso', 'En Proceso'), ('completada', 'Completada'), ('fallida', 'Fallida')], default='pendiente', max_length=15)),
+                ('resultado', models.BinaryField(blank=True, null=True)),
+                ('resultado_tipo', models.CharField(blank=True, max_length=100)),
+                ('resultado_nombre', models.CharField(blank=True, max_length=200)),
+                ('error', models.TextField(blank=True)),
+                ('intentos', models.PositiveSmallIntegerField(default=0)),
+                ('creada_en', models.DateTimeField(auto_now_add=True)),
+                ('iniciada_en', models.DateTimeField(blank=True, null=True)),
+                ('finalizada_en', models.DateTimeField(blank=True, null=True)),
+            ],
+            options={
+                'db_table': 'tareas',
+                'ordering': ['creada_en'],
+                'indexes': [models.Index(fields=['estado', 'creada_en'], name='tareas_estado_creada_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,27 @@
+# Generated by Django 5.2.2 on 2026-10-18 14:33
+
+import tareas.models
+from django.db import migrations, models
+
+
+def tokens_propios(apps, schema_editor):
+    # AddField evalúa el default una sola vez: cada tarea existente recibe su propio token
+    Tarea = apps.get_model('tareas', 'Tarea')
+    for tarea in Tarea.objects.only('id'):
+        Tarea.objects.filter(pk=tarea.pk).update(token=tareas.models.generar_token())
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('tareas', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='tarea',
+            name='token',
+            field=models.CharField(default=tareas.models.generar_token, max_length=64),
+        ),
+        migrations.RunPython(tokens_propios, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,44 @@
+import secrets
+
+from django.db import models
+
+
+def generar_token():
+    return secrets.token_urlsafe(24)
+
+
+class Tarea(models.Model):
+    ESTADOS = [
+        ('pendiente', 'Pendiente'),
+        ('en_proceso', 'En Proceso'),
+        ('completada', 'Completada'),
+        ('fallida', 'Fallida'),
+    ]
+    
+    tipo = models.CharField(max_length=50)
+    # Los ids son secuenciales: consultar o descargar una tarea exige su token
+    token = models.CharField(max_length=64, default=generar_token)
+    parametros = models.JSONField(default=dict)
+    estado = models.CharField(max_length=15, choices=ESTADOS, default='pendiente')
+    
+    # Resultado descargable (ej. PDF del manifiesto)
+    resultado = models.BinaryField(null=True, blank=True)
+    resultado_tipo = models.CharField(max_length=100, blank=True)
+    resultado_nombre = models.CharField(max_length=200, blank=True)
+    error = models.TextField(blank=True)
+    
+    intentos = models.PositiveSmallIntegerField(default=0)
+    creada_en = models.DateTimeField(auto_now_add=True)
+    iniciada_en = models.DateTimeField(null=True, blank=True)
+    finalizada_en = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        db_table = 'tareas'
+        ordering = ['creada_en']
+        indexes = [
+            # El worker busca siempre la pendiente más antigua
+            models.Index(fields=['estado', 'creada_en'], name='tareas_estado_creada_idx'),
+        ]
+    
+    def __str__(self):
+        return f"{self.tipo} #{self.id} ({self.get_estado_display()})"
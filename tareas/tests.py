@@ -0,0 +1,104 @@
+from datetime import timedelta
+from io import StringIO
+
+from django.core.cache import cache
+from django.core.management import call_command
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from rutas.tests import crear_salida
+from .cola import ejecutar_pendientes, reclamar
+from .models import Tarea
+
+
+class TareaManifiestoTests(TestCase):
+
+    def setUp(self):
+        cache.clear()
+        self.salida = crear_salida(1, pasajeros=2)
+
+    def encolar(self, conductor_id):
+        return self.client.post('/api/tareas/', {
+            'tipo': 'manifiesto_pdf',
+            'parametros': {'salida_id': self.salida.id, 'conductor_id': conductor_id}
+        }, content_type='application/json')
+
+    def test_flujo_completo(self):
+        response = self.encolar(self.salida.conductor_id)
+        self.assertEqual(response.status_code, 202)
+        tarea = Tarea.objects.get(id=response.json()['tarea']['id'])
+
+        resultado = self.client.get(f'/api/tareas/{tarea.id}/resultado/?token={tarea.token}')
+        self.assertEqual(resultado.status_code, 409)
+
+        self.assertEqual(ejecutar_pendientes(), 1)
+
+        estado = self.client.get(response.json()['estado_url']).json()['tarea']
+        self.assertEqual(estado['estado'], 'completada')
+        resultado = self.client.get(estado['resultado_url'])
+        self.assertEqual(resultado['Content-Type'], 'application/pdf')
+        self.assertTrue(resultado.content.startswith(b'%PDF'))
+
+    def test_sin_token_no_se_puede_consultar_ni_descargar(self):
+        tarea = Tarea.objects.get(id=self.encolar(self.salida.conductor_id).json()['tarea']['id'])
+        ejecutar_pendientes()
+
+        for url in (f'/api/tareas/{tarea.id}/', f'/api/tareas/{tarea.id}/resultado/'):
+            self.assertEqual(self.client.get(url).status_code, 404)
+            self.assertEqual(self.client.get(url, {'token': 'adivinado'}).status_code, 404)
+            self.assertEqual(self.client.get(url, {'token': tarea.token}).status_code, 200)
+
+    def test_purgar_tareas(self):
+        self.encolar(self.salida.conductor_id)
+        self.encolar(self.salida.conductor_id)
+        ejecutar_pendientes()
+        vieja = Tarea.objects.first()
+        Tarea.objects.filter(pk=vieja.pk).update(finalizada_en=timezone.now() - timedelta(days=30))
+        Tarea.objects.create(tipo='manifiesto_pdf', estado='en_proceso',
+                             iniciada_en=timezone.now() - timedelta(hours=1))
+
+        call_command('purgar_tareas', stdout=StringIO())
+
+        self.assertFalse(Tarea.objects.filter(pk=vieja.pk).exists())
+        self.assertEqual(sorted(Tarea.objects.values_list('estado', flat=True)), ['completada', 'pendiente'])
+
+    def test_valida_al_encolar(self):
+        self.assertEqual(self.encolar(self.salida.conductor_id + 100).status_code, 403)
+        response = self.client.post('/api/tareas/', {'tipo': 'no_existe'}, content_type='application/json')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(Tarea.objects.exists())
+
+    def test_error_de_la_tarea_queda_registrado(self):
+        self.encolar(self.salida.conductor_id)
+        self.salida.delete()
+
+        with self.assertLogs('tareas.cola', level='ERROR') as logs:
+            ejecutar_pendientes()
+
+        self.assertIn('DoesNotExist', logs.output[0])
+        tarea = Tarea.objects.get()
+        self.assertEqual(tarea.estado, 'fallida')
+        self.assertIn('DoesNotExist', tarea.error)
+
+    def test_una_tarea_no_se_reclama_dos_veces(self):
+        self.encolar(self.salida.conductor_id)
+        self.assertEqual(len(reclamar(5)), 1)
+        self.assertEqual(reclamar(5), [])
+
+
+class WorkerTareasTests(TransactionTestCase):
+
+    def test_worker_procesa_la_cola_con_pool_de_hilos(self):
+        cache.clear()
+        salida = crear_salida(1, pasajeros=2)
+        for _ in range(6):
+            Tarea.objects.create(
+                tipo='manifiesto_pdf',
+                parametros={'salida_id': salida.id, 'conductor_id': salida.conductor_id}
+            )
+
+        salida_cmd = StringIO()
+        call_command('procesar_tareas', '--una-vez', '--hilos', '3', stdout=salida_cmd)
+
+        self.assertIn('6 tareas procesadas', salida_cmd.getvalue())
+        self.assertEqual(Tarea.objects.filter(estado='completada').count(), 6)
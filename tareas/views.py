@@ -0,0 +1,94 @@
+import secrets
+
+from django.http import HttpResponse
+from django.views.decorators.http import require_http_methods
+from rest_framework.decorators import api_view
+from rest_framework.response import Response
+
+from .cola import TipoDesconocido, encolar
+from .models import Tarea
+
+
+def url_estado(tarea):
+    return f'/api/tareas/{tarea.id}/?token={tarea.token}'
+
+
+def url_resultado(tarea):
+    return f'/api/tareas/{tarea.id}/resultado/?token={tarea.token}'
+
+
+def _tarea_solicitada(request, tarea_id, *campos_diferidos):
+    """
+    La tarea si el token de la petición es el suyo, si no None. Sin token
+    válido se responde igual que si no existiera: los ids no se pueden recorrer.
+    """
+    tarea = Tarea.objects.defer(*campos_diferidos).filter(id=tarea_id).first()
+    token = request.GET.get('token', '')
+    if tarea is None or not secrets.compare_digest(token.encode(), tarea.token.encode()):
+        return None
+    return tarea
+
+
+def _estado_tarea(tarea):
+    data = {
+        'id': tarea.id,
+        'tipo': tarea.tipo,
+        'estado': tarea.estado,
+        'creada_en': tarea.creada_en.strftime('%Y-%m-%d %H:%M:%S'),
+        'finalizada_en': tarea.finalizada_en.strftime('%Y-%m-%d %H:%M:%S') if tarea.finalizada_en else None,
+    }
+    if tarea.estado == 'completada':
+        data['resultado_url'] = url_resultado(tarea)
+    if tarea.estado == 'fallida':
+        data['error'] = tarea.error.strip().splitlines()[-1] if tarea.error else 'Error desconocido'
+    return data
+
+
+@api_view(['POST'])
+def crear_tarea(request):
+    """
+    Encolar una tarea en segundo plano
+    Body: {"tipo": "manifiesto_pdf", "parametros": {...}}
+    """
+    tipo = request.data.get('tipo')
+    if not tipo:
+        return Response({'error': 'El campo tipo es requerido'}, status=400)
+    
+    try:
+        tarea = encolar(tipo, request.data.get('parametros') or {})
+    except TipoDesconocido as e:
+        return Response({'error': str(e)}, status=400)
+    except PermissionError as e:
+        return Response({'error': str(e)}, status=403)
+    except (ValueError, LookupError) as e:
+        return Response({'error': str(e)}, status=400)
+    
+    return Response({
+        'success': True,
+        'message': 'Tarea encolada',
+        'tarea': _estado_tarea(tarea),
+        'estado_url': url_estado(tarea)
+    }, status=202)
+
+
+@api_view(['GET'])
+def estado_tarea(request, tarea_id):
+    """Consultar el estado de una tarea (?token= el devuelto al encolarla)"""
+    tarea = _tarea_solicitada(request, tarea_id, 'resultado')
+    if tarea is None:
+        return Response({'error': 'Tarea no encontrada'}, status=404)
+    return Response({'success': True, 'tarea': _estado_tarea(tarea)})
+
+
+@require_http_methods(["GET"])
+def descargar_resultado_tarea(request, tarea_id):
+    """Descargar el archivo generado por una tarea completada (?token= el devuelto al encolarla)"""
+    tarea = _tarea_solicitada(request, tarea_id)
+    if tarea is None:
+        return HttpResponse('Tarea no encontrada', status=404)
+    if tarea.estado != 'completada':
+        return HttpResponse(f'La tarea está {tarea.get_estado_display().lower()}', status=409)
+    
+    response = HttpResponse(bytes(tarea.resultado), content_type=tarea.resultado_tipo)
+    response['Content-Disposition'] = f'attachment; filename="{tarea.resultado_nombre}"'
+    return response
@@ -5,6 +5,11 @@ It exposes the ASGI callable as a module-level variable named ``application``.
 
 For more information on this file, see
 https://docs.djangoproject.com/en/5.2/howto/deployment/asgi/
+
+El flujo de eventos en vivo (/api/eventos/) necesita ASGI para mantener
+cientos de conexiones abiertas sin ocupar un worker cada una, por ejemplo:
+
+    uvicorn transporte.asgi:application --workers 1
 """
 
 import os
@@ -0,0 +1,34 @@
+"""
+Ejecutor de las pruebas (TEST_RUNNER)
+
+Las pruebas no comparten las cachés en archivo con un servidor en marcha ni
+dejan archivos: mientras corren, las cachés 'catalogo' y 'compartida' pasan a
+LocMem con override_settings, igual que si cada clase de pruebas lo declarara.
+"""
+from django.conf import settings
+from django.test.runner import DiscoverRunner
+from django.test.utils import override_settings
+
+CACHES_EN_MEMORIA = ('catalogo', 'compartida')
+
+
+def caches_de_prueba():
+    return {
+        **settings.CACHES,
+        **{
+            alias: {'BACKEND': 'django.core.cache.backends.locmem.LocMemCache', 'LOCATION': f'{alias}-pruebas'}
+            for alias in CACHES_EN_MEMORIA
+        },
+    }
+
+
+class EjecutorPruebas(DiscoverRunner):
+
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        self._caches = override_settings(CACHES=caches_de_prueba())
+        self._caches.enable()
+
+    def teardown_test_environment(self, **kwargs):
+        self._caches.disable()
+        super().teardown_test_environment(**kwargs)
@@ -10,8 +10,13 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/5.2/ref/settings/
 """
 
+import os
 from pathlib import Path
 
+from corsheaders.defaults import default_headers
+
+from .sqlite import configuracion_sqlite
+
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
@@ -38,6 +43,10 @@ INSTALLED_APPS = [
     'rutas', 
     'pasajes',
     'encomiendas',
+    'tareas',
+    'sincronizacion',
+    'idempotencia',
+    'rendimiento',
     'django.contrib.admin',
     'django.contrib.auth',
     'django.contrib.contenttypes',
@@ -47,6 +56,10 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Primero: mide la petición completa (consultas, tiempos y tamaño)
+    'rendimiento.middleware.InstrumentacionMiddleware',
+    # Brotli/gzip negociado por Accept-Encoding (rendimiento.compresion)
+    'rendimiento.compresion.CompresionMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -80,11 +93,11 @@ WSGI_APPLICATION = 'transporte.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.2/ref/settings/#databases
 
+# SQLite afinado para ventas concurrentes (ver transporte/sqlite.py): WAL,
+# busy_timeout, synchronous=NORMAL, BEGIN IMMEDIATE y conexiones persistentes.
+# Para cambiar un pragma: configuracion_sqlite(..., pragmas={'mmap_size': 0})
 DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
-    }
+    'default': configuracion_sqlite(BASE_DIR / 'db.sqlite3', conn_max_age=600),
 }
 
 
@@ -137,8 +150,108 @@ AUTH_USER_MODEL = 'usuarios.Usuario'
 
 
 
+# Mapa de bits de ocupación de asientos (pasajes.ocupacion), común a todos los workers
+OCUPACION_CACHE = 'compartida'
+
+# Retención temporal de asientos en ventanilla (pasajes.retenciones), común a todos los workers
+RETENCION_CACHE = 'compartida'
+RETENCION_ASIENTO_SEGUNDOS = 300
+RETENCION_BARRIDO_SEGUNDOS = 30
+
+# Cola de tareas en segundo plano: python manage.py procesar_tareas
+# Purgar las finalizadas con: python manage.py purgar_tareas
+TAREAS_HILOS = 2
+TAREAS_RETENCION_DIAS = 7
+
+# Manifiesto PDF (pasajes.manifiesto): si no está en caché se encola la tarea
+# manifiesto_pdf y se responde 202. Con MANIFIESTO_PDF_SINCRONO = True se genera
+# en la misma petición (instalaciones sin procesar_tareas)
+MANIFIESTO_PDF_CACHE = 'compartida'
+MANIFIESTO_PDF_SINCRONO = False
+
+# Sincronización incremental de la app del conductor (sincronizacion.views)
+SINCRONIZACION_MARGEN_SEGUNDOS = 5
+SINCRONIZACION_RETENCION_DIAS = 30
+
+# Respuestas guardadas por Idempotency-Key (idempotencia.decoradores)
+# Purgar las vencidas con: python manage.py purgar_idempotencia
+IDEMPOTENCIA_TTL_HORAS = 24
+
+# Instrumentación por petición (rendimiento.middleware): se registran en el log
+# 'rendimiento' las peticiones que superan cualquiera de los dos presupuestos
+RENDIMIENTO_PRESUPUESTO_MS = 500
+RENDIMIENTO_PRESUPUESTO_CONSULTAS = 30
+RENDIMIENTO_VENTANA_MINUTOS = 15
+
+# Cachés: la de catálogos (rendimiento.cache_catalogo) se comparte entre procesos
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalogo': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CATALOGO_CACHE_DIR', BASE_DIR / '.cache' / 'catalogo'),
+    },
+    # Datos que deben ver todos los procesos (workers web y procesar_tareas)
+    'compartida': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('COMPARTIDA_CACHE_DIR', BASE_DIR / '.cache' / 'compartida'),
+    },
+}
+# Las pruebas usan LocMem en lugar de las cachés en archivo (transporte/pruebas.py)
+TEST_RUNNER = 'transporte.pruebas.EjecutorPruebas'
+CATALOGO_CACHE = 'catalogo'
+# Tope de antigüedad de las respuestas (salidas_programadas depende de la hora)
+CATALOGO_CACHE_SEGUNDOS = 300
+
+# Escritor único con group commit (rendimiento.escritor): las escrituras de venta,
+# encomiendas y check-in se confirman por lotes desde un hilo por proceso. No siempre
+# es más rápido: medir con manage.py benchmark_escritor antes de activarlo
+ESCRITOR_UNICO = False
+ESCRITOR_LOTE_MAXIMO = 64
+ESCRITOR_TIMEOUT_SEGUNDOS = 30
+
+# Eventos en vivo (rendimiento.eventos, /api/eventos/ servido con ASGI): eventos
+# guardados para reenviar con Last-Event-ID, cola máxima por cliente y latido
+EVENTOS_HISTORIAL = 1000
+EVENTOS_COLA_MAXIMA = 256
+EVENTOS_LATIDO_SEGUNDOS = 15
+EVENTOS_REINTENTO_MS = 3000
+
+# Serialización JSON de DRF y JsonResponse (rendimiento.json_rapido): 'orjson' o 'json'.
+# None usa orjson si está instalado
+JSON_MOTOR = None
+
+# Compresión de respuestas (rendimiento.compresion): brotli si está instalado, si no gzip
+COMPRESION_MINIMO_BYTES = 1024
+COMPRESION_GZIP_NIVEL = 6
+COMPRESION_BROTLI_CALIDAD = 5
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'rendimiento': {'handlers': ['console'], 'level': 'WARNING'},
+        # Mediciones de las pruebas de benchmark y stress (rendimiento.benchmarks)
+        'rendimiento.benchmark': {'level': 'INFO' if os.environ.get('BENCHMARK_MOSTRAR') == '1' else 'WARNING'},
+    },
+}
+
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': ['rest_framework.permissions.AllowAny'],
+    'DEFAULT_RENDERER_CLASSES': [
+        'rendimiento.json_rapido.RenderizadorJSON',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
 }
 
-CORS_ALLOW_ALL_ORIGINS = True
\ No newline at end of file
+CORS_ALLOW_ALL_ORIGINS = True
+
+# Cabeceras de paginación por cursor, idempotencia, GET condicional e instrumentación visibles para el frontend
+CORS_EXPOSE_HEADERS = ['X-Next-Cursor', 'Link', 'Idempotent-Replayed', 'Retry-After',
+                       'ETag', 'Last-Modified', 'X-Query-Count', 'Server-Timing']
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key', 'if-none-match', 'if-modified-since', 'last-event-id')
@@ -20,13 +20,20 @@ from vehiculos.views import get_vehiculos, crear_vehiculo, actualizar_vehiculo,
 from pasajes.views import (get_pasajes_salida, vender_pasaje, 
                           get_manifiesto_salida, check_in_pasajero,
                           reservar_asiento_conductor, get_asientos_disponibles_conductor,
-                          get_manifiesto_conductor, descargar_manifiesto_pdf)
+                          get_manifiesto_conductor, descargar_manifiesto_pdf,
+                          retener_asiento, liberar_asiento, vender_pasajes_grupo)
 
 from encomiendas.views import (get_encomiendas_salida, crear_encomienda, 
                               entregar_encomienda)
 
+from tareas.views import crear_tarea, estado_tarea, descargar_resultado_tarea
+
+from sincronizacion.views import sincronizar_conductor, aplicar_mutaciones
+
+from rendimiento.views import estadisticas_endpoints, flujo_eventos, metricas_prometheus, salud
+
 # FALTA IMPORTAR - Agregando importación que faltaba
-from rutas.views import salidas_disponibles_venta
+from rutas.views import salidas_disponibles_venta, disponibilidad_venta
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -55,6 +62,7 @@ urlpatterns = [
     path('api/salidas/crear/', crear_salida, name='crear_salida'),
     path('api/salidas/<int:salida_id>/cancelar/', cancelar_salida, name='cancelar_salida'),
     path('api/salidas-disponibles/', salidas_disponibles_venta, name='salidas_disponibles_venta'),
+    path('api/disponibilidad-venta/', disponibilidad_venta, name='disponibilidad_venta'),
     path('api/salida/<int:salida_id>/manifiesto/', get_manifiesto_salida, name='manifiesto_salida'),
     # Agregar en urlpatterns:
     path('api/mis-salidas-conductor/', mis_salidas_conductor, name='mis_salidas_conductor'),
@@ -74,6 +82,9 @@ urlpatterns = [
     # APIs de pasajes y encomiendas
     path('api/salida/<int:salida_id>/pasajes/', get_pasajes_salida, name='pasajes_salida'),
     path('api/salida/<int:salida_id>/vender/', vender_pasaje, name='vender_pasaje'),
+    path('api/salida/<int:salida_id>/vender-grupo/', vender_pasajes_grupo, name='vender_pasajes_grupo'),
+    path('api/salida/<int:salida_id>/retener/', retener_asiento, name='retener_asiento'),
+    path('api/retencion/<str:token>/liberar/', liberar_asiento, name='liberar_asiento'),
     path('api/salida/<int:salida_id>/encomiendas/', get_encomiendas_salida, name='encomiendas_salida'),
     path('api/salida/<int:salida_id>/encomienda/', crear_encomienda, name='crear_encomienda'),
 
@@ -87,4 +98,21 @@ urlpatterns = [
     # Agregar estas líneas en urlpatterns:
     path('api/salida/<int:salida_id>/manifiesto-conductor/', get_manifiesto_conductor, name='manifiesto_conductor'),
     path('api/salida/<int:salida_id>/manifiesto-pdf/', descargar_manifiesto_pdf, name='manifiesto_pdf'),
+    
+    # APIs de tareas en segundo plano
+    path('api/tareas/', crear_tarea, name='crear_tarea'),
+    path('api/tareas/<int:tarea_id>/', estado_tarea, name='estado_tarea'),
+    path('api/tareas/<int:tarea_id>/resultado/', descargar_resultado_tarea, name='resultado_tarea'),
+    
+    # Sincronización incremental de la app del conductor
+    path('api/sincronizar/', sincronizar_conductor, name='sincronizar_conductor'),
+    path('api/sincronizar/operaciones/', aplicar_mutaciones, name='aplicar_mutaciones'),
+    
+    # Eventos en vivo de asientos y salidas (Server-Sent Events, servir con ASGI)
+    path('api/eventos/', flujo_eventos, name='flujo_eventos'),
+    
+    # Histogramas de latencia y consultas por endpoint (DEBUG o staff)
+    path('api/rendimiento/', estadisticas_endpoints, name='estadisticas_endpoints'),
+    path('api/salud/', salud, name='salud'),
+    path('metrics', metricas_prometheus, name='metricas_prometheus'),
 ]
\ No newline at end of file
@@ -13,6 +13,10 @@ class Usuario(AbstractUser):
     class Meta:
         db_table = 'usuarios'
         verbose_name_plural = 'Usuarios'
+        # Listas de conductores: tipo='conductor' (y is_active=True en los selectores)
+        indexes = [
+            models.Index(fields=['tipo', 'is_active'], name='usuarios_tipo_activo_idx'),
+        ]
     
     def __str__(self):
         return f"{self.get_full_name()} ({self.get_tipo_display()})"
@@ -3,9 +3,11 @@ from rest_framework.response import Response
 from rest_framework import status
 from django.contrib.auth import authenticate
 from django.contrib.auth import login
+from rendimiento.cache_catalogo import cachear_catalogo
 from .models import Usuario
 from django.contrib.auth.hashers import make_password
 from django.db import IntegrityError
+from django.db.models import Count
 
 
 
@@ -34,6 +36,7 @@ def login_usuario(request):
     
     return Response({'error': 'Credenciales inválidas'}, status=401)
 
+@cachear_catalogo('conductores')
 @api_view(['GET'])
 def usuarios_conductores(request):
     """Obtener lista de conductores"""
@@ -104,17 +107,18 @@ def registrar_conductor(request):
         return Response({'error': str(e)}, status=400)
 
 
+@cachear_catalogo('conductores')
 @api_view(['GET'])
 def get_conductores(request):
     """Obtener lista completa de conductores"""
-    from vehiculos.models import Vehiculo  # Agregar este import
-    
-    conductores = Usuario.objects.filter(tipo='conductor').order_by('first_name', 'last_name')
+    # Vehículos asignados contados en la misma consulta (sin un COUNT por conductor)
+    conductores = Usuario.objects.filter(tipo='conductor').annotate(
+        vehiculos_asignados=Count('vehiculo')
+    ).order_by('first_name', 'last_name')
     data = []
     
     for conductor in conductores:
-        # Contar vehículos asignados CORRECTAMENTE
-        vehiculos_asignados = Vehiculo.objects.filter(conductor=conductor).count()
+        vehiculos_asignados = conductor.vehiculos_asignados
         
         data.append({
             'id': conductor.id,
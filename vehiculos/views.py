@@ -1,13 +1,17 @@
 from rest_framework.decorators import api_view
 from rest_framework.response import Response
 from rest_framework import status
+from rendimiento.cache_catalogo import cachear_catalogo
+from rendimiento.condicional import condicional_tablas
 from .models import Vehiculo
 from usuarios.models import Usuario
 
+@condicional_tablas('vehiculos')
+@cachear_catalogo('vehiculos')
 @api_view(['GET'])
 def get_vehiculos(request):
     """Obtener todos los vehículos"""
-    vehiculos = Vehiculo.objects.all().order_by('placa')
+    vehiculos = Vehiculo.objects.select_related('conductor').order_by('placa')
     data = []
     for vehiculo in vehiculos:
         data.append({